@@ -1,20 +1,45 @@
-from flask import jsonify, request
+import re
+
+from flask import jsonify, request, current_app, url_for
 from . import bp
 from ...services.supabase_service import SupabaseService
-from ...services.matching_service import get_matching_service
+from ...services.matching_service import get_matching_service, recommendation_stats, FEATURE_COLUMNS
+from ...services.user_snapshot import get_user_snapshot
+from ...services.match_filters import parse_filters
+from ...services.match_jobs import get_match_jobs, generate_all_matches as generate_all_job, JobConflict
 from ...services.auth_service import login_required
+from .pagination import page_args, select_columns
+
+# expand=user or expand=user(name,avatar_url)
+EXPAND_USER = re.compile(r"^user(?:\((.*)\))?$")
+
+def _expanded_user_columns(expand):
+    """Columns to side-load for expand=, None without it; ValueError if it is malformed."""
+    if not expand:
+        return None
+    match = EXPAND_USER.match(expand.replace(' ', ''))
+    if match is None:
+        raise ValueError(f"Invalid expand: {expand}")
+    if match.group(1) is None:
+        return '*'
+    return select_columns([f for f in match.group(1).split(',') if f])
 
 # Matching endpoints
 @bp.route('/matches', methods=['GET'])
 @login_required
 def get_matches():
-    """Get a list of all matches for the authenticated user."""
+    """Get a page of the authenticated user's matches, with limit=, after= and fields= (see pagination)."""
     # Get user from request context (set by login_required decorator)
     user = request.current_user
     user_id = user['id']
     
-    matches = SupabaseService.get_matches(user_id)
-    return jsonify(matches)
+    try:
+        limit, after, columns = page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    page = SupabaseService.get_matches_page(user_id, limit, after, columns)
+    return jsonify({"matches": page["data"], "next_cursor": page["next_cursor"]})
 
 @bp.route('/matches/<int:match_id>', methods=['GET'])
 @login_required
@@ -42,42 +67,72 @@ def recommend_matches():
     # Get the number of matches to return (default 5)
     count = request.args.get('count', 5, type=int)
     
-    # Use the matching service to generate matches
+    # Explanations are rendered unless the client opts out with explain=false
+    explain = request.args.get('explain', 'true').lower() != 'false'
+    
+    # Hard filters: location=, stage=, availability= (repeat for any of several
+    # values) and must_have_skill= (repeat to require several skills)
+    filters = parse_filters(request.args)
+    
+    # Serve from the precomputed top-K store, scoring live only on a miss or stale entry
     matching_service = get_matching_service()
-    recommended_matches = matching_service.generate_matches_for_user(user_id, top_n=count)
+    
+    # view=compact returns IDs, scores and factor codes, with matched users
+    # side-loaded only on request: expand=user(name,avatar_url)
+    if request.args.get('view') == 'compact':
+        try:
+            user_columns = _expanded_user_columns(request.args.get('expand'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(matching_service.recommend_matches_compact(
+            user_id, count=count, filters=filters, user_columns=user_columns
+        ))
+    
+    recommended_matches = matching_service.recommend_matches(user_id, count=count, explain=explain, filters=filters)
     
     return jsonify(recommended_matches)
 
+@bp.route('/matches/recommend/stats', methods=['GET'])
+@login_required
+def recommendation_store_stats():
+    """Get this process's hit, miss and stale counts for the precomputed top-K store."""
+    return jsonify(dict(recommendation_stats))
+
 @bp.route('/matches/generate-all', methods=['POST'])
 @login_required
 def generate_all_matches():
-    """Generate matches for all users and store them in the database."""
+    """Start a background job that generates and stores matches for all users."""
     # This endpoint would typically be restricted to admins
     user = request.current_user
     
-    # Use the matching service to generate matches for all users
-    matching_service = get_matching_service()
-    matches = matching_service.generate_matches_for_all_users()
-    
-    # Store the matches in the database
-    stored_matches = []
-    
-    for user_id, user_matches in matches.items():
-        for match in user_matches:
-            # Store the match in the database
-            stored_match = SupabaseService.store_match(
-                int(user_id),
-                match['match_id'],
-                match['score'],
-                match['explanation']
-            )
-            if stored_match:
-                stored_matches.append(stored_match)
+    # The top-K store behind /matches/recommend is refreshed in the same pass
+    store_top_k = current_app.config.get('RECOMMENDATION_TOP_K', 50)
+    
+    # One generate-all job at a time per users table
+    dataset = f"users@{current_app.config.get('SUPABASE_URL')}"
+    try:
+        job = get_match_jobs().submit(
+            dataset, 'generate-all', lambda progress: generate_all_job(progress, store_top_k=store_top_k)
+        )
+    except JobConflict as e:
+        return jsonify({"error": str(e), "job_id": e.job['id']}), 409
     
     return jsonify({
-        "message": f"Generated and stored {len(stored_matches)} matches.",
-        "matches_count": len(stored_matches)
-    })
+        "message": "Match generation started.",
+        "job_id": job['id'],
+        "status_url": url_for('.get_match_job', job_id=job['id'])
+    }), 202
+
+@bp.route('/matches/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_match_job(job_id):
+    """Get the state, phase and progress of a background matching job."""
+    job = get_match_jobs().get(job_id)
+    
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    return jsonify(job)
 
 @bp.route('/matches/<int:match_id>/action', methods=['POST'])
 @login_required
@@ -118,17 +173,21 @@ def check_compatibility():
     # Use the matching service to calculate compatibility
     matching_service = get_matching_service()
     
-    # Get both user objects
-    user_obj = SupabaseService.get_user(user_id)
-    other_user_obj = SupabaseService.get_user(other_user_id)
+    # Get both user objects from the shared snapshot, falling back to the
+    # database for users that signed up after it was taken
+    snapshot = get_user_snapshot()
+    user_obj = snapshot.get_user(user_id) or SupabaseService.get_user(user_id, columns=FEATURE_COLUMNS)
+    other_user_obj = snapshot.get_user(other_user_id) or SupabaseService.get_user(other_user_id, columns=FEATURE_COLUMNS)
     
     if not other_user_obj:
         return jsonify({"error": "Other user not found"}), 404
     
-    # Calculate compatibility
-    subs = matching_service._compute_subscores(user_obj, other_user_obj)
+    # Calculate compatibility on the compiled profiles
+    profile = matching_service.compile_profile(user_obj)
+    other_profile = matching_service.compile_profile(other_user_obj)
+    subs = matching_service._compute_subscores(profile, other_profile)
     score = matching_service._weighted_score(subs)
-    explanation = matching_service._generate_explanation(user_obj, other_user_obj, subs, score)
+    explanation = matching_service._generate_explanation(profile, other_profile, subs, score)
     
     return jsonify({
         "user_id": user_id,
@@ -0,0 +1,44 @@
+"""
+Query arguments of the list endpoints.
+
+Lists are paged by id: ``limit`` rows (LIST_PAGE_SIZE by default, at most
+LIST_MAX_PAGE_SIZE) with an id greater than ``after``, which is the
+``next_cursor`` of the previous page. ``fields`` is a comma-separated list of
+columns to return; id is always included since the cursor needs it.
+"""
+
+import re
+
+from flask import current_app
+
+FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def select_columns(fields):
+    """Supabase select list for field names, id first; ValueError if a name is not a plain column."""
+    invalid = [f for f in fields if not FIELD_NAME.match(f)]
+    if invalid:
+        raise ValueError(f"Invalid fields: {', '.join(invalid)}")
+    return ",".join(dict.fromkeys(['id'] + list(fields)))
+
+
+def page_args(args):
+    """Return (limit, after, columns) from request args; ValueError if they are invalid."""
+    config = current_app.config
+    limit = args.get('limit', config.get('LIST_PAGE_SIZE', 100), type=int)
+    max_limit = config.get('LIST_MAX_PAGE_SIZE', 1000)
+    if not 1 <= limit <= max_limit:
+        raise ValueError(f"limit must be between 1 and {max_limit}")
+
+    after = args.get('after')
+    if after is not None:
+        try:
+            after = int(after)
+        except ValueError:
+            raise ValueError("after must be the next_cursor of a previous page") from None
+
+    columns = '*'
+    fields = [f.strip() for f in args.get('fields', '').split(',') if f.strip()]
+    if fields:
+        columns = select_columns(fields)
+    return limit, after, columns
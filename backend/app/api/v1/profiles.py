@@ -1,17 +1,40 @@
 from flask import jsonify, request, current_app
 from . import bp
 from ...services.supabase_service import SupabaseService
+from ...services.matching_service import get_matching_service, PROFILE_FIELDS
+from .pagination import page_args
 # Removed auth_required import
 
+def _update_matches(user_id, profile):
+    """
+    Copy the written profile's scored fields to the user's record, which the
+    matcher and the user snapshot read, and refresh matching state for that
+    user. Fields the write left empty keep their value. A failure never fails
+    the profile write.
+    """
+    if user_id is None or profile is None:
+        return
+    try:
+        fields = {field: profile[field] for field in PROFILE_FIELDS if profile.get(field) is not None}
+        if fields:
+            SupabaseService.update_user(user_id, fields)
+        get_matching_service().update_matches_for_user(user_id)
+    except Exception as e:
+        current_app.logger.error(f"Error updating matches for user {user_id}: {str(e)}")
+
 # Profiles endpoints
 @bp.route('/profiles', methods=['GET'])
 def get_profiles():
-    """Get a list of all profiles."""
+    """Get a page of profiles, with limit=, after= and fields= (see pagination)."""
     current_app.logger.info("Received request for get_profiles")
     try:
-        profiles = SupabaseService.get_profiles()
-        current_app.logger.info(f"Retrieved {len(profiles)} profiles")
-        return jsonify(profiles)
+        limit, after, columns = page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        page = SupabaseService.get_profiles_page(limit, after, columns)
+        current_app.logger.info(f"Retrieved {len(page['data'])} profiles after id {after}")
+        return jsonify({"profiles": page["data"], "next_cursor": page["next_cursor"]})
     except Exception as e:
         current_app.logger.error(f"Error in get_profiles: {str(e)}")
         return jsonify({"error": "An error occurred while fetching profiles"}), 500
@@ -73,6 +96,7 @@ def create_profile():
         'avatar_url': data.get('avatar_url', DEFAULT_AVATAR_URL) 
     })
     current_app.logger.info(f"Created new profile for user: {data.get('user_id')}")
+    _update_matches(data.get('user_id'), profile)
     return jsonify(profile), 201
 
 @bp.route('/profiles/<int:profile_id>', methods=['PUT'])
@@ -90,6 +114,7 @@ def update_profile(profile_id):
         current_app.logger.warning(f"Failed to update profile for id: {profile_id}")
         return jsonify({"error": "Profile not found or you don't have permission to update it"}), 404
     current_app.logger.info(f"Updated profile for id: {profile_id}")
+    _update_matches(profile.get('user_id'), profile)
     return jsonify(profile)
 
 @bp.route('/profiles/<int:profile_id>', methods=['DELETE'])
@@ -1,13 +1,18 @@
 from flask import jsonify, request
 from . import bp
 from ...services.supabase_service import SupabaseService
+from .pagination import page_args
 
 # Users endpoints
 @bp.route('/users', methods=['GET'])
 def get_users():
-    """Get a list of all users."""
-    users = SupabaseService.get_users()
-    return jsonify(users)
+    """Get a page of users, with limit=, after= and fields= (see pagination)."""
+    try:
+        limit, after, columns = page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    page = SupabaseService.get_users_page(limit, after, columns)
+    return jsonify({"users": page["data"], "next_cursor": page["next_cursor"]})
 
 @bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
@@ -17,6 +17,28 @@ class Config:
     # JWT settings
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-for-testing')
     JWT_ACCESS_TOKEN_EXPIRES = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600))  # 1 hour
+    
+    # Matching settings
+    MATCHING_MEMORY_BUDGET_MB = int(os.getenv('MATCHING_MEMORY_BUDGET_MB', 256))  # per score tile
+    RECOMMENDATION_TOP_K = int(os.getenv('RECOMMENDATION_TOP_K', 50))  # matches kept per user in the store
+    USER_SNAPSHOT_REFRESH_SECONDS = int(os.getenv('USER_SNAPSHOT_REFRESH_SECONDS', 300))  # 0 = reload only after writes
+    INCREMENTAL_RESEED_SECONDS = int(os.getenv('INCREMENTAL_RESEED_SECONDS', 300))  # min gap between incremental matcher reseeds
+    MATCHING_ANN_MIN_USERS = int(os.getenv('MATCHING_ANN_MIN_USERS', 200000))  # approximate candidates from here on; 0 = never
+    MATCHING_ANN_INDEX_PATH = os.getenv('MATCHING_ANN_INDEX_PATH')  # .npz file to persist the vector index
+    MATCHING_ANN_OVERSAMPLE = int(os.getenv('MATCHING_ANN_OVERSAMPLE', 4))  # candidates rescored per returned match
+    BIO_VECTOR_PATH = os.getenv('BIO_VECTOR_PATH')  # .npy file to cache bio vectors across builds
+    MATCH_STORE_CHUNK_SIZE = int(os.getenv('MATCH_STORE_CHUNK_SIZE', 500))  # match rows per upsert request
+    MATCH_STORE_WORKERS = int(os.getenv('MATCH_STORE_WORKERS', 4))  # upsert requests in flight
+    MATCH_SCORE_TOLERANCE = float(os.getenv('MATCH_SCORE_TOLERANCE', 0.01))  # score change that rewrites a stored match
+    MATCH_DIFF_BATCH_USERS = int(os.getenv('MATCH_DIFF_BATCH_USERS', 200))  # users whose stored matches are diffed at once
+    USER_PAGE_SIZE = int(os.getenv('USER_PAGE_SIZE', 1000))  # users per range request (keep <= PostgREST max-rows)
+    USER_FETCH_WORKERS = int(os.getenv('USER_FETCH_WORKERS', 4))  # range requests in flight
+    MATCH_JOBS_DB = os.getenv('MATCH_JOBS_DB')  # SQLite file shared by all worker processes; default instance/match_jobs.sqlite3, ':memory:' = this process only
+    MATCH_JOB_STALE_SECONDS = int(os.getenv('MATCH_JOB_STALE_SECONDS', 600))  # silent active job counts as dead
+    
+    # List endpoint settings
+    LIST_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', 100))  # rows per page without limit=
+    LIST_MAX_PAGE_SIZE = int(os.getenv('LIST_MAX_PAGE_SIZE', 1000))  # largest limit= accepted
 
 
 class TestConfig(Config):
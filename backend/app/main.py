@@ -3,6 +3,9 @@ from flask_cors import CORS
 from .api import register_blueprints
 from .core.config import Config
 from .services.supabase_service import init_supabase
+from .services.user_snapshot import init_user_snapshot
+from .services.match_jobs import init_match_jobs
+from .services.incremental_matching import init_incremental_matcher
 
 def create_app(config_class=Config):
     """Create and configure the Flask application."""
@@ -15,6 +18,15 @@ def create_app(config_class=Config):
     # Initialize Supabase
     init_supabase(app)
     
+    # Shared user snapshot for request-time matching
+    init_user_snapshot(app)
+    
+    # Top-N lists kept current by profile writes
+    init_incremental_matcher(app)
+    
+    # Background jobs for generate-all
+    init_match_jobs(app)
+    
     # Register API blueprints
     register_blueprints(app)
     
@@ -0,0 +1,201 @@
+"""
+Batched hashing vectorizer for profile bios.
+
+Each bio becomes a fixed-dimension vector of term counts: unigrams and bigrams
+(stopwords removed) are hashed into BIO_DIMENSION buckets with CRC32, so no
+vocabulary or network model is needed. Counts are small integers stored as
+float32, which keeps every dot product exact; the bio similarity factor is the
+cosine of two count vectors and comes out bit-identical whether it is computed
+per pair or as one matrix product over the whole population.
+
+Vectors depend on nothing but the bio text, so they are cached by content hash:
+in a bounded in-memory LRU and, when a store path is given, in a memory-mapped
+.npy file aligned with the user index. Each row of that file holds a bio hash
+next to its counts, so the file is replaced in one atomic rename and can never
+pair rows with the hashes of another write. Rebuilding it reuses every row
+whose bio hash is unchanged and only encodes the rest.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+BIO_DIMENSION = 256
+
+# Bios encoded per batch
+ENCODE_BATCH = 1024
+
+# Rows converted to float64 at a time when computing norms
+NORM_CHUNK = 65536
+
+# Vectors kept in a vectorizer's in-memory cache (1 KB each at BIO_DIMENSION)
+CACHE_SIZE = 10000
+
+# Common English words that carry no signal for matching
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been but by can for from had has have he her his i in
+into is it its like me more my not of on or our she so some such than that the their them then there
+these they this to up us was we were what when where which while who will with within would you your
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def bio_hash(text):
+    """Content hash of a bio; every missing or empty bio shares one hash."""
+    return hashlib.sha1((text or "").encode()).hexdigest()[:16]
+
+
+def bio_terms(text):
+    """Unigrams and bigrams of a bio, lowercased, without stopwords."""
+    words = [w for w in _WORD.findall((text or "").lower()) if w not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class BioVectorizer:
+    """Hashing term-count vectorizer with a bounded content-hash cache."""
+
+    def __init__(self, dimension=BIO_DIMENSION, cache_size=CACHE_SIZE):
+        self.dimension = dimension
+        self.cache_size = cache_size
+        # Content hash -> float32 count vector, least recently used first
+        self._cache = OrderedDict()
+        self.encoded = 0
+
+    def encode_batch(self, texts):
+        """Encode bios into a len(texts) x dimension float32 count matrix, bypassing the cache."""
+        rows, buckets = [], []
+        for row, text in enumerate(texts):
+            for term in bio_terms(text):
+                rows.append(row)
+                buckets.append(zlib.crc32(term.encode()) % self.dimension)
+        counts = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(buckets, dtype=np.intp)), 1.0)
+        self.encoded += len(texts)
+        return counts
+
+    def vector(self, text):
+        """Count vector for one bio, encoded at most once per distinct text."""
+        return self.vectors([text])[0]
+
+    def _cached(self, key):
+        vector = self._cache.get(key)
+        if vector is not None:
+            self._cache.move_to_end(key)
+        return vector
+
+    def _remember(self, key, vector):
+        self._cache[key] = vector
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def vectors(self, texts, hashes=None, store=None):
+        """
+        Return the count matrix for ``texts``, encoding only bios that are in
+        neither the cache nor ``store`` (a BioVectorStore of a previous run).
+        Vectors headed for a store are not cached, since the store keeps them.
+        """
+        hashes = hashes or [bio_hash(text) for text in texts]
+        matrix = np.empty((len(texts), self.dimension), dtype=np.float32)
+
+        missing = {}
+        for row, key in enumerate(hashes):
+            vector = self._cached(key)
+            if vector is None and store is not None:
+                vector = store.get(key)
+            if vector is None:
+                missing.setdefault(key, []).append(row)
+            else:
+                matrix[row] = vector
+
+        keys = list(missing)
+        for start in range(0, len(keys), ENCODE_BATCH):
+            batch = keys[start:start + ENCODE_BATCH]
+            encoded = self.encode_batch([texts[missing[key][0]] for key in batch])
+            for key, vector in zip(batch, encoded):
+                if store is None:
+                    self._remember(key, vector)
+                matrix[missing[key]] = vector
+        return matrix
+
+
+def bio_norms(counts):
+    """Euclidean norm of each count row, in float64 (exact sums of squared integers)."""
+    if np.ndim(counts) == 1:
+        counts = np.asarray(counts, dtype=np.float64)
+        return np.sqrt((counts * counts).sum())
+    norms = np.empty(len(counts))
+    for start in range(0, len(counts), NORM_CHUNK):
+        chunk = np.asarray(counts[start:start + NORM_CHUNK], dtype=np.float64)
+        norms[start:start + NORM_CHUNK] = np.sqrt((chunk * chunk).sum(axis=1))
+    return norms
+
+
+def store_dtype(dimension):
+    """Row type of a BioVectorStore file: a bio hash and its counts."""
+    return np.dtype([("hash", "S16"), ("counts", np.float32, (dimension,))])
+
+
+class BioVectorStore:
+    """Memory-mapped bio count matrix aligned with a user list, each row tagged with its bio hash."""
+
+    def __init__(self, path, dimension=BIO_DIMENSION):
+        self.path = path
+        self.dimension = dimension
+        self.counts = None
+        self._rows = {}
+        if os.path.exists(path):
+            self._open()
+
+    def _open(self):
+        try:
+            table = np.load(self.path, mmap_mode="r")
+        except (OSError, ValueError):
+            return
+        # Files of another layout or dimension (or an older format) are rebuilt
+        if table.dtype != store_dtype(self.dimension):
+            return
+        self.counts = table["counts"]
+        self._rows = {key.decode(): row for row, key in enumerate(table["hash"])}
+
+    def get(self, key):
+        """Stored vector for a bio hash (a view into the mapped file), or None."""
+        row = self._rows.get(key)
+        return None if row is None else self.counts[row]
+
+    def write(self, vectorizer, texts):
+        """
+        Write the aligned count matrix for ``texts`` and return it memory-mapped.
+        Rows for unchanged bios are copied from the previous file, not re-encoded.
+        """
+        hashes = [bio_hash(text) for text in texts]
+        fd, temp_path = tempfile.mkstemp(suffix=".npy", dir=os.path.dirname(os.path.abspath(self.path)))
+        os.close(fd)
+        try:
+            out = np.lib.format.open_memmap(
+                temp_path, mode="w+", dtype=store_dtype(vectorizer.dimension), shape=(len(texts),)
+            )
+            out["hash"] = hashes
+            for start in range(0, len(texts), ENCODE_BATCH):
+                stop = start + ENCODE_BATCH
+                out["counts"][start:stop] = vectorizer.vectors(texts[start:stop], hashes[start:stop], store=self)
+            out.flush()
+            del out
+
+            # One rename swaps rows and hashes in together, so concurrent
+            # writers leave whichever complete file landed last; the old
+            # mapping stays valid until it is released
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.dimension = vectorizer.dimension
+        self.counts = None
+        self._rows = {}
+        self._open()
+        return self.counts
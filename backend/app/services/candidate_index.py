@@ -0,0 +1,250 @@
+"""
+Candidate generation for single-user recommendations.
+
+CandidateIndex is exact; AnnCandidateIndex trades a measurable amount of
+recall for populations too large to scan.
+
+Posting lists map each skill, interest, location, goal code and stage code to
+the positions of the users that have it. A candidate that shares no skill,
+complementary skill, interest or location with the target can only score
+through goal, stage, availability, collab_style and bio, so those candidates are
+grouped by (goal code, stage code) and each group gets an upper bound from the
+per-factor maximum contributions in WEIGHTS. Groups whose bound cannot beat
+the current Nth score are skipped, which keeps the top-N identical to
+exhaustive scoring.
+
+AnnCandidateIndex stores every user's engine embedding in a LocalVectorIndex.
+A target's query vector ranks users by their unrounded score (the embedding
+inner product equals the score), and only the top ``oversample * top_n``
+users from the probed IVF lists are rescored exactly.
+"""
+
+import hashlib
+import os
+
+from collections import defaultdict
+
+import numpy as np
+
+from .matching_service import WEIGHTS, bit_indices
+from .matching_engine import TopNAccumulator, EMPTY_KEY
+from .vector_index import LocalVectorIndex
+
+# Slack added to upper bounds before rounding, so float summation order can
+# never make a bound land below the exact score it covers
+BOUND_EPSILON = 1e-9
+
+# Users embedded and upserted per batch when building a vector index
+EMBED_BATCH = 4096
+
+
+def _postings(keys_per_position):
+    """Build {key: sorted position array} from an iterable of key lists."""
+    postings = defaultdict(list)
+    for pos, keys in enumerate(keys_per_position):
+        for key in keys:
+            postings[key].append(pos)
+    return {key: np.array(positions, dtype=np.intp) for key, positions in postings.items()}
+
+
+class CandidateIndex:
+    """Posting lists over a MatchingEngine's population for exact top-N search."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        profiles = engine.profiles
+
+        self.skill_postings = _postings(bit_indices(p.skills) for p in profiles)
+        self.interest_postings = _postings(bit_indices(p.interests) for p in profiles)
+        self.location_postings = _postings((p.location,) if p.location else () for p in profiles)
+        self.goal_postings = _postings((p.goals,) for p in profiles)
+        self.stage_postings = _postings((p.startup_stage,) for p in profiles)
+
+    def _overlap_candidates(self, i):
+        """Positions sharing a skill, complementary skill, interest or location with user i."""
+        target = self.engine.profiles[i]
+        complement = self.engine.scorer.compiler.complement
+
+        lists = [self.skill_postings.get(s) for s in bit_indices(target.skills)]
+        for skill_id in target.skill_ids:
+            lists.extend(self.skill_postings.get(partner) for partner in complement.get(skill_id, ()))
+        lists.extend(self.interest_postings.get(s) for s in bit_indices(target.interests))
+        if target.location:
+            lists.append(self.location_postings.get(target.location))
+
+        lists = [positions for positions in lists if positions is not None]
+        if not lists:
+            return np.empty(0, dtype=np.intp)
+        hits = np.unique(np.concatenate(lists))
+        return hits[hits != i]
+
+    def _group_bounds(self, i):
+        """
+        Return [(bound, goal code, stage code), ...] best first for users that
+        overlap with user i on nothing but goal, stage, availability, collab_style and bio.
+        """
+        engine = self.engine
+        target = engine.profiles[i]
+
+        # Availability and collab_style vary inside a group; bound them by their
+        # best possible value against this target
+        rest = (
+            WEIGHTS["availability_synergy"] * engine.availability_table[target.availability].max()
+            + WEIGHTS["collab_style_synergy"] * engine.collab_table[target.collab_style].max()
+        )
+        # Bio cosine of non-negative counts is at most 1, and 0 for an empty bio
+        if engine.bio_norms[i] > 0:
+            rest += WEIGHTS["bio_similarity"]
+
+        bounds = []
+        for goal in self.goal_postings:
+            goal_term = WEIGHTS["goal_alignment"] * engine.goal_table[target.goals, goal]
+            for stage in self.stage_postings:
+                stage_term = WEIGHTS["stage_alignment"] * engine.stage_table[target.startup_stage, stage]
+                bound = round(goal_term + stage_term + rest + BOUND_EPSILON, 3)
+                bounds.append((bound, goal, stage))
+        bounds.sort(reverse=True)
+        return bounds
+
+    def top_matches_for(self, i, top_n, excluded=None, ceiling_key=None):
+        """
+        Return (matches, stats) for user i.
+
+        ``matches`` is [(score, match_index), ...] best first and equals
+        MatchingEngine.top_matches_for. ``stats`` counts the candidates that
+        were scored and the ones pruned by their upper bound. Candidates in the
+        boolean mask ``excluded`` are dropped before scoring, and with
+        ``ceiling_key`` only matches ranked below that key are returned (see
+        TopNAccumulator).
+        """
+        engine = self.engine
+        n = len(engine)
+        rows = slice(i, i + 1)
+        accumulator = TopNAccumulator(n, top_n, positions=[i], excluded=excluded, ceiling_key=ceiling_key)
+
+        # Overlapping candidates are scored exactly in one block
+        hits = self._overlap_candidates(i)
+        if excluded is not None:
+            hits = hits[~excluded[hits]]
+        if len(hits):
+            accumulator.fold(rows, hits, engine.score_block(rows, hits))
+        scored = len(hits)
+
+        # Everyone else, group by group while a group's bound can still make the cut
+        is_hit = np.zeros(n, dtype=bool) if excluded is None else excluded.copy()
+        is_hit[hits] = True
+        is_hit[i] = True
+        for bound, goal, stage in self._group_bounds(i):
+            floor_key = accumulator.floor_key(i)
+            if floor_key != EMPTY_KEY and round(bound * 1000) * n + n - 1 < floor_key:
+                break
+
+            members = np.intersect1d(self.goal_postings[goal], self.stage_postings[stage], assume_unique=True)
+            members = members[~is_hit[members]]
+            if len(members):
+                accumulator.fold(rows, members, engine.score_block(rows, members))
+                scored += len(members)
+
+        stats = {"candidates": n - 1, "scored": scored, "pruned": n - 1 - scored}
+        return accumulator.results(i), stats
+
+
+def profile_fingerprint(engine):
+    """Hash of an engine's users and encoded features, to tell whether a saved vector index still fits."""
+    digest = hashlib.sha1(repr(engine.ids).encode())
+    for array in engine.feature_arrays().values():
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def build_profile_index(engine, nlist=None, nprobe=None):
+    """Embed every user of ``engine`` into a trained LocalVectorIndex keyed by str(user id)."""
+    n = len(engine)
+    index = None
+    for start in range(0, n, EMBED_BATCH):
+        stop = min(start + EMBED_BATCH, n)
+        vectors = engine.embeddings(slice(start, stop))
+        if index is None:
+            index = LocalVectorIndex(vectors.shape[1], metric="dotproduct")
+        index.upsert(list(zip((str(uid) for uid in engine.ids[start:stop]), vectors)))
+    index.train(nlist, nprobe)
+    return index
+
+
+def load_profile_index(engine, path, nlist=None, nprobe=None):
+    """Load the vector index saved at ``path`` if it was built from these exact features, else build and save it."""
+    fingerprint = profile_fingerprint(engine)
+    if os.path.exists(path):
+        index = LocalVectorIndex.load(path)
+        if index.attributes.get("fingerprint") == fingerprint:
+            return index
+    index = build_profile_index(engine, nlist, nprobe)
+    index.save(path, fingerprint=fingerprint)
+    return index
+
+
+class AnnCandidateIndex:
+    """Approximate top-N search through an IVF vector index over engine embeddings."""
+
+    def __init__(self, engine, vector_index=None, oversample=4):
+        self.engine = engine
+        self.oversample = oversample
+        self.vectors = vector_index if vector_index is not None else build_profile_index(engine)
+        self._positions = {str(uid): pos for pos, uid in enumerate(engine.ids)}
+
+    def top_matches_for(self, i, top_n, excluded=None, ceiling_key=None):
+        """
+        Return (matches, stats) for user i, like CandidateIndex.top_matches_for.
+
+        Retrieved candidates are rescored exactly, so every returned score is
+        exact; a true top-N user is only missed when retrieval ranks it too low.
+        While excluded candidates or a ceiling leave fewer than top_n matches,
+        retrieval is repeated with twice the depth.
+        """
+        engine = self.engine
+        n = len(engine)
+        rows = slice(i, i + 1)
+        accumulator = TopNAccumulator(n, top_n, positions=[i], excluded=excluded, ceiling_key=ceiling_key)
+        query = engine.query_vectors(rows)[0]
+
+        # Every retrieved candidate, so a deeper retrieval only scores new ones
+        seen = np.zeros(n, dtype=bool) if excluded is None else excluded.copy()
+        seen[i] = True
+        # One extra slot, since the target usually retrieves itself
+        top_k = top_n * self.oversample + 1 + (0 if excluded is None else int(excluded.sum()))
+        scored = 0
+        while True:
+            response = self.vectors.query(vector=query, top_k=top_k)
+            hits = np.array([self._positions[m["id"]] for m in response["matches"]], dtype=np.intp)
+            hits = hits[~seen[hits]]
+            seen[hits] = True
+            if len(hits):
+                accumulator.fold(rows, hits, engine.score_block(rows, hits))
+                scored += len(hits)
+            if accumulator.floor_key(i) != EMPTY_KEY or len(response["matches"]) < top_k:
+                break
+            top_k *= 2
+
+        stats = {"candidates": n - 1, "scored": scored, "pruned": n - 1 - scored}
+        return accumulator.results(i), stats
+
+
+def recall_at_n(index, top_n, positions):
+    """
+    Mean recall@top_n of ``index`` against exhaustive scoring over ``positions``.
+
+    A returned match counts as found when its score reaches the exact Nth-best
+    score (MatchingEngine.top_matches_for), so ties at the cut-off are not
+    held against the index.
+    """
+    engine = index.engine
+    found = expected = 0
+    for i in positions:
+        exact = engine.top_matches_for(i, top_n)
+        if not exact:
+            continue
+        threshold = exact[-1][0]
+        approximate = index.top_matches_for(i, top_n)[0]
+        found += sum(1 for score_val, _ in approximate if score_val >= threshold)
+        expected += len(exact)
+    return found / expected if expected else 1.0
@@ -0,0 +1,232 @@
+"""
+Incremental top-N maintenance for single profile changes and new sign-ups.
+
+Every user's top-N list is kept in memory together with a reverse index
+(``listed_by[j]`` = the users whose top-N contains user j). When one user
+changes, only that user's row (their scores towards everyone) and column
+(everyone's scores towards them) are rescored:
+
+* the changed user's own top-N is rebuilt from the row;
+* a user that did not list the changed user only needs patching when the new
+  score beats their current Nth-best entry, which evicts that entry;
+* a user that did list the changed user keeps an exact list as long as the
+  new score is still at least their old Nth-best; otherwise the entry that
+  should replace it is unknown and their row is rescored.
+
+Entries compare like the batch path: higher score first, ties to the earlier
+user, so the lists always equal a full recompute over the same users.
+
+IncrementalMatcherManager holds one process's matcher. Building it is an
+all-pairs run, so it is seeded in a background thread from the user snapshot
+and profile writes skip the incremental path until it is ready; the seed then
+applies the records written since the snapshot was loaded. Once the snapshot
+has been reloaded, the next write reseeds, at most once every
+INCREMENTAL_RESEED_SECONDS, so every worker process converges on the users
+table.
+"""
+
+import threading
+import time
+
+from bisect import insort
+
+import numpy as np
+
+from .matching_engine import MatchingEngine, DEFAULT_BLOCK_SIZE
+from .supabase_service import SupabaseService
+
+incremental_matchers = None
+
+# Floor of a list that still has room: every candidate beats it
+OPEN_FLOOR = np.iinfo(np.int64).min
+
+
+class IncrementalMatcher:
+    """Every user's top-N over a MatchingEngine, patched one user at a time."""
+
+    def __init__(self, users, top_n=5, scorer=None, block_size=DEFAULT_BLOCK_SIZE):
+        self.engine = MatchingEngine(users, scorer)
+        self.top_n = top_n
+
+        n = len(self.engine)
+        # Per position: [(-score in thousandths, match position), ...] best first
+        self.top = [[] for _ in range(n)]
+        self.listed_by = [set() for _ in range(n)]
+        # The Nth-best entry of every list, for the vectorized threshold test
+        self.floor_milli = np.full(n, OPEN_FLOOR, dtype=np.int64)
+        self.floor_pos = np.zeros(n, dtype=np.intp)
+
+        for i, matches in self.engine.iter_top_matches(top_n, block_size=block_size):
+            self._set_top(i, [(-round(score * 1000), j) for score, j in matches])
+
+    def __len__(self):
+        return len(self.engine)
+
+    def top_matches(self, i):
+        """Return user i's top-N as [(score, match_index), ...], best first."""
+        return [(-milli / 1000, j) for milli, j in self.top[i]]
+
+    def _capacity(self):
+        return min(self.top_n, len(self) - 1)
+
+    def _set_top(self, i, entries):
+        """Replace user i's list, keeping the reverse index and floor in step."""
+        for _, j in self.top[i]:
+            self.listed_by[j].discard(i)
+        for _, j in entries:
+            self.listed_by[j].add(i)
+        self.top[i] = entries
+        self._update_floor(i)
+
+    def _update_floor(self, i):
+        entries = self.top[i]
+        if entries and len(entries) >= self._capacity():
+            self.floor_milli[i] = -entries[-1][0]
+            self.floor_pos[i] = entries[-1][1]
+        else:
+            self.floor_milli[i] = OPEN_FLOOR
+
+    def _rescore_row(self, i):
+        matches = self.engine.top_matches_for(i, self.top_n)
+        self._set_top(i, [(-round(score * 1000), j) for score, j in matches])
+
+    def _grow(self):
+        """Make room for a user appended to the engine."""
+        self.top.append([])
+        self.listed_by.append(set())
+        self.floor_milli = np.append(self.floor_milli, OPEN_FLOOR)
+        self.floor_pos = np.append(self.floor_pos, 0)
+        # While the population is smaller than top_n, one more candidate opens
+        # a slot in every list
+        if len(self) - 1 <= self.top_n:
+            for v in range(len(self)):
+                self._update_floor(v)
+
+    def upsert_user(self, user):
+        """
+        Apply a new or changed user and patch every affected top-N list.
+
+        Returns (position, changed) where ``changed`` is the set of positions
+        whose top-N list changed, the upserted user included.
+        """
+        engine = self.engine
+        is_new = user['id'] not in engine.positions
+        i = engine.upsert(user)
+        if is_new:
+            self._grow()
+
+        self._rescore_row(i)
+        changed = {i}
+
+        # Everyone's score towards user i, in thousandths
+        column = engine.score_block(slice(None), slice(i, i + 1))[:, 0]
+        milli = np.rint(column * 1000).astype(np.int64)
+
+        # Lists that held user i: drop the old entry, then either re-insert it
+        # exactly or rescore the row when a non-listed user might now rank higher
+        for v in list(self.listed_by[i]):
+            entries = self.top[v]
+            before = list(entries)
+            entry = (-int(milli[v]), i)
+            if self.floor_milli[v] == OPEN_FLOOR or entry <= entries[-1]:
+                entries.remove(next(e for e in entries if e[1] == i))
+                insort(entries, entry)
+                self._update_floor(v)
+            else:
+                self._rescore_row(v)
+            if self.top[v] != before:
+                changed.add(v)
+
+        # Lists that did not hold user i: insert where the new score beats the
+        # Nth-best entry (or the list still has room), evicting that entry
+        beats = (milli > self.floor_milli) | ((milli == self.floor_milli) & (i < self.floor_pos))
+        beats |= self.floor_milli == OPEN_FLOOR
+        beats[i] = False
+        for v in np.flatnonzero(beats):
+            if v in self.listed_by[i]:
+                continue
+            entries = self.top[v]
+            insort(entries, (-int(milli[v]), i))
+            self.listed_by[i].add(v)
+            if len(entries) > self._capacity():
+                _, evicted = entries.pop()
+                self.listed_by[evicted].discard(v)
+            self._update_floor(v)
+            changed.add(v)
+
+        return i, changed
+
+
+class IncrementalMatcherManager:
+    """Holds this process's IncrementalMatcher and (re)seeds it in the background."""
+
+    def __init__(self, app, reseed_seconds):
+        self.app = app
+        self.reseed_seconds = reseed_seconds
+        # Held while a matcher is read and patched, and while a seed swaps one in
+        self.lock = threading.Lock()
+        self._matcher = None
+        self._seeding = False
+        self._seeded_from = 0.0  # loaded_at of the snapshot the matcher was seeded from
+        self._seeded_at = 0.0
+
+    def matcher(self, snapshot, top_n, scorer):
+        """
+        Return the seeded matcher for top_n, or None while there is none; call
+        with ``lock`` held. Starts a seed when there is no matcher, and a reseed
+        when ``snapshot`` was loaded after the matcher's and the last seed is
+        at least reseed_seconds old.
+        """
+        matcher = self._matcher
+        if matcher is None or matcher.top_n != top_n:
+            self._seed_in_background(top_n, scorer)
+            return None
+        if snapshot.loaded_at > self._seeded_from and time.time() - self._seeded_at >= self.reseed_seconds:
+            self._seed_in_background(top_n, scorer)
+        return matcher
+
+    def _seed_in_background(self, top_n, scorer):
+        if self._seeding:
+            return
+        self._seeding = True
+        threading.Thread(target=self._seed, args=(top_n, scorer), name="incremental-seed", daemon=True).start()
+
+    def _seed(self, top_n, scorer):
+        """Build a matcher from the current snapshot, apply the records written since its load and swap it in."""
+        from .user_snapshot import get_user_snapshot
+
+        try:
+            with self.app.app_context():
+                started = time.perf_counter()
+                snapshot = get_user_snapshot()
+                # The all-pairs build runs outside the lock; writes skip until the swap
+                matcher = IncrementalMatcher(snapshot.users, top_n, scorer=scorer)
+                entries = []
+                with self.lock:
+                    for user in list(snapshot.written.values()):
+                        entries += scorer.apply_to_matcher(matcher, user)[1]
+                    self._matcher = matcher
+                    self._seeded_from = snapshot.loaded_at
+                    self._seeded_at = time.time()
+                SupabaseService.store_recommendations(entries)
+                self.app.logger.info(
+                    f"Seeded incremental matcher with {len(matcher)} users in "
+                    f"{(time.perf_counter() - started) * 1000:.1f} ms"
+                )
+        except Exception as e:
+            self.app.logger.error(f"Error seeding incremental matcher: {str(e)}")
+        finally:
+            with self.lock:
+                self._seeding = False
+
+
+def init_incremental_matcher(app):
+    global incremental_matchers
+    incremental_matchers = IncrementalMatcherManager(app, app.config.get('INCREMENTAL_RESEED_SECONDS', 300))
+
+
+def get_incremental_matchers():
+    """Return the process-wide IncrementalMatcherManager."""
+    if incremental_matchers is None:
+        raise RuntimeError("Incremental matching is not initialized")
+    return incremental_matchers
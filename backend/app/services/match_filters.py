@@ -0,0 +1,99 @@
+"""
+Hard filters for recommendations, such as ``location=Berlin&stage=Prototype``.
+
+Every filter names a users column. Repeating a column filter accepts any of
+its values, and repeating must_have_skill requires all of the skills. The
+same filters can be applied in two places:
+
+- ``apply_filters`` pushes them into a Supabase query as ``.eq``, ``.in_``
+  and ``.contains`` clauses, so rows that fail them never leave the database.
+- ``FilterBitmaps`` evaluates them over a snapshot's users with one boolean
+  mask per column value, built on first use and cached for the snapshot's
+  lifetime. The scoring kernel drops the users outside the mask before
+  scoring them.
+"""
+
+import numpy as np
+
+# Query parameter: users column it filters on
+FILTER_COLUMNS = {
+    "location": "location",
+    "stage": "startup_stage",
+    "availability": "availability",
+    "must_have_skill": "skills",
+}
+
+# Filters on array columns, which match users holding every given value
+ARRAY_FILTERS = {"must_have_skill"}
+
+
+def parse_filters(args):
+    """Return {filter: (value, ...)} for the filters present in request args."""
+    filters = {}
+    for name in FILTER_COLUMNS:
+        values = tuple(dict.fromkeys(v for v in args.getlist(name) if v))
+        if values:
+            filters[name] = values
+    return filters
+
+
+def describe_filters(filters):
+    """Render filters as ``name=value`` pairs for log lines."""
+    return ", ".join(f"{name}={'|'.join(values)}" for name, values in filters.items())
+
+
+def apply_filters(query, filters):
+    """Add the filters to a Supabase query builder as WHERE clauses."""
+    for name, values in filters.items():
+        column = FILTER_COLUMNS[name]
+        if name in ARRAY_FILTERS:
+            query = query.contains(column, list(values))
+        elif len(values) == 1:
+            query = query.eq(column, values[0])
+        else:
+            query = query.in_(column, list(values))
+    return query
+
+
+class FilterBitmaps:
+    """Per-value boolean masks over a list of users, for the columns in FILTER_COLUMNS."""
+
+    def __init__(self, users):
+        self.users = users
+        self.n = len(users)
+        self._masks = {}
+
+    def _column_masks(self, name):
+        masks = self._masks.get(name)
+        if masks is None:
+            column = FILTER_COLUMNS[name]
+            postings = {}
+            for i, user in enumerate(self.users):
+                values = (user.get(column) or []) if name in ARRAY_FILTERS else [user.get(column)]
+                for value in values:
+                    postings.setdefault(value, []).append(i)
+            masks = {}
+            for value, positions in postings.items():
+                mask = np.zeros(self.n, dtype=bool)
+                mask[positions] = True
+                mask.flags.writeable = False
+                masks[value] = mask
+            # Built once per column; a racing thread builds an identical dict
+            self._masks[name] = masks
+        return masks
+
+    def mask(self, filters):
+        """Boolean mask of the users that pass every filter."""
+        allowed = np.ones(self.n, dtype=bool)
+        for name, values in filters.items():
+            masks = self._column_masks(name)
+            empty = np.zeros(self.n, dtype=bool)
+            if name in ARRAY_FILTERS:
+                for value in values:
+                    allowed &= masks.get(value, empty)
+            else:
+                passing = empty
+                for value in values:
+                    passing = passing | masks.get(value, empty)
+                allowed &= passing
+        return allowed
@@ -0,0 +1,257 @@
+"""
+Background jobs for long-running matching work, such as generate-all.
+
+Submitting a job records it and returns at once; a worker thread in the same
+process runs it inside an app context. Jobs and their progress live in a
+SQLite table at MATCH_JOBS_DB (match_jobs.sqlite3 in the app's instance folder
+by default). Every worker process of the app sees the same jobs, and a partial
+unique index keeps at most one queued or running job per dataset across all of
+them. ":memory:" keeps jobs in the process, which only suits a single worker.
+
+A heartbeat thread refreshes a running job's row, whatever phase it is in. An
+active job whose row is older than MATCH_JOB_STALE_SECONDS belongs to a
+process that died, and no longer blocks its dataset. State changes only apply
+to a job still in the state they expect, so a job marked abandoned is never
+revived by the run that was presumed dead.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from .supabase_service import SupabaseService
+
+match_jobs = None
+
+ACTIVE_STATES = ("queued", "running")
+
+# Seconds between progress writes of a running job
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+# Longest wait between heartbeats of a running job (shorter if the stale
+# threshold calls for it)
+HEARTBEAT_SECONDS = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS match_jobs (
+    id TEXT PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    state TEXT NOT NULL,
+    phase TEXT,
+    total_users INTEGER,
+    users_processed INTEGER NOT NULL DEFAULT 0,
+    pairs_scored INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    scoring_started_at REAL,
+    updated_at REAL NOT NULL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS match_jobs_one_active
+    ON match_jobs (dataset) WHERE state IN ('queued', 'running');
+"""
+
+
+class JobConflict(Exception):
+    """Raised when a dataset already has a queued or running job."""
+
+    def __init__(self, job):
+        super().__init__(f"Job {job['id']} is already {job['state']} for {job['dataset']}")
+        self.job = job
+
+
+class JobProgress:
+    """Handle a running job reports its phase and counts through."""
+
+    def __init__(self, jobs, job_id):
+        self.jobs = jobs
+        self.job_id = job_id
+        self.total_users = None
+        self.users_processed = 0
+        self._reported_at = 0.0
+
+    def phase(self, name, total_users=None):
+        """Enter a new phase; the first one with total_users starts the scoring clock."""
+        fields = {"phase": name}
+        if total_users is not None:
+            self.total_users = total_users
+            fields.update(total_users=total_users, scoring_started_at=time.time())
+        self.jobs._update(self.job_id, "running", **fields)
+
+    def advance(self, users=1):
+        """Count processed users; written at most every PROGRESS_INTERVAL_SECONDS."""
+        self.users_processed += users
+        now = time.time()
+        if now - self._reported_at >= PROGRESS_INTERVAL_SECONDS or self.users_processed == self.total_users:
+            self._reported_at = now
+            self.jobs._update(
+                self.job_id,
+                "running",
+                users_processed=self.users_processed,
+                # Each user's row is scored against every other user
+                pairs_scored=self.users_processed * max((self.total_users or 1) - 1, 0),
+            )
+
+
+class MatchJobQueue:
+    """SQLite-backed job table with an in-process worker thread."""
+
+    def __init__(self, app, path=":memory:", stale_seconds=600):
+        self.app = app
+        self.stale_seconds = stale_seconds
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(SCHEMA)
+        self._db_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, dataset, kind, run):
+        """
+        Record a job and queue ``run(progress)`` for the worker thread. Returns
+        the job; raises JobConflict if the dataset already has an active job.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                active = self._db.execute(
+                    "SELECT * FROM match_jobs WHERE dataset = ? AND state IN (?, ?)", (dataset, *ACTIVE_STATES)
+                ).fetchone()
+                if active is not None and now - active["updated_at"] > self.stale_seconds:
+                    self._db.execute(
+                        "UPDATE match_jobs SET state = 'failed', error = 'abandoned', finished_at = ? WHERE id = ?",
+                        (now, active["id"]),
+                    )
+                elif active is not None:
+                    raise JobConflict(self._as_dict(active))
+                self._db.execute(
+                    "INSERT INTO match_jobs (id, dataset, kind, state, phase, created_at, updated_at) "
+                    "VALUES (?, ?, ?, 'queued', 'queued', ?, ?)",
+                    (job_id, dataset, kind, now, now),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+        self._queue.put((job_id, run))
+        self._start()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Return a job as a dict with its rate and ETA, or None if it does not exist."""
+        with self._db_lock:
+            row = self._db.execute("SELECT * FROM match_jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else self._as_dict(row)
+
+    def _update(self, job_id, expected, **fields):
+        """Update a job that is in the ``expected`` state; returns whether it was."""
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._db_lock:
+            cursor = self._db.execute(
+                f"UPDATE match_jobs SET {assignments} WHERE id = ? AND state = ?", (*fields.values(), job_id, expected)
+            )
+        return cursor.rowcount > 0
+
+    def _heartbeat(self, job_id, stop):
+        interval = min(HEARTBEAT_SECONDS, self.stale_seconds / 3)
+        while not stop.wait(interval):
+            if not self._update(job_id, "running"):
+                return
+
+    @staticmethod
+    def _as_dict(row):
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        started = job.pop("scoring_started_at")
+        elapsed = (job["finished_at"] or job["updated_at"]) - started if started else 0
+        processed = job["users_processed"]
+        job["pairs_per_second"] = job["pairs_scored"] / elapsed if elapsed > 0 else None
+        job["eta_seconds"] = None
+        if job["state"] == "running" and job["total_users"] and processed and elapsed > 0:
+            job["eta_seconds"] = (job["total_users"] - processed) * elapsed / processed
+        return job
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="match-jobs", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            job_id, run = self._queue.get()
+            if not self._update(job_id, "queued", state="running", phase="starting", started_at=time.time()):
+                self.app.logger.warning(f"Match job {job_id} was abandoned before it started")
+                continue
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, stop), daemon=True)
+            heartbeat.start()
+            try:
+                with self.app.app_context():
+                    result = run(JobProgress(self, job_id))
+                finished = self._update(job_id, "running", state="succeeded", phase="done", finished_at=time.time(),
+                                        result=json.dumps(result, default=str))
+            except Exception as e:
+                self.app.logger.error(f"Error running match job {job_id}: {str(e)}")
+                finished = self._update(job_id, "running", state="failed", finished_at=time.time(), error=str(e))
+            finally:
+                stop.set()
+                heartbeat.join()
+            if not finished:
+                self.app.logger.warning(f"Match job {job_id} finished after it was marked abandoned")
+
+
+def generate_all_matches(progress, top_n=5, store_top_k=None):
+    """Job body: generate every user's matches and store the delta, reporting progress."""
+    from .matching_service import get_matching_service, FEATURE_COLUMNS
+
+    progress.phase("loading users")
+    matching_service = get_matching_service()
+
+    def user_pages():
+        # Counted as they stream into the engine, instead of loading every user up front
+        loaded = 0
+        for page in SupabaseService.iter_users(columns=FEATURE_COLUMNS):
+            loaded += len(page)
+            yield page
+        progress.phase("scoring", total_users=loaded)
+
+    def match_rows():
+        for user_id, user_matches in matching_service.iter_matches_for_all_users(
+            top_n=top_n, store_top_k=store_top_k, pages=user_pages()
+        ):
+            progress.advance()
+            for match in user_matches:
+                yield SupabaseService.match_row(int(user_id), match['match_id'], match['score'], match['explanation'])
+        progress.phase("finishing writes")
+
+    # Each batch of users is diffed against their stored matches as it is scored
+    return SupabaseService.store_match_deltas(match_rows())
+
+
+def init_match_jobs(app):
+    global match_jobs
+    path = app.config.get('MATCH_JOBS_DB')
+    if not path:
+        os.makedirs(app.instance_path, exist_ok=True)
+        path = os.path.join(app.instance_path, 'match_jobs.sqlite3')
+    match_jobs = MatchJobQueue(app, path, app.config.get('MATCH_JOB_STALE_SECONDS', 600))
+
+
+def get_match_jobs():
+    """Return the process-wide MatchJobQueue."""
+    if match_jobs is None:
+        raise RuntimeError("Match jobs are not initialized")
+    return match_jobs
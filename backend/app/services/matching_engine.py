@@ -0,0 +1,563 @@
+"""
+Vectorized scoring engine for the co-founder matching algorithm.
+
+Users are compiled once into CompiledProfile records and encoded into feature
+matrices (skill counts, multi-hot interests, ordinal goal and stage codes,
+categorical location, availability and collab_style codes). Scores for many
+pairs are then computed with matrix products and lookup tables instead of
+calling the per-pair factor functions.
+
+The factor lookup tables are built by calling the scalar factor functions of
+MatchingService on each distinct code, so the engine always agrees with
+``MatchingService._weighted_score`` to the same 3-decimal rounding.
+"""
+
+import numpy as np
+
+from .matching_service import MatchingService, WEIGHTS, bit_indices
+from .bio_vectors import BioVectorStore, bio_norms
+
+# Number of users per side of a score tile when walking the score matrix
+DEFAULT_BLOCK_SIZE = 1024
+
+# Rough count of block_size x block_size float64 temporaries alive while one
+# tile is scored and folded; used to turn a memory budget into a tile size
+TILE_TEMPORARIES = 10
+MIN_BLOCK_SIZE = 64
+
+# Arrays that fully describe an encoded population for scoring
+FEATURE_ARRAYS = (
+    "skill_counts", "complement", "interest_hot",
+    "goal_codes", "goal_table", "stage_codes", "stage_table", "location_codes",
+    "availability_codes", "availability_table", "collab_codes", "collab_table",
+    "bio_counts", "bio_norms",
+)
+
+# Profile code attribute -> lookup table it indexes
+CODE_TABLES = (
+    ("goals", "goal_table"),
+    ("startup_stage", "stage_table"),
+    ("availability", "availability_table"),
+    ("collab_style", "collab_table"),
+)
+
+# Sort key marking an empty top-N slot (or an excluded self pair)
+EMPTY_KEY = np.iinfo(np.int64).min
+
+
+def block_size_for_budget(memory_budget_bytes):
+    """Largest square tile side whose scoring temporaries fit in the memory budget."""
+    side = int((memory_budget_bytes / (TILE_TEMPORARIES * 8)) ** 0.5)
+    return max(side, MIN_BLOCK_SIZE)
+
+
+def _representatives(profiles, attr):
+    """Return {code: first profile with that code in ``attr``}."""
+    representatives = {}
+    for profile in profiles:
+        representatives.setdefault(getattr(profile, attr), profile)
+    return representatives
+
+
+def _code_table(representatives, factor):
+    """
+    Build a lookup table indexed by code for a factor that only reads that code.
+
+    Evaluating the factor on one representative profile per distinct code
+    fills the table exactly.
+    """
+    size = max(representatives, default=0) + 1
+    table = np.zeros((size, size))
+    for codeA, profileA in representatives.items():
+        for codeB, profileB in representatives.items():
+            table[codeA, codeB] = factor(profileA, profileB)
+    return table
+
+
+def _one_hot(codes, size):
+    """Return a len(codes) x size matrix with a 1 at each code."""
+    codes = np.atleast_1d(codes)
+    matrix = np.zeros((len(codes), size))
+    matrix[np.arange(len(codes)), codes] = 1.0
+    return matrix
+
+
+class TopNAccumulator:
+    """
+    Running top-N per user, folded from streamed score blocks.
+
+    Each kept entry is a single int64 key packing the score in thousandths and
+    the candidate index, so memory stays at O(n * top_n) and ties break
+    deterministically towards the earlier user in the input order.
+
+    ``excluded`` is an optional boolean mask over candidates that are never
+    kept, and ``ceiling_key`` an optional key that kept entries must rank
+    below (to resume a ranking after a page of it).
+    """
+
+    def __init__(self, n, top_n, positions=None, excluded=None, ceiling_key=None):
+        self.n = n
+        self.top_n = max(top_n, 0)
+        self.excluded = excluded
+        self.ceiling_key = ceiling_key
+        # Only the users at ``positions`` are tracked (all of them by default)
+        positions = np.arange(n) if positions is None else np.asarray(positions)
+        self._slots = np.full(n, -1, dtype=np.intp)
+        self._slots[positions] = np.arange(len(positions))
+        self.keys = np.full((len(positions), self.top_n), EMPTY_KEY, dtype=np.int64)
+        self._positions = np.arange(n)
+
+    def fold(self, rows, cols, scores):
+        """Fold a users[rows] x users[cols] score block into the running top-N."""
+        if self.top_n == 0:
+            return
+        row_idx = self._positions[rows]
+        col_idx = self._positions[cols]
+        slots = self._slots[row_idx]
+
+        keys = np.rint(scores * 1000).astype(np.int64) * self.n + (self.n - 1 - col_idx)[None, :]
+        keys[row_idx[:, None] == col_idx[None, :]] = EMPTY_KEY
+        if self.excluded is not None:
+            keys[:, self.excluded[col_idx]] = EMPTY_KEY
+        if self.ceiling_key is not None:
+            keys[keys >= self.ceiling_key] = EMPTY_KEY
+
+        combined = np.concatenate([self.keys[slots], keys], axis=1)
+        kth = combined.shape[1] - self.top_n
+        self.keys[slots] = np.partition(combined, kth, axis=1)[:, kth:]
+
+    def merge(self, positions, keys):
+        """Fold packed keys kept by another accumulator for the users at ``positions``."""
+        if self.top_n == 0:
+            return
+        slots = self._slots[np.asarray(positions)]
+        combined = np.concatenate([self.keys[slots], keys], axis=1)
+        kth = combined.shape[1] - self.top_n
+        self.keys[slots] = np.partition(combined, kth, axis=1)[:, kth:]
+
+    def floor_key(self, i):
+        """Return the key a candidate must beat to enter user i's top-N (EMPTY_KEY while not full)."""
+        if self.top_n == 0:
+            return np.iinfo(np.int64).max
+        return int(self.keys[self._slots[i]].min())
+
+    def results(self, i):
+        """Return user i's [(score, match_index), ...] best first."""
+        matches = []
+        for key in sorted(self.keys[self._slots[i]].tolist(), reverse=True):
+            if key == EMPTY_KEY:
+                break
+            milli, rank = divmod(key, self.n)
+            matches.append((milli / 1000, self.n - 1 - rank))
+        return matches
+
+
+class MatchingEngine:
+    """Encodes a list of users into feature matrices and scores them in bulk."""
+
+    def __init__(self, users, scorer=None, bio_store_path=None):
+        self.users = list(users)
+        self.ids = [u['id'] for u in users]
+        self.scorer = scorer or MatchingService()
+        self.profiles = self.scorer.compiler.compile_all(users)
+        self.positions = {uid: i for i, uid in enumerate(self.ids)}
+        self._encode(bio_store_path)
+
+    @classmethod
+    def from_pages(cls, pages, scorer=None, bio_store_path=None):
+        """
+        Build an engine from an iterable of user lists, such as
+        SupabaseService.iter_users(). Each page is compiled, and its bios are
+        hashed, as soon as it arrives, so encoding overlaps with fetching the
+        next pages. The result equals MatchingEngine(all users).
+        """
+        engine = cls.__new__(cls)
+        engine.users = []
+        engine.scorer = scorer or MatchingService()
+        engine.profiles = []
+        compiler = engine.scorer.compiler
+        bio_pages = []
+        for page in pages:
+            profiles = compiler.compile_all(page)
+            engine.users.extend(page)
+            engine.profiles.extend(profiles)
+            if not bio_store_path:
+                bio_pages.append(compiler.bio.vectors([p.user.get("bio") for p in profiles], [p.bio for p in profiles]))
+        engine.ids = [p.id for p in engine.profiles]
+        engine.positions = {uid: i for i, uid in enumerate(engine.ids)}
+        bio_counts = np.concatenate(bio_pages) if bio_pages else None
+        engine._encode(bio_store_path, bio_counts)
+        return engine
+
+    @classmethod
+    def from_features(cls, features):
+        """
+        Build a scoring-only engine from ``feature_arrays()`` output.
+
+        The result has no users, profiles or scorer; it can score blocks and
+        rank positions, e.g. inside a worker process.
+        """
+        engine = cls.__new__(cls)
+        engine.users = engine.ids = engine.profiles = engine.scorer = engine.positions = None
+        for name, array in features.items():
+            setattr(engine, name, array)
+        engine._derive()
+        return engine
+
+    def __len__(self):
+        return len(self.goal_codes)
+
+    def feature_arrays(self):
+        """Return {name: ndarray} for every array the scoring methods read."""
+        return {name: getattr(self, name) for name in FEATURE_ARRAYS}
+
+    def _encode(self, bio_store_path=None, bio_counts=None):
+        """
+        Encode the compiled profiles into the matrices used by ``score_block``.
+        With bio_store_path the bio count matrix is a memory-mapped .npy file
+        aligned with the users, rebuilt from the previous file where bios are
+        unchanged; otherwise it is ``bio_counts`` when already encoded.
+        """
+        profiles = self.profiles
+        compiler = self.scorer.compiler
+        n = len(profiles)
+
+        # Skills: counts feed the complement product; the multi-hot overlap
+        # operand is derived from them per tile. float32 holds the small
+        # integer counts exactly at half the size of the widest matrix.
+        self.skill_counts = np.zeros((n, len(compiler.skill_names)), dtype=np.float32)
+        for i, profile in enumerate(profiles):
+            for skill_id in profile.skill_ids:
+                self.skill_counts[i, skill_id] += 1
+
+        # The complement skills lead the vocabulary, so the dense matrix only
+        # spans (and the product only reads) those leading count columns
+        self.complement = compiler.complement_matrix()
+
+        # Interests: multi-hot
+        self.interest_hot = np.zeros((n, len(compiler.interest_names)))
+        for i, profile in enumerate(profiles):
+            for interest_id in bit_indices(profile.interests):
+                self.interest_hot[i, interest_id] = 1.0
+
+        # Goals and stages: ordinal codes into small lookup tables
+        self.goal_codes = np.array([p.goals for p in profiles], dtype=np.intp)
+        self.stage_codes = np.array([p.startup_stage for p in profiles], dtype=np.intp)
+
+        # Location: categorical code, 0 = missing (synergy only on equal, non-empty codes)
+        self.location_codes = np.array([p.location for p in profiles], dtype=np.intp)
+
+        # Availability and collaboration style: categorical codes into lookup tables
+        self.availability_codes = np.array([p.availability for p in profiles], dtype=np.intp)
+        self.collab_codes = np.array([p.collab_style for p in profiles], dtype=np.intp)
+
+        # Bios: hashed term counts and their norms, so the cosine is one product
+        texts = [p.user.get("bio") for p in profiles]
+        if bio_store_path:
+            self.bio_counts = BioVectorStore(bio_store_path).write(compiler.bio, texts)
+        elif bio_counts is not None:
+            self.bio_counts = bio_counts
+        else:
+            self.bio_counts = compiler.bio.vectors(texts, [p.bio for p in profiles])
+        self.bio_norms = bio_norms(self.bio_counts)
+
+        self._representatives = {attr: _representatives(profiles, attr) for attr, _ in CODE_TABLES}
+        for attr, table_name in CODE_TABLES:
+            self._build_table(attr, table_name)
+
+        self._derive()
+
+    def _build_table(self, attr, table_name):
+        """(Re)build one code lookup table from the representatives seen so far."""
+        scorer = self.scorer
+        factors = {
+            "goals": lambda a, b: scorer._goal_alignment(a, b)[0],
+            "startup_stage": lambda a, b: scorer._stage_alignment(a, b)[0],
+            "availability": scorer._availability_synergy,
+            "collab_style": scorer._collab_style_synergy,
+        }
+        setattr(self, table_name, _code_table(self._representatives[attr], factors[attr]))
+
+    def upsert(self, user):
+        """
+        Encode a new or changed user in place and return its position.
+
+        Changed users keep their position; new users are appended, so the
+        positions of everyone else never move. Feature columns grow when the
+        user brings a skill or interest the population has not seen, and a
+        lookup table is rebuilt only when the user brings a new code.
+        """
+        compiler = self.scorer.compiler
+        profile = compiler.compile(user)
+
+        i = self.positions.get(profile.id)
+        if i is None:
+            i = len(self)
+            self.users.append(user)
+            self.ids.append(profile.id)
+            self.profiles.append(profile)
+            self.positions[profile.id] = i
+            for name in ("skill_counts", "interest_hot", "bio_counts"):
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate([array, np.zeros((1, array.shape[1]), dtype=array.dtype)]))
+            for name in ("goal_codes", "stage_codes", "location_codes", "availability_codes", "collab_codes", "bio_norms"):
+                setattr(self, name, np.append(getattr(self, name), 0))
+        else:
+            self.users[i] = user
+            self.profiles[i] = profile
+
+        # New vocabulary entries become new all-zero columns for everyone else
+        for name, width in (
+            ("skill_counts", len(compiler.skill_names)),
+            ("interest_hot", len(compiler.interest_names)),
+        ):
+            array = getattr(self, name)
+            if array.shape[1] < width:
+                setattr(self, name, np.pad(array, ((0, 0), (0, width - array.shape[1]))))
+
+        self.skill_counts[i] = 0
+        for skill_id in profile.skill_ids:
+            self.skill_counts[i, skill_id] += 1
+        self.interest_hot[i] = 0
+        self.interest_hot[i, list(bit_indices(profile.interests))] = 1.0
+
+        self.goal_codes[i] = profile.goals
+        self.stage_codes[i] = profile.startup_stage
+        self.location_codes[i] = profile.location
+        self.availability_codes[i] = profile.availability
+        self.collab_codes[i] = profile.collab_style
+
+        # A memory-mapped bio matrix is read-only; patch an in-memory copy
+        if not self.bio_counts.flags.writeable:
+            self.bio_counts = np.array(self.bio_counts)
+        self.bio_counts[i] = compiler.bio_vector(profile)
+        self.bio_norms[i] = bio_norms(self.bio_counts[i])
+
+        # Representatives stay valid after their user changes: the factor only
+        # reads the code, and the old record keeps the code it was chosen for
+        for attr, table_name in CODE_TABLES:
+            code = getattr(profile, attr)
+            if code not in self._representatives[attr]:
+                self._representatives[attr][code] = profile
+                self._build_table(attr, table_name)
+
+        self._derive()
+        return i
+
+    def _derive(self):
+        """Set up the views and flags derived from the feature arrays."""
+        self.complement_counts = self.skill_counts[:, :len(self.complement)]
+
+        # Startup symmetry check: the pair-once path is only valid when every
+        # lookup table is symmetric. A one-way complement matrix is still fine,
+        # since score_block_pair evaluates that term in both directions.
+        self.symmetric = all(
+            np.array_equal(table, table.T)
+            for table in (self.goal_table, self.stage_table, self.availability_table, self.collab_table)
+        )
+        self.complement_symmetric = np.array_equal(self.complement, self.complement.T)
+
+    def _skill_hot(self, rows):
+        """Skill multi-hot matrix of users[rows], derived from the counts."""
+        return (self.skill_counts[rows] > 0).astype(np.float64)
+
+    def _skill_overlap_term(self, rows, cols):
+        """Weighted shared-skill counts for users[rows] x users[cols]."""
+        return (self._skill_hot(rows) @ self._skill_hot(cols).T) * WEIGHTS["skill_overlap"]
+
+    def _complement_term(self, rows, cols, complement):
+        """Weighted complement synergy of users[rows] towards users[cols]."""
+        return (
+            (self.complement_counts[rows] @ complement @ self.complement_counts[cols].T)
+            * WEIGHTS["complementary_skills"]
+        )
+
+    def _profile_terms(self, rows, cols):
+        """Weighted interest, goal, stage, location, availability, collab style and bio terms."""
+        score = (self.interest_hot[rows] @ self.interest_hot[cols].T) * WEIGHTS["interest_overlap"]
+        score += (
+            self.goal_table[self.goal_codes[rows][:, None], self.goal_codes[cols][None, :]]
+            * WEIGHTS["goal_alignment"]
+        )
+        score += (
+            self.stage_table[self.stage_codes[rows][:, None], self.stage_codes[cols][None, :]]
+            * WEIGHTS["stage_alignment"]
+        )
+
+        locA = self.location_codes[rows][:, None]
+        locB = self.location_codes[cols][None, :]
+        score += ((locA == locB) & (locA != 0)) * WEIGHTS["location_synergy"]
+
+        score += (
+            self.availability_table[self.availability_codes[rows][:, None], self.availability_codes[cols][None, :]]
+            * WEIGHTS["availability_synergy"]
+        )
+        score += (
+            self.collab_table[self.collab_codes[rows][:, None], self.collab_codes[cols][None, :]]
+            * WEIGHTS["collab_style_synergy"]
+        )
+        score += self._bio_cosine(rows, cols) * WEIGHTS["bio_similarity"]
+        return score
+
+    def _bio_cosine(self, rows, cols):
+        """Bio cosine similarity for users[rows] x users[cols]; 0 where either bio is empty."""
+        dots = (self.bio_counts[rows] @ self.bio_counts[cols].T).astype(np.float64)
+        norms = self.bio_norms[rows][:, None] * self.bio_norms[cols][None, :]
+        return np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+
+    def embeddings(self, rows=slice(None)):
+        """
+        Return one vector per user in ``rows`` for inner-product search.
+
+        Together with ``query_vectors`` they factor the score: before rounding,
+        score_block(a, b) == query_vectors(a) @ embeddings(b).T. Segments are
+        skill multi-hot, complement skill counts, interest multi-hot, one-hot
+        goal, stage, location (non-missing), availability and collab codes, and
+        the unit-length bio count vector.
+        """
+        return np.hstack([
+            self._skill_hot(rows),
+            self.complement_counts[rows],
+            self.interest_hot[rows],
+            _one_hot(self.goal_codes[rows], len(self.goal_table)),
+            _one_hot(self.stage_codes[rows], len(self.stage_table)),
+            _one_hot(self.location_codes[rows], self._location_size())[:, 1:],
+            _one_hot(self.availability_codes[rows], len(self.availability_table)),
+            _one_hot(self.collab_codes[rows], len(self.collab_table)),
+            self._unit_bios(rows),
+        ])
+
+    def query_vectors(self, rows=slice(None)):
+        """Return the vectors whose inner product with ``embeddings`` scores users[rows] against them."""
+        return np.hstack([
+            self._skill_hot(rows) * WEIGHTS["skill_overlap"],
+            (self.complement_counts[rows] @ self.complement) * WEIGHTS["complementary_skills"],
+            self.interest_hot[rows] * WEIGHTS["interest_overlap"],
+            self.goal_table[self.goal_codes[rows]] * WEIGHTS["goal_alignment"],
+            self.stage_table[self.stage_codes[rows]] * WEIGHTS["stage_alignment"],
+            _one_hot(self.location_codes[rows], self._location_size())[:, 1:] * WEIGHTS["location_synergy"],
+            self.availability_table[self.availability_codes[rows]] * WEIGHTS["availability_synergy"],
+            self.collab_table[self.collab_codes[rows]] * WEIGHTS["collab_style_synergy"],
+            self._unit_bios(rows) * WEIGHTS["bio_similarity"],
+        ])
+
+    def _unit_bios(self, rows):
+        counts = np.asarray(self.bio_counts[rows], dtype=np.float64)
+        norms = self.bio_norms[rows][:, None]
+        return np.divide(counts, norms, out=np.zeros_like(counts), where=norms > 0)
+
+    def _location_size(self):
+        return int(self.location_codes.max(initial=0)) + 1
+
+    def score_block(self, rows, cols):
+        """
+        Return the weighted score matrix for users[rows] x users[cols].
+
+        ``rows`` and ``cols`` may be slices or index arrays. Self pairs are not
+        masked here; callers decide how to exclude them.
+        """
+        score = self._skill_overlap_term(rows, cols)
+        score += self._complement_term(rows, cols, self.complement)
+        score += self._profile_terms(rows, cols)
+        return np.round(score, 3)
+
+    def score_block_pair(self, rows, cols):
+        """
+        Score users[rows] x users[cols] in both directions at once.
+
+        Returns (forward, backward) where forward[i, j] scores rows[i] -> cols[j]
+        and backward[i, j] scores cols[j] -> rows[i]. The symmetric factors are
+        computed once; only the complement term is evaluated per direction, and
+        only when the complement matrix is one-way.
+        """
+        shared = self._skill_overlap_term(rows, cols)
+        profile = self._profile_terms(rows, cols)
+
+        forward = shared + self._complement_term(rows, cols, self.complement)
+        forward += profile
+        if self.complement_symmetric:
+            backward = forward
+        else:
+            backward = shared + self._complement_term(rows, cols, self.complement.T)
+            backward += profile
+        return np.round(forward, 3), np.round(backward, 3)
+
+    def score_matrix(self, symmetric=None, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Return the full N x N score matrix with self pairs set to -inf.
+
+        In symmetric mode each unordered pair of row blocks is scored once and
+        mirrored into both users' rows. ``symmetric=None`` picks symmetric mode
+        whenever the startup check found the lookup tables symmetric.
+        """
+        if symmetric is None:
+            symmetric = self.symmetric
+        if symmetric and not self.symmetric:
+            raise ValueError("Scoring tables are not symmetric; use the directed mode")
+
+        n = len(self)
+        scores = np.empty((n, n))
+        for start in range(0, n, block_size):
+            rows = slice(start, min(start + block_size, n))
+            if symmetric:
+                cols = slice(start, n)
+                forward, backward = self.score_block_pair(rows, cols)
+                scores[rows, cols] = forward
+                scores[cols, rows] = backward.T
+            else:
+                scores[rows] = self.score_block(rows, slice(None))
+
+        np.fill_diagonal(scores, -np.inf)
+        return scores
+
+    def iter_top_matches(self, top_n, symmetric=None, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Yield (index, [(score, match_index), ...]) for every user, best first.
+
+        The score matrix is walked in block_size x block_size tiles that are
+        folded into a TopNAccumulator, so memory is bounded by one tile plus
+        O(n * top_n). Users are yielded row block by row block, as soon as no
+        later tile can change their top_n.
+        """
+        if symmetric is None:
+            symmetric = self.symmetric
+        if symmetric and not self.symmetric:
+            raise ValueError("Scoring tables are not symmetric; use the directed mode")
+
+        n = len(self)
+        accumulator = TopNAccumulator(n, top_n)
+        for row_start in range(0, n, block_size):
+            row_stop = min(row_start + block_size, n)
+            rows = slice(row_start, row_stop)
+
+            # In symmetric mode tiles left of the diagonal were already folded
+            # into these rows while earlier row blocks were processed
+            for col_start in range(row_start if symmetric else 0, n, block_size):
+                cols = slice(col_start, min(col_start + block_size, n))
+                if symmetric:
+                    forward, backward = self.score_block_pair(rows, cols)
+                    accumulator.fold(rows, cols, forward)
+                    # The diagonal tile already reached rows via forward
+                    if col_start != row_start:
+                        accumulator.fold(cols, rows, backward.T)
+                else:
+                    accumulator.fold(rows, cols, self.score_block(rows, cols))
+
+            for i in range(row_start, row_stop):
+                yield i, accumulator.results(i)
+
+    def top_matches(self, top_n, symmetric=None, block_size=DEFAULT_BLOCK_SIZE):
+        """Return every user's top_n as [(score, match_index), ...], best first."""
+        return [matches for _, matches in self.iter_top_matches(top_n, symmetric, block_size)]
+
+    def top_matches_for(self, i, top_n):
+        """
+        Return user i's top_n as [(score, match_index), ...], best first.
+
+        The whole row is one block, so the complement term is a single
+        x_A . M . X^T product against every other user.
+        """
+        accumulator = TopNAccumulator(len(self), top_n, positions=[i])
+        rows = slice(i, i + 1)
+        accumulator.fold(rows, slice(None), self.score_block(rows, slice(None)))
+        return accumulator.results(i)
@@ -1,6 +1,14 @@
-import itertools
-from collections import defaultdict
+import time
+import heapq
+import json
+import base64
+import hashlib
+import threading
+import numpy as np
+from flask import current_app
 from .supabase_service import SupabaseService
+from .bio_vectors import BioVectorizer, BIO_DIMENSION, bio_hash, bio_norms
+from .match_filters import describe_filters
 
 # Imported weights and mappings from complete_matchmaking.py
 WEIGHTS = {
@@ -11,7 +19,8 @@ WEIGHTS = {
     "stage_alignment": 2.0,
     "location_synergy": 1.0,
     "availability_synergy": 0.5,
-    "collab_style_synergy": 1.0
+    "collab_style_synergy": 1.0,
+    "bio_similarity": 1.0
 }
 
 # Numeric mapping for startup stages (the closer, the more aligned)
@@ -57,112 +66,639 @@ COLLAB_STYLE_SYNERGY = {
     ("Connector", "Visionary"): 0.7,
 }
 
+# User fields the score reads; a change to any of them changes the profile version
+PROFILE_FIELDS = ("skills", "interests", "goals", "startup_stage", "location", "availability", "collab_style", "bio")
+
+# Columns the matcher reads. Heavier profile fields (education, work
+# experience, ...) are only loaded for the users a response returns
+FEATURE_COLUMNS = ",".join(("id",) + PROFILE_FIELDS)
+
+def _version(payload):
+    """Short stable hash of a JSON-serializable payload."""
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def profile_version(user):
+    """Version of the scored part of a user's profile."""
+    return _version({field: user.get(field) for field in PROFILE_FIELDS})
+
+# Changes whenever a weight, mapping or synergy table changes, which makes
+# every stored top-K entry stale at once
+SCORING_CONFIG_VERSION = _version(
+    [WEIGHTS, STAGE_MAPPING, GOAL_MAPPING, COMPLEMENT_MATRIX, sorted(COLLAB_STYLE_SYNERGY.items()), BIO_DIMENSION]
+)
+
+# Store entries written per request by the batch path
+RECOMMENDATION_STORE_BATCH = 500
+
+# Outcomes of top-K store lookups in this process
+recommendation_stats = {"hit": 0, "miss": 0, "stale": 0}
+_stats_lock = threading.Lock()
+
+def _popcount(bits):
+    """Number of set bits in a non-negative int bitset."""
+    return bin(bits).count("1")
+
+
+def bit_indices(bits):
+    """Yield the indices of the set bits in an int bitset, lowest first."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class CompiledProfile:
+    """
+    Compact scoring record compiled once from a user dict.
+
+    Field names mirror the user dict, but hold interned values: skills and
+    interests are int bitsets, goals and startup_stage are ordinal codes
+    (0 = unknown), and location, availability and collab_style are
+    categorical codes (0 = missing), and bio is the content hash of the bio
+    text. ``user`` keeps the source dict for responses.
+    """
+    __slots__ = (
+        "id", "skills", "skill_ids", "interests", "goals", "startup_stage",
+        "location", "availability", "student", "collab_style", "bio", "user",
+    )
+
+
+class ProfileCompiler:
+    """Interns profile vocabularies and compiles user dicts into CompiledProfile records."""
+    
+    def __init__(self):
+        self.skill_vocab = {}
+        self.skill_names = []
+        self.interest_vocab = {}
+        self.interest_names = []
+        # Code 0 is reserved for a missing value in the categorical vocabularies
+        self.location_vocab = {}
+        self.availability_vocab = {}
+        self.collab_vocab = {}
+        # Bio term-count vectors, cached by bio content hash
+        self.bio = BioVectorizer()
+        
+        # COMPLEMENT_MATRIX as {skill id: {skill id: synergy}}. Its skills are
+        # interned first, so they occupy ids [0, complement_size)
+        self.complement = {}
+        for skillA, row in COMPLEMENT_MATRIX.items():
+            for skillB, val in row.items():
+                if val > 0:
+                    self.complement.setdefault(self._skill_id(skillA), {})[self._skill_id(skillB)] = val
+        self.complement_size = len(self.skill_names)
+        self._complement_matrix = None
+        
+        # COLLAB_STYLE_SYNERGY as {(code, code): synergy}, direct key before reversed
+        self.collab_synergy = {}
+        for (styleA, styleB), val in COLLAB_STYLE_SYNERGY.items():
+            self.collab_synergy[(self._code(self.collab_vocab, styleA), self._code(self.collab_vocab, styleB))] = val
+        for (styleA, styleB), val in COLLAB_STYLE_SYNERGY.items():
+            self.collab_synergy.setdefault(
+                (self._code(self.collab_vocab, styleB), self._code(self.collab_vocab, styleA)), val
+            )
+    
+    def _skill_id(self, skill):
+        if skill not in self.skill_vocab:
+            self.skill_vocab[skill] = len(self.skill_names)
+            self.skill_names.append(skill)
+        return self.skill_vocab[skill]
+    
+    def _interest_id(self, interest):
+        if interest not in self.interest_vocab:
+            self.interest_vocab[interest] = len(self.interest_names)
+            self.interest_names.append(interest)
+        return self.interest_vocab[interest]
+    
+    @staticmethod
+    def _code(vocab, value):
+        if not value:
+            return 0
+        return vocab.setdefault(value, len(vocab) + 1)
+    
+    def complement_matrix(self):
+        """Dense complement_size x complement_size array of COMPLEMENT_MATRIX over skill ids."""
+        if self._complement_matrix is None:
+            matrix = np.zeros((self.complement_size, self.complement_size))
+            for skillA, row in self.complement.items():
+                for skillB, val in row.items():
+                    matrix[skillA, skillB] = val
+            self._complement_matrix = matrix
+        return self._complement_matrix
+    
+    def compile(self, user):
+        """Compile one user dict into a CompiledProfile."""
+        profile = CompiledProfile()
+        profile.id = user['id']
+        profile.skill_ids = tuple(self._skill_id(s) for s in user.get("skills") or [])
+        profile.skills = 0
+        for skill_id in profile.skill_ids:
+            profile.skills |= 1 << skill_id
+        profile.interests = 0
+        for interest in user.get("interests") or []:
+            profile.interests |= 1 << self._interest_id(interest)
+        profile.goals = GOAL_MAPPING.get(user.get("goals"), 0)
+        profile.startup_stage = STAGE_MAPPING.get(user.get("startup_stage"), 0)
+        profile.location = self._code(self.location_vocab, user.get("location"))
+        availability = user.get("availability")
+        profile.availability = self._code(self.availability_vocab, availability)
+        profile.student = bool(availability) and "student" in availability.lower()
+        profile.collab_style = self._code(self.collab_vocab, user.get("collab_style"))
+        profile.bio = bio_hash(user.get("bio"))
+        profile.user = user
+        return profile
+    
+    def compile_all(self, users):
+        """Compile a list of user dicts, preserving order."""
+        return [self.compile(u) for u in users]
+    
+    def bio_vector(self, profile):
+        """Hashed term counts of a compiled profile's bio."""
+        return self.bio.vectors([profile.user.get("bio")], [profile.bio])[0]
+    
+    def skill_list(self, bits):
+        """Decode a skill bitset into skill names."""
+        return [self.skill_names[i] for i in bit_indices(bits)]
+    
+    def interest_list(self, bits):
+        """Decode an interest bitset into interest names."""
+        return [self.interest_names[i] for i in bit_indices(bits)]
+
+
+# Bio similarity at which an explanation mentions it
+BIO_MENTION_THRESHOLD = 0.2
+
+# Factor code (WEIGHTS key): the subscore it weighs
+FACTOR_SUBSCORES = {
+    "skill_overlap": "skill_overlap_count",
+    "complementary_skills": "complement_sum",
+    "interest_overlap": "interest_overlap_count",
+    "goal_alignment": "goal_val",
+    "stage_alignment": "stage_val",
+    "location_synergy": "location_val",
+    "availability_synergy": "availability_val",
+    "collab_style_synergy": "collab_style_val",
+    "bio_similarity": "bio_val",
+}
+
+def encode_cursor(score_val, match_id):
+    """Opaque pagination cursor for the ranked match (score_val, match_id)."""
+    payload = json.dumps([round(score_val * 1000), match_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Return (score in thousandths, match id) from encode_cursor; ValueError if malformed."""
+    try:
+        milli, match_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(milli), match_id
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
 class MatchingService:
     """Service for co-founder matching algorithm."""
     
-    def generate_matches_for_user(self, user_id, top_n=5):
+    def __init__(self):
+        self.compiler = ProfileCompiler()
+    
+    def compile_profile(self, user):
+        """Compile a user dict into the CompiledProfile record all scoring runs on."""
+        return self.compiler.compile(user)
+    
+    def generate_matches_for_user(self, user_id, top_n=5, explain=True):
         """Generate top matches for a specific user."""
-        # Get all users from Supabase
-        all_users = SupabaseService.get_users()
+        from .user_snapshot import get_user_snapshot
+
+        # Users, their encoded features and the candidate index come from the
+        # shared snapshot, so no request selects the whole users table
+        snapshot = get_user_snapshot()
+        engine = snapshot.engine
         
         # Get the user we're matching for
-        target_user = next((u for u in all_users if u['id'] == user_id), None)
-        if target_user is None:
+        target_index = engine.positions.get(user_id)
+        if target_index is None:
             return []
         
-        # Filter out the target user from potential matches
-        potential_matches = [u for u in all_users if u['id'] != user_id]
-        
-        # Compute match scores for all potential matches
-        match_results = []
-        
-        for other_user in potential_matches:
-            subs = self._compute_subscores(target_user, other_user)
-            score_val = self._weighted_score(subs)
-            
-            # Generate explanation
-            explanation = self._generate_explanation(target_user, other_user, subs, score_val)
-            
-            match_results.append({
-                "match_id": other_user['id'],
-                "score": score_val,
-                "explanation": explanation,
-                "user_data": other_user
-            })
-        
-        # Sort by score (descending) and take top N
-        match_results.sort(key=lambda x: x['score'], reverse=True)
-        top_matches = match_results[:top_n]
-        
-        return top_matches
-
-    def generate_matches_for_all_users(self, top_n=5):
-        """Generate top matches for all users."""
-        users = self.supabase.get_users()
-        
-        # We'll store results in recs_dict[user_id] = list of match infos
-        recs_dict = defaultdict(list)
-        
-        for userA, userB in itertools.permutations(users, 2):
-            uidA = userA['id']
-            uidB = userB['id']
-            
+        # Branch-and-bound over the inverted index: overlapping candidates are
+        # scored exactly, the rest only while their upper bound can still make
+        # the top N. Ties favour the earlier user like a stable sort would
+        started = time.perf_counter()
+        top_matches, stats = snapshot.index.top_matches_for(target_index, top_n)
+        current_app.logger.info(
+            f"Matched user {user_id} in {(time.perf_counter() - started) * 1000:.1f} ms: "
+            f"scored {stats['scored']}, pruned {stats['pruned']} of {stats['candidates']} candidates"
+        )
+        
+        # Explanations are rendered only for the matches we return, with the
+        # snapshot's scorer since the profiles use its vocabularies
+        target = engine.profiles[target_index]
+        return [
+            engine.scorer._match_result(target, engine.profiles[j], score_val, explain)
+            for score_val, j in top_matches
+        ]
+
+    def ranked_matches_page(self, user_id, limit=10, exclude_ids=(), cursor=None, explain=True, filters=None):
+        """
+        Return one page of a user's ranked matches as {"matches": [...], "next_cursor": ...}.
+
+        Users in exclude_ids, and with ``filters`` those that fail them, become
+        a bitmap over the snapshot that the scoring kernel applies before top-N
+        selection, so a page is only short when the candidates run out. Pass a
+        page's next_cursor back as ``cursor`` to get the matches ranked after it.
+        """
+        from .user_snapshot import get_user_snapshot
+
+        snapshot = get_user_snapshot()
+        engine = snapshot.engine
+        target_index = engine.positions.get(user_id)
+        if target_index is None:
+            return {"matches": [], "next_cursor": None}
+
+        n = len(engine)
+        excluded = np.zeros(n, dtype=bool)
+        excluded[[engine.positions[uid] for uid in exclude_ids if uid in engine.positions]] = True
+        if filters:
+            excluded |= ~snapshot.filters.mask(filters)
+
+        ceiling_key = None
+        if cursor:
+            milli, match_id = decode_cursor(cursor)
+            position = engine.positions.get(match_id)
+            # The cursor match's TopNAccumulator key; one that left the snapshot
+            # since resumes below its whole score
+            ceiling_key = milli * n + (0 if position is None else n - 1 - position)
+
+        # One extra match tells whether another page follows
+        top_matches, stats = snapshot.index.top_matches_for(
+            target_index, limit + 1, excluded=excluded, ceiling_key=ceiling_key
+        )
+        current_app.logger.info(
+            f"Ranked page for user {user_id}: {int(excluded.sum())} excluded, scored {stats['scored']}, "
+            f"pruned {stats['pruned']} of {stats['candidates']} candidates"
+        )
+        page = top_matches[:limit]
+        target = engine.profiles[target_index]
+        next_cursor = None
+        if len(top_matches) > limit and page:
+            score_val, j = page[-1]
+            next_cursor = encode_cursor(score_val, engine.ids[j])
+        return {
+            "matches": self._attach_user_data([
+                engine.scorer._match_result(target, engine.profiles[j], score_val, explain)
+                for score_val, j in page
+            ]),
+            "next_cursor": next_cursor,
+        }
+
+    def iter_matches_for_all_users(self, top_n=5, explain=True, workers=1, store_top_k=None, users=None, pages=None):
+        """
+        Yield (user_id, top matches) for every user as soon as its matches are final.
+        Scoring runs in tiles sized by MATCHING_MEMORY_BUDGET_MB; with workers > 1
+        it is sharded across a process pool. With store_top_k, each user's top
+        store_top_k (ids and scores) is also written to the recommendation store.
+        Users are read from the database unless a list of them, or an iterable
+        of pages of them, is passed in.
+        """
+        from .matching_engine import MatchingEngine, block_size_for_budget
+        from .parallel_matching import iter_top_matches_parallel
+
+        bio_store_path = current_app.config.get('BIO_VECTOR_PATH')
+        if users is None:
+            # Pages are encoded as they arrive from the parallel range reader
+            if pages is None:
+                pages = SupabaseService.iter_users(columns=FEATURE_COLUMNS)
+            engine = MatchingEngine.from_pages(pages, scorer=self, bio_store_path=bio_store_path)
+        else:
+            engine = MatchingEngine(users, scorer=self, bio_store_path=bio_store_path)
+        if len(engine) < 2:
+            return
+        
+        if not engine.symmetric:
+            current_app.logger.warning("Scoring tables are not symmetric; scoring every directed pair")
+        block_size = block_size_for_budget(current_app.config.get('MATCHING_MEMORY_BUDGET_MB', 256) * 2**20)
+        
+        # Score tile by tile, keeping only each user's running top N
+        ranked_n = max(top_n, store_top_k or 0)
+        if workers > 1:
+            ranked = iter_top_matches_parallel(engine, ranked_n, workers, block_size)
+        else:
+            ranked = engine.iter_top_matches(ranked_n, block_size=block_size)
+        
+        entries = []
+        try:
+            for i, matches in ranked:
+                profileA = engine.profiles[i]
+                if store_top_k:
+                    entries.append(self.recommendation_entry(
+                        profileA.user, [(score_val, engine.ids[j]) for score_val, j in matches[:store_top_k]], store_top_k
+                    ))
+                    if len(entries) >= RECOMMENDATION_STORE_BATCH:
+                        SupabaseService.store_recommendations(entries)
+                        entries = []
+                yield str(profileA.id), [
+                    self._match_result(profileA, engine.profiles[j], score_val, explain)
+                    for score_val, j in matches[:top_n]
+                ]
+        finally:
+            SupabaseService.store_recommendations(entries)
+
+    def generate_matches_for_all_users(self, top_n=5, explain=True, workers=1):
+        """Generate top matches for all users, as {user_id: [match, ...]}."""
+        return dict(self.iter_matches_for_all_users(top_n, explain, workers))
+
+    def update_matches_for_user(self, user_id, top_n=None):
+        """
+        Apply one user's profile change (or sign-up) to the in-process top-N lists.
+        The user's record is read back from the users table, which the profile
+        write updated, and recorded in the user snapshot. Only that user's row
+        and column are rescored; other users' lists are patched where the new
+        score crosses their Nth-best threshold, and every changed list is
+        written to the recommendation store. top_n defaults to
+        RECOMMENDATION_TOP_K. Until a seeded matcher exists this only starts
+        the seed, which applies the change, and returns {}; otherwise returns
+        {user_id: [match, ...]} for every user whose top N changed.
+        """
+        from .incremental_matching import get_incremental_matchers
+        from .user_snapshot import get_user_snapshot, record_user_write
+
+        if top_n is None:
+            top_n = current_app.config.get('RECOMMENDATION_TOP_K', 50)
+        user = SupabaseService.get_user(user_id, columns=FEATURE_COLUMNS)
+        if user is None:
+            return {}
+        record_user_write(user)
+        snapshot = get_user_snapshot()
+
+        matchers = get_incremental_matchers()
+        with matchers.lock:
+            started = time.perf_counter()
+            matcher = matchers.matcher(snapshot, top_n, scorer=self)
+            if matcher is None:
+                current_app.logger.info(f"Incremental matcher not seeded yet; the seed applies user {user_id}")
+                return {}
+            updated, entries = self.apply_to_matcher(matcher, user)
+        SupabaseService.store_recommendations(entries)
+        current_app.logger.info(
+            f"Updated matches for user {user_id} in {(time.perf_counter() - started) * 1000:.1f} ms: "
+            f"{len(updated)} of {len(matcher)} top-{top_n} lists changed"
+        )
+        return updated
+
+    def apply_to_matcher(self, matcher, user):
+        """Upsert one user into an IncrementalMatcher; returns (updated results, recommendation store rows)."""
+        _, changed = matcher.upsert_user(user)
+        engine = matcher.engine
+        updated = {}
+        entries = []
+        for v in sorted(changed):
+            profileA = engine.profiles[v]
+            matches = matcher.top_matches(v)
+            updated[str(profileA.id)] = [
+                self._match_result(profileA, engine.profiles[j], score_val, explain=False)
+                for score_val, j in matches
+            ]
+            entries.append(self.recommendation_entry(
+                profileA.user, [(score_val, engine.ids[j]) for score_val, j in matches], matcher.top_n
+            ))
+        return updated, entries
+
+    def recommendation_entry(self, user, ranked, top_k):
+        """Build a user's recommendation store row from [(score, match_id), ...] best first."""
+        return {
+            "user_id": user['id'],
+            "profile_version": profile_version(user),
+            "config_version": SCORING_CONFIG_VERSION,
+            "top_k": top_k,
+            "matches": [{"match_id": match_id, "score": score_val} for score_val, match_id in ranked],
+        }
+
+    def recommend_matches(self, user_id, count=5, explain=True, filters=None):
+        """
+        Get a user's top `count` matches from the precomputed top-K store.
+        Falls back to live scoring (and refreshes the stored entry) only when the
+        entry is missing, was computed for another profile or scoring-config
+        version, or holds fewer than `count` matches.
+
+        With ``filters`` (see match_filters), only matches that pass them are
+        returned: the stored list is filtered first, and when fewer than
+        `count` pass, the filtered population is ranked live.
+        """
+        from .user_snapshot import get_user_snapshot
+
+        snapshot = get_user_snapshot()
+        user = snapshot.get_user(user_id)
+        if user is None:
+            return []
+        ranked = self._recommended_ranking(snapshot, user, count, filters)
+
+        # Render with the snapshot's scorer, whose vocabularies its profiles use
+        engine = snapshot.engine
+        encoded = snapshot.is_encoded(user_id)
+        target = engine.profiles[engine.positions[user_id]] if encoded else self.compile_profile(user)
+        # Full records only for the returned users; they also cover matches
+        # written by the incremental path after the snapshot was taken
+        fetched = {u['id']: u for u in SupabaseService.get_users_by_ids([m for _, m in ranked])} if ranked else {}
+        results = []
+        for score_val, match_id in ranked:
+            if encoded and snapshot.is_encoded(match_id):
+                result = engine.scorer._match_result(
+                    target, engine.profiles[engine.positions[match_id]], score_val, explain
+                )
+            elif match_id in fetched:
+                result = self._match_result(
+                    self.compile_profile(user), self.compile_profile(fetched[match_id]), score_val, explain
+                )
+            else:
+                continue
+            result["user_data"] = fetched.get(match_id, result["user_data"])
+            results.append(result)
+        return results
+
+    def recommend_matches_compact(self, user_id, count=5, filters=None, user_columns=None):
+        """
+        Compact form of recommend_matches, as {"matches": [...]}: each match is
+        only its ID, score and the codes of the factors that contributed to it
+        (WEIGHTS keys). With ``user_columns``, those columns of the matched
+        users are side-loaded under "users", one record per user, read in a
+        single query.
+        """
+        from .user_snapshot import get_user_snapshot
+
+        snapshot = get_user_snapshot()
+        user = snapshot.get_user(user_id)
+        if user is None:
+            return {"matches": []}
+        ranked = self._recommended_ranking(snapshot, user, count, filters)
+
+        engine = snapshot.engine
+        encoded = snapshot.is_encoded(user_id)
+        target = engine.profiles[engine.positions[user_id]] if encoded else None
+        # Matches written by the incremental path can postdate the snapshot
+        missing = [match_id for _, match_id in ranked if not (encoded and snapshot.is_encoded(match_id))]
+        fetched = {u['id']: u for u in SupabaseService.get_users_by_ids(missing, columns=FEATURE_COLUMNS)} if missing else {}
+        matches = []
+        for score_val, match_id in ranked:
+            if encoded and snapshot.is_encoded(match_id):
+                scorer, profileA, profileB = engine.scorer, target, engine.profiles[engine.positions[match_id]]
+            elif match_id in fetched:
+                scorer, profileA, profileB = self, self.compile_profile(user), self.compile_profile(fetched[match_id])
+            else:
+                continue
+            subs = scorer._compute_subscores(profileA, profileB, details=False)
+            matches.append({"match_id": match_id, "score": score_val, "factors": scorer._factor_codes(subs)})
+
+        response = {"matches": matches}
+        if user_columns is not None:
+            unique_ids = list(dict.fromkeys(m["match_id"] for m in matches))
+            response["users"] = SupabaseService.get_users_by_ids(unique_ids, columns=user_columns) if unique_ids else []
+        return response
+
+    def _recommended_ranking(self, snapshot, user, count, filters=None):
+        """
+        A user's top `count` as [(score, match_id), ...], from the store when
+        its entry is current and live otherwise (see recommend_matches).
+        """
+        user_id = user['id']
+        entry = SupabaseService.get_recommendation(user_id)
+        if entry is None:
+            outcome = "miss"
+        elif (
+            entry['profile_version'] != profile_version(user)
+            or entry['config_version'] != SCORING_CONFIG_VERSION
+            or count > entry['top_k']
+        ):
+            outcome = "stale"
+        else:
+            outcome = "hit"
+        with _stats_lock:
+            recommendation_stats[outcome] += 1
+            stats = dict(recommendation_stats)
+        current_app.logger.info(
+            f"Recommendation store {outcome} for user {user_id} "
+            f"(hit {stats['hit']}, miss {stats['miss']}, stale {stats['stale']})"
+        )
+
+        if outcome == "hit":
+            ranked = [(m['score'], m['match_id']) for m in entry['matches']]
+        else:
+            top_k = max(count, current_app.config.get('RECOMMENDATION_TOP_K', 50))
+            if snapshot.is_encoded(user_id):
+                matches = self.generate_matches_for_user(user_id, top_n=top_k, explain=False)
+                ranked = [(m['score'], m['match_id']) for m in matches]
+            else:
+                ranked = self._rank_record(snapshot, user, top_k)
+            SupabaseService.store_recommendations([self.recommendation_entry(user, ranked, top_k)])
+        if filters:
+            ranked = self._filtered_ranking(snapshot, user_id, ranked, count, filters)
+        return ranked[:count]
+    
+    def _rank_record(self, snapshot, user, top_n, allowed=None):
+        """
+        Top top_n of a user record the snapshot's engine does not encode yet
+        (written since the load) as [(score, match_id), ...], scored pair by
+        pair against the snapshot's users; with ``allowed``, a boolean mask over
+        them, only the users that pass it. Ties favour the earlier user.
+        """
+        started = time.perf_counter()
+        target = self.compile_profile(user)
+
+        def scored():
+            for j, match_id in enumerate(snapshot.engine.ids):
+                if match_id == user['id'] or (allowed is not None and not allowed[j]):
+                    continue
+                other = self.compile_profile(snapshot.get_user(match_id))
+                yield self._weighted_score(self._compute_subscores(target, other, details=False)), -j, match_id
+
+        top = heapq.nlargest(top_n, scored())
+        current_app.logger.info(
+            f"Ranked written record of user {user['id']} pair by pair in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        return [(score_val, match_id) for score_val, _, match_id in top]
+
+    def _filtered_ranking(self, snapshot, user_id, ranked, count, filters):
+        """
+        Keep the [(score, match_id), ...] that pass filters, ranking the
+        filtered population live when fewer than count are left.
+        """
+        engine = snapshot.engine
+        allowed = snapshot.filters.mask(filters)
+        # Matches newer than the snapshot are checked by the database
+        missing = [match_id for _, match_id in ranked if not snapshot.is_encoded(match_id)]
+        passing = {u['id'] for u in SupabaseService.get_users_by_ids(missing, columns='id', filters=filters)} if missing else set()
+        kept = [
+            (score_val, match_id) for score_val, match_id in ranked
+            if match_id in passing or (snapshot.is_encoded(match_id) and allowed[engine.positions[match_id]])
+        ]
+        if len(kept) >= count:
+            return kept
+        if not snapshot.is_encoded(user_id):
+            return self._rank_record(snapshot, snapshot.get_user(user_id), count, allowed)
+
+        started = time.perf_counter()
+        top_matches, stats = snapshot.index.top_matches_for(engine.positions[user_id], count, excluded=~allowed)
+        current_app.logger.info(
+            f"Ranked {describe_filters(filters)} for user {user_id} in {(time.perf_counter() - started) * 1000:.1f} ms: "
+            f"{int(allowed.sum())} of {len(engine)} users pass, scored {stats['scored']}"
+        )
+        return [(score_val, engine.ids[j]) for score_val, j in top_matches]
+
+    @staticmethod
+    def _attach_user_data(results):
+        """Swap each result's feature-only user_data for the full user record, in one query."""
+        if results:
+            fetched = {u['id']: u for u in SupabaseService.get_users_by_ids([r["match_id"] for r in results])}
+            for result in results:
+                result["user_data"] = fetched.get(result["match_id"], result["user_data"])
+        return results
+
+    def _match_result(self, userA, userB, score_val, explain=True):
+        """Build the result dict for a returned match, rendering its explanation on demand."""
+        explanation = None
+        if explain:
             subs = self._compute_subscores(userA, userB)
-            score_val = self._weighted_score(subs)
-            
             explanation = self._generate_explanation(userA, userB, subs, score_val)
-            
-            recs_dict[uidA].append({
-                "match_id": uidB,
-                "score": score_val,
-                "explanation": explanation,
-                "user_data": userB
-            })
-        
-        # Now pick top N for each user
-        output = {}
-        for uid in recs_dict:
-            # Sort descending
-            sorted_list = sorted(recs_dict[uid], key=lambda x: x['score'], reverse=True)
-            top_matches = sorted_list[:top_n]
-            output[str(uid)] = top_matches
-        
-        return output
+        
+        return {
+            "match_id": userB.id,
+            "score": score_val,
+            "explanation": explanation,
+            "user_data": userB.user
+        }
+    
+    # The factor functions below take CompiledProfile records, not user dicts
     
     def _skill_overlap(self, userA, userB):
         """Return (count, shared_skills) for skill overlap."""
-        setA = set(userA.get("skills", []))
-        setB = set(userB.get("skills", []))
-        shared = setA.intersection(setB)
-        return (len(shared), shared)
+        shared = userA.skills & userB.skills
+        return (_popcount(shared), shared)
     
-    def _complementary_skill_synergy(self, userA, userB):
+    def _complementary_skill_synergy(self, userA, userB, details=True):
         """Sum synergy from complementary skill pairs + a list of synergy details."""
         synergy_sum = 0.0
         synergy_details = []
-        for skillA in userA.get("skills", []):
-            if skillA in COMPLEMENT_MATRIX:
-                for skillB in userB.get("skills", []):
-                    val = COMPLEMENT_MATRIX[skillA].get(skillB, 0.0)
+        for skillA in userA.skill_ids:
+            row = self.compiler.complement.get(skillA)
+            if row:
+                for skillB in userB.skill_ids:
+                    val = row.get(skillB, 0.0)
                     if val > 0:
                         synergy_sum += val
-                        synergy_details.append((skillA, skillB, val))
+                        if details:
+                            synergy_details.append((
+                                self.compiler.skill_names[skillA], self.compiler.skill_names[skillB], val
+                            ))
         return synergy_sum, synergy_details
     
     def _interest_overlap(self, userA, userB):
         """Return (count, shared_interests)."""
-        setA = set(userA.get("interests", []))
-        setB = set(userB.get("interests", []))
-        shared = setA.intersection(setB)
-        return (len(shared), shared)
+        shared = userA.interests & userB.interests
+        return (_popcount(shared), shared)
     
-    def _goal_alignment(self, userA, userB):
-        """Return numeric sub-score (0..1) and descriptor."""
-        gA = GOAL_MAPPING.get(userA.get("goals"), 0)
-        gB = GOAL_MAPPING.get(userB.get("goals"), 0)
-        if gA == 0 or gB == 0:
+    @staticmethod
+    def _ordinal_alignment(codeA, codeB):
+        """Return numeric sub-score (0..1) and descriptor for two ordinal codes."""
+        if codeA == 0 or codeB == 0:
             return (0.0, "none")
-        diff = abs(gA - gB)
+        diff = abs(codeA - codeB)
         score = max(0, 1.0 - 0.3 * diff)
         if diff == 0:
             desc = "exact"
@@ -172,69 +708,58 @@ class MatchingService:
             desc = "none"
         return (score, desc)
     
+    def _goal_alignment(self, userA, userB):
+        """Return numeric sub-score (0..1) and descriptor."""
+        return self._ordinal_alignment(userA.goals, userB.goals)
+    
     def _stage_alignment(self, userA, userB):
         """Return numeric sub-score (0..1) and descriptor."""
-        sA = STAGE_MAPPING.get(userA.get("startup_stage"), 0)
-        sB = STAGE_MAPPING.get(userB.get("startup_stage"), 0)
-        if sA == 0 or sB == 0:
-            return (0.0, "none")
-        diff = abs(sA - sB)
-        score = max(0, 1.0 - 0.3 * diff)
-        if diff == 0:
-            desc = "exact"
-        elif score > 0:
-            desc = "partial"
-        else:
-            desc = "none"
-        return (score, desc)
+        return self._ordinal_alignment(userA.startup_stage, userB.startup_stage)
     
     def _location_synergy(self, userA, userB):
         """Example synergy: +1 if they're in the same location, else 0."""
-        locA = userA.get("location")
-        locB = userB.get("location")
-        if locA and locB and locA == locB:
+        if userA.location and userA.location == userB.location:
             return 1.0
         return 0.0
     
     def _availability_synergy(self, userA, userB):
         """Example synergy: if they have the exact same availability => 0.5 synergy."""
-        avaA = userA.get("availability", "")
-        avaB = userB.get("availability", "")
-        
-        if not avaA or not avaB:
+        if not userA.availability or not userB.availability:
             return 0.0
         
         # If exactly the same
-        if avaA == avaB:
+        if userA.availability == userB.availability:
             return 1.0
         
         # If one is "Student - flexible" and the other is anything else, let's say 0.5 synergy
-        if "student" in avaA.lower() or "student" in avaB.lower():
+        if userA.student or userB.student:
             return 0.5
         
         return 0.0
     
     def _collab_style_synergy(self, userA, userB):
         """If both have 'collab_style', look up synergy in a matrix."""
-        styleA = userA.get("collab_style")
-        styleB = userB.get("collab_style")
-        if not styleA or not styleB:
+        if not userA.collab_style or not userB.collab_style:
             return 0.0
-        
-        # Check direct tuple or reversed
-        key1 = (styleA, styleB)
-        key2 = (styleB, styleA)
-        if key1 in COLLAB_STYLE_SYNERGY:
-            return COLLAB_STYLE_SYNERGY[key1]
-        elif key2 in COLLAB_STYLE_SYNERGY:
-            return COLLAB_STYLE_SYNERGY[key2]
-        return 0.0
-    
-    def _compute_subscores(self, userA, userB):
-        """Compute each factor, return them in a dict for explanation & weighting."""
+        return self.compiler.collab_synergy.get((userA.collab_style, userB.collab_style), 0.0)
+
+    def _bio_similarity(self, userA, userB):
+        """Cosine similarity of the two bios' hashed term counts; 0.0 if either bio is empty."""
+        vecA = self.compiler.bio_vector(userA)
+        vecB = self.compiler.bio_vector(userB)
+        norms = bio_norms(vecA) * bio_norms(vecB)
+        if norms == 0:
+            return 0.0
+        return float(np.dot(vecA, vecB)) / norms
+
+    def _compute_subscores(self, userA, userB, details=True):
+        """
+        Compute each factor, return them in a dict for explanation & weighting.
+        With details=False the name lists are skipped, which is all ranking needs.
+        """
         # Skills
         so_count, so_shared = self._skill_overlap(userA, userB)
-        cs_sum, cs_details = self._complementary_skill_synergy(userA, userB)
+        cs_sum, cs_details = self._complementary_skill_synergy(userA, userB, details)
         
         # Interests
         io_count, io_shared = self._interest_overlap(userA, userB)
@@ -254,20 +779,24 @@ class MatchingService:
         # Collaboration style
         cstyle_val = self._collab_style_synergy(userA, userB)
         
+        # Bio text
+        bio_val = self._bio_similarity(userA, userB)
+        
         return {
             "skill_overlap_count": so_count,
-            "shared_skills": list(so_shared),
+            "shared_skills": self.compiler.skill_list(so_shared) if details else [],
             "complement_sum": cs_sum,
             "complement_details": cs_details,  # list of (skillA, skillB, synergyVal)
             "interest_overlap_count": io_count,
-            "shared_interests": list(io_shared),
+            "shared_interests": self.compiler.interest_list(io_shared) if details else [],
             "goal_val": ga_val,
             "goal_desc": ga_desc,
             "stage_val": st_val,
             "stage_desc": st_desc,
             "location_val": loc_val,
             "availability_val": ava_val,
-            "collab_style_val": cstyle_val
+            "collab_style_val": cstyle_val,
+            "bio_val": bio_val
         }
     
     def _weighted_score(self, subscores):
@@ -281,9 +810,18 @@ class MatchingService:
           + (subscores["location_val"] * WEIGHTS["location_synergy"])
           + (subscores["availability_val"] * WEIGHTS["availability_synergy"])
           + (subscores["collab_style_val"] * WEIGHTS["collab_style_synergy"])
+          + (subscores["bio_val"] * WEIGHTS["bio_similarity"])
         )
         return round(score, 3)
     
+    def _factor_codes(self, subscores):
+        """Codes (WEIGHTS keys) of the factors that add to a match's score, in WEIGHTS order."""
+        codes = [code for code, key in FACTOR_SUBSCORES.items() if subscores[key] > 0]
+        if 0 < subscores["bio_val"] < BIO_MENTION_THRESHOLD:
+            # Like the explanation, a faint bio similarity is not worth naming
+            codes.remove("bio_similarity")
+        return codes
+    
     def _generate_explanation(self, userA, userB, subscores, final_score):
         """Return a detailed explanation referencing all match factors."""
         # Extract
@@ -300,6 +838,7 @@ class MatchingService:
         loc_val = subscores["location_val"]
         ava_val = subscores["availability_val"]
         cstyle_val = subscores["collab_style_val"]
+        bio_val = subscores["bio_val"]
         
         # Build bullet points or lines:
         lines = []
@@ -359,6 +898,10 @@ class MatchingService:
         if cstyle_val > 0:
             lines.append(f"Your collaboration styles add +{cstyle_val} synergy.")
         
+        # Bio similarity
+        if bio_val >= BIO_MENTION_THRESHOLD:
+            lines.append(f"Your bios describe similar work (similarity {bio_val:.2f}).")
+        
         # If no lines so far, we might say there's minimal synergy
         if not lines:
             lines.append("You have limited direct overlap, but there may still be potential to explore.")
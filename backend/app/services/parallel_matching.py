@@ -0,0 +1,157 @@
+"""
+Multi-process all-users matching.
+
+The engine's feature arrays are copied once into shared memory. Each worker
+process attaches read-only views of them and returns only packed top-N keys,
+so no user dicts are pickled in either direction.
+
+When the scoring tables are symmetric, a task owns a band of rows and scores
+only the upper-triangle tiles right of the diagonal, like the serial
+``iter_top_matches``: each tile is folded into its rows and, mirrored, into
+its columns. The parent merges the bands in row order; a row is final once
+every band starting at or before it has been merged, which makes the output
+independent of worker completion order. Band boundaries split the triangle
+into equal areas, so early bands are narrow and late ones wide.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .matching_engine import MatchingEngine, TopNAccumulator, DEFAULT_BLOCK_SIZE
+
+# Each worker gets several row blocks so uneven blocks still balance out
+BLOCKS_PER_WORKER = 4
+
+# Per-process state set up by _init_worker
+_worker_engine = None
+_worker_segments = []
+
+
+class SharedFeatures:
+    """Copies an engine's feature arrays into shared memory for worker processes."""
+
+    def __init__(self, engine):
+        self.segments = []
+        self.specs = {}
+        for name, array in engine.feature_arrays().items():
+            array = np.ascontiguousarray(array)
+            # Zero-byte segments are not allowed, so empty arrays get one spare byte
+            segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+            self.segments.append(segment)
+            self.specs[name] = (segment.name, array.shape, array.dtype.str)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release and unlink every segment."""
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+
+def _init_worker(specs):
+    """Attach the shared feature arrays and build this worker's scoring engine."""
+    global _worker_engine
+    features = {}
+    for name, (segment_name, shape, dtype) in specs.items():
+        segment = shared_memory.SharedMemory(name=segment_name)
+        _worker_segments.append(segment)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+        array.flags.writeable = False
+        features[name] = array
+    _worker_engine = MatchingEngine.from_features(features)
+
+
+def _top_keys(start, stop, top_n, block_size):
+    """Score rows [start, stop) against everyone and return their packed top-N keys."""
+    engine = _worker_engine
+    n = len(engine)
+    rows = slice(start, stop)
+    accumulator = TopNAccumulator(n, top_n, positions=np.arange(start, stop))
+    for col_start in range(0, n, block_size):
+        cols = slice(col_start, min(col_start + block_size, n))
+        accumulator.fold(rows, cols, engine.score_block(rows, cols))
+    return start, accumulator.keys
+
+
+def _band_keys(start, stop, top_n, block_size):
+    """
+    Score the upper-triangle tiles of rows [start, stop) and return the packed
+    top-N keys they contribute to users [start, n): rows through both
+    directions, later columns through the mirrored one.
+    """
+    engine = _worker_engine
+    n = len(engine)
+    accumulator = TopNAccumulator(n, top_n, positions=np.arange(start, n))
+    for row_start in range(start, stop, block_size):
+        row_stop = min(row_start + block_size, stop)
+        rows = slice(row_start, row_stop)
+        # The diagonal tile is rows x rows and already reaches rows via forward
+        accumulator.fold(rows, rows, engine.score_block(rows, rows))
+        for col_start in range(row_stop, n, block_size):
+            cols = slice(col_start, min(col_start + block_size, n))
+            forward, backward = engine.score_block_pair(rows, cols)
+            accumulator.fold(rows, cols, forward)
+            accumulator.fold(cols, rows, backward.T)
+    return start, accumulator.keys
+
+
+def _band_bounds(n, bands):
+    """Row boundaries splitting the upper triangle of an n x n matrix into ``bands`` equal areas."""
+    bounds = sorted({round(n * (1 - (1 - k / bands) ** 0.5)) for k in range(bands)} | {n})
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def iter_top_matches_parallel(engine, top_n, workers, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Same output as ``engine.iter_top_matches(top_n)``, computed by ``workers`` processes.
+
+    With symmetric scoring tables each pair is scored once, in upper-triangle
+    bands; otherwise rows are split into contiguous blocks scored in the
+    directed mode. Users are yielded in order as soon as they are final.
+    """
+    n = len(engine)
+    if n == 0:
+        return
+
+    context = multiprocessing.get_context("spawn")
+    with SharedFeatures(engine) as shared, ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(shared.specs,)
+    ) as pool:
+        if engine.symmetric:
+            bands = _band_bounds(n, workers * BLOCKS_PER_WORKER)
+            futures = [pool.submit(_band_keys, start, stop, top_n, block_size) for start, stop in bands]
+            accumulator = TopNAccumulator(n, top_n)
+            for future, (_, stop) in zip(futures, bands):
+                start, keys = future.result()
+                accumulator.merge(np.arange(start, n), keys)
+                for i in range(start, stop):
+                    yield i, accumulator.results(i)
+            return
+
+        chunk = max(1, min(block_size, -(-n // (workers * BLOCKS_PER_WORKER))))
+        futures = [
+            pool.submit(_top_keys, start, min(start + chunk, n), top_n, block_size)
+            for start in range(0, n, chunk)
+        ]
+        for future in futures:
+            start, keys = future.result()
+            stop = start + len(keys)
+            accumulator = TopNAccumulator(n, top_n, positions=np.arange(start, stop))
+            accumulator.keys[...] = keys
+            for i in range(start, stop):
+                yield i, accumulator.results(i)
+
+
+def top_matches_parallel(engine, top_n, workers, block_size=DEFAULT_BLOCK_SIZE):
+    """List form of ``iter_top_matches_parallel``."""
+    return [matches for _, matches in iter_top_matches_parallel(engine, top_n, workers, block_size)]
@@ -1,9 +1,24 @@
 import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from supabase import create_client, Client
+from postgrest.types import CountMethod, ReturnMethod
 from flask import current_app
+from .match_filters import apply_filters
 
 supabase_client = None
 
+# Pages a range fetch may hold ahead of the consumer in iter_users
+RANGE_QUEUE_PAGES = 2
+
+# Marks the end of a range's pages in its queue
+_RANGE_DONE = object()
+
+# Match rows per request when reading a user's exclusions (keep <= PostgREST max-rows)
+EXCLUDED_PAGE_SIZE = 1000
+
 def init_supabase(app):
     global supabase_client
     url = app.config.get('SUPABASE_URL')
@@ -14,6 +29,57 @@ def init_supabase(app):
     supabase_client = create_client(url, key)
     app.logger.info("Supabase client initialized")
 
+class _ChunkWriter:
+    """
+    Buffers rows per kind and sends full chunks through that kind's request
+    function on a thread pool. At most ``workers`` requests are in flight,
+    which also bounds the rows held in memory. A failed chunk is logged and
+    recorded, and the others still go out.
+    """
+
+    def __init__(self, requests, chunk_size, workers):
+        self.requests = requests
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.buffers = {kind: [] for kind in requests}
+        self.written = {kind: 0 for kind in requests}
+        self.chunks = 0
+        self.errors = []
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._pending = {}
+
+    def add(self, kind, row):
+        buffer = self.buffers[kind]
+        buffer.append(row)
+        if len(buffer) >= self.chunk_size:
+            self._submit(kind, buffer)
+            self.buffers[kind] = []
+
+    def close(self):
+        """Send the partial chunks, wait for every request and return the outcome."""
+        for kind, buffer in self.buffers.items():
+            if buffer:
+                self._submit(kind, buffer)
+        self._collect(wait(self._pending).done)
+        self._pool.shutdown()
+        return {**self.written, "chunks": self.chunks, "errors": self.errors}
+
+    def _submit(self, kind, chunk):
+        while len(self._pending) >= self.workers:
+            self._collect(wait(self._pending, return_when=FIRST_COMPLETED).done)
+        self._pending[self._pool.submit(self.requests[kind], chunk)] = (kind, self.chunks, len(chunk))
+        self.chunks += 1
+
+    def _collect(self, done):
+        for future in done:
+            kind, number, size = self._pending.pop(future)
+            try:
+                future.result()
+                self.written[kind] += size
+            except Exception as e:
+                current_app.logger.error(f"Error writing chunk {number} ({size} {kind} rows): {str(e)}")
+                self.errors.append({"chunk": number, "kind": kind, "rows": size, "error": str(e)})
+
 class SupabaseService:
     """Service for interacting with Supabase."""
     
@@ -25,26 +91,196 @@ class SupabaseService:
     
     # User methods
     @staticmethod
-    def get_users():
-        """Get all users from Supabase with complete profile data for matching."""
+    def get_users(columns='*'):
+        """Get all users from Supabase, with every column or only ``columns``."""
+        users = [user for page in SupabaseService.iter_users(columns=columns) for user in page]
+        current_app.logger.info(f"Retrieved {len(users)} users")
+        return users
+
+    @staticmethod
+    def _fetch_id_range(table, columns, low, high, page_size, pages, cancelled):
+        """
+        Put the rows with low <= id < high into the ``pages`` queue in id order,
+        one request of up to page_size rows at a time, then _RANGE_DONE (or the
+        exception that stopped it). Gives up once ``cancelled`` is set.
+        """
+        def put(item):
+            while not cancelled.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
         try:
-            response = SupabaseService.get_client().table('users').select('*').execute()
-            current_app.logger.info(f"Retrieved {len(response.data)} users")
-            return response.data
+            after = None
+            while True:
+                query = SupabaseService.get_client().table(table).select(columns).lt('id', high).order('id').limit(page_size)
+                query = query.gte('id', low) if after is None else query.gt('id', after)
+                page = query.execute().data
+                if page and not put(page):
+                    return
+                if len(page) < page_size or page[-1]['id'] >= high - 1:
+                    break
+                after = page[-1]['id']
+        except Exception as e:
+            put(e)
+            return
+        put(_RANGE_DONE)
+
+    @staticmethod
+    def iter_users(page_size=None, workers=None, columns='*'):
+        """
+        Yield every user in ascending id order, one id range at a time.
+
+        The id span is cut into ranges expected to hold about page_size users
+        each, and up to ``workers`` range requests are in flight while earlier
+        ranges are consumed, so no response is bounded by the server's max-rows
+        and memory holds only a few pages. Each range streams its pages through
+        a queue of RANGE_QUEUE_PAGES, so a range holding far more users than
+        expected (clustered ids) is still consumed page by page. Non-integer
+        ids are paged sequentially.
+        """
+        config = current_app.config
+        page_size = page_size or config.get('USER_PAGE_SIZE', 1000)
+        workers = workers or config.get('USER_FETCH_WORKERS', 4)
+        try:
+            client = SupabaseService.get_client()
+            first = client.table('users').select('id', count=CountMethod.exact).order('id').limit(1).execute()
+            last = client.table('users').select('id').order('id', desc=True).limit(1).execute()
         except Exception as e:
-            current_app.logger.error(f"Error retrieving users: {str(e)}")
+            current_app.logger.error(f"Error retrieving the users id range: {str(e)}")
             raise
+        if not first.data:
+            return
+        low, high = first.data[0]['id'], last.data[0]['id']
+        if not isinstance(low, int):
+            yield from SupabaseService._iter_pages('users', page_size, columns)
+            return
+
+        # Range width in ids, so sparse ids still give pages of about page_size users
+        width = max(1, -(-(high - low + 1) * page_size // max(first.count or 1, 1)))
+        pending = deque()
+        cancelled = threading.Event()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                for start in range(low, high + 1, width):
+                    pages = queue.Queue(maxsize=RANGE_QUEUE_PAGES)
+                    pool.submit(
+                        SupabaseService._fetch_id_range, 'users', columns, start, start + width, page_size, pages, cancelled
+                    )
+                    pending.append((start, pages))
+                    # Ranges are handed out in id order, oldest request first
+                    if len(pending) >= workers:
+                        yield from SupabaseService._next_range(pending)
+                while pending:
+                    yield from SupabaseService._next_range(pending)
+            finally:
+                # Unblocks range fetches left waiting on a consumer that stopped early
+                cancelled.set()
+
+    @staticmethod
+    def _next_range(pending):
+        start, pages = pending.popleft()
+        while True:
+            page = pages.get()
+            if page is _RANGE_DONE:
+                return
+            if isinstance(page, Exception):
+                current_app.logger.error(f"Error retrieving users from id {start}: {str(page)}")
+                raise page
+            yield page
 
     @staticmethod
-    def get_user(user_id):
-        """Get a specific user by ID with complete profile for matching."""
+    def get_user(user_id, columns='*'):
+        """Get a specific user by ID, with every column or only ``columns``."""
         try:
-            response = SupabaseService.get_client().table('users').select('*').eq('id', user_id).single().execute()
+            response = SupabaseService.get_client().table('users').select(columns).eq('id', user_id).single().execute()
             return response.data
         except Exception as e:
             current_app.logger.error(f"Error retrieving user {user_id}: {str(e)}")
             raise
 
+    @staticmethod
+    def update_user(user_id, user_data):
+        """Update columns of an existing user; returns the updated row, or None if there is none."""
+        try:
+            response = SupabaseService.get_client().table('users').update(user_data).eq('id', user_id).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            current_app.logger.error(f"Error updating user {user_id}: {str(e)}")
+            raise
+
+    @staticmethod
+    def get_users_by_ids(user_ids, columns='*', filters=None):
+        """
+        Get the users with the given IDs, in no particular order. With
+        ``filters`` (see match_filters), only the users that pass them.
+        """
+        try:
+            query = SupabaseService.get_client().table('users').select(columns).in_('id', list(user_ids))
+            if filters:
+                query = apply_filters(query, filters)
+            response = query.execute()
+            return response.data
+        except Exception as e:
+            current_app.logger.error(f"Error retrieving users by IDs: {str(e)}")
+            raise
+
+    @staticmethod
+    def _iter_pages(table, page_size, columns='*', in_=None, **equals):
+        """
+        Yield every row of a table in lists of up to page_size, paging by
+        ascending id. ``columns`` must include id. ``in_`` is an optional
+        (column, values) filter; keyword arguments become equality filters.
+        """
+        after = None
+        while True:
+            try:
+                query = SupabaseService.get_client().table(table).select(columns).order('id').limit(page_size)
+                if in_ is not None:
+                    query = query.in_(in_[0], list(in_[1]))
+                for column, value in equals.items():
+                    query = query.eq(column, value)
+                if after is not None:
+                    query = query.gt('id', after)
+                page = query.execute().data
+            except Exception as e:
+                current_app.logger.error(f"Error retrieving {table} after id {after}: {str(e)}")
+                raise
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            after = page[-1]['id']
+
+    @staticmethod
+    def _get_page(table, limit, after=None, columns='*', **equals):
+        """
+        One keyset page of a table: up to ``limit`` rows with id > after, in id
+        order, as {"data": rows, "next_cursor": last id, or None on the last page}.
+        ``columns`` must include id. Keyword arguments become equality filters.
+        """
+        try:
+            # One extra row tells whether another page follows
+            query = SupabaseService.get_client().table(table).select(columns).order('id').limit(limit + 1)
+            if after is not None:
+                query = query.gt('id', after)
+            for column, value in equals.items():
+                query = query.eq(column, value)
+            rows = query.execute().data
+        except Exception as e:
+            current_app.logger.error(f"Error retrieving {table} page after id {after}: {str(e)}")
+            raise
+        next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+        return {"data": rows[:limit], "next_cursor": next_cursor}
+
+    @staticmethod
+    def get_users_page(limit, after=None, columns='*'):
+        """Get one keyset page of users (see _get_page)."""
+        return SupabaseService._get_page('users', limit, after, columns)
+
     @staticmethod
     def get_user_by_email(email):
         """Get a user by email."""
@@ -67,6 +303,11 @@ class SupabaseService:
             current_app.logger.error(f"Error retrieving profiles: {str(e)}")
             raise
 
+    @staticmethod
+    def get_profiles_page(limit, after=None, columns='*'):
+        """Get one keyset page of profiles (see _get_page)."""
+        return SupabaseService._get_page('profiles', limit, after, columns)
+
     @staticmethod
     def get_profile(profile_id):
         """Get a specific profile by ID."""
@@ -127,6 +368,11 @@ class SupabaseService:
         response = SupabaseService.get_client().table('matches').select('*').eq('user_id', user_id).execute()
         return response.data
 
+    @staticmethod
+    def get_matches_page(user_id, limit, after=None, columns='*'):
+        """Get one keyset page of a user's matches (see _get_page)."""
+        return SupabaseService._get_page('matches', limit, after, columns, user_id=user_id)
+
     @staticmethod
     def get_match(match_id):
         """Get a specific match by ID."""
@@ -134,39 +380,184 @@ class SupabaseService:
         return response.data
 
     @staticmethod
-    def store_match(user_id, match_user_id, score, explanation):
-        """Store a match in the database."""
-        match_data = {
+    def match_row(user_id, match_user_id, score, explanation):
+        """Row of the matches table for one generated match."""
+        return {
             'user_id': user_id,
             'matched_user_id': match_user_id,
             'compatibility_score': score,
             'explanation': explanation,
             'status': 'pending',
         }
+
+    @staticmethod
+    def store_match(user_id, match_user_id, score, explanation):
+        """Store a match in the database."""
+        match_data = SupabaseService.match_row(user_id, match_user_id, score, explanation)
         
         response = SupabaseService.get_client().table('matches').insert(match_data).execute()
         return response.data[0] if response.data else None
-    
+
+    @staticmethod
+    def _upsert_match_chunk(rows):
+        SupabaseService.get_client().table('matches').upsert(
+            rows, on_conflict='user_id,matched_user_id', returning=ReturnMethod.minimal
+        ).execute()
+
+    @staticmethod
+    def _delete_match_chunk(match_ids):
+        SupabaseService.get_client().table('matches').delete(returning=ReturnMethod.minimal).in_('id', match_ids).execute()
+
+    @staticmethod
+    def iter_match_pages(page_size=1000, columns='*', user_ids=None):
+        """
+        Yield every match (or every match of user_ids) in lists of up to
+        page_size, paging by ascending id.
+        """
+        in_ = None if user_ids is None else ('user_id', user_ids)
+        return SupabaseService._iter_pages('matches', page_size, columns, in_)
+
     @staticmethod
-    def get_recommended_matches(user_id):
+    def _match_writer(requests, chunk_size, workers):
+        config = current_app.config
+        return _ChunkWriter(
+            requests,
+            chunk_size or config.get('MATCH_STORE_CHUNK_SIZE', 500),
+            workers or config.get('MATCH_STORE_WORKERS', 4),
+        )
+
+    @staticmethod
+    def store_match_deltas(rows, tolerance=None, chunk_size=None, workers=None):
         """
-        Get recommended matches for a user.
-        This is a simplified version and should be replaced with a more sophisticated matching algorithm.
+        Persist regenerated match rows (see match_row) as a delta against the
+        matches table, in multi-row requests of chunk_size (MATCH_STORE_CHUNK_SIZE)
+        with up to workers (MATCH_STORE_WORKERS) in flight:
+
+        - new pairs are inserted as pending,
+        - pairs whose score moved by more than tolerance (MATCH_SCORE_TOLERANCE)
+          get the new score and explanation and keep their status,
+        - unchanged pairs are not written,
+        - pending pairs of the regenerated users that are no longer among their
+          matches are deleted; accepted, rejected and connected ones are kept.
+
+        Rows are diffed in batches of MATCH_DIFF_BATCH_USERS users, each against
+        only those users' stored matches, so memory stays bounded by the batch.
+        A user's rows must be consecutive, as iter_matches_for_all_users yields them.
+        A failed chunk is logged and reported, and does not stop the others.
+
+        Returns {"inserted", "updated", "unchanged", "retired", "chunks", "errors":
+        [{"chunk": chunk number, "kind", "rows": size, "error": message}, ...]}.
         """
-        # Get all users except the current user
-        response = SupabaseService.get_client().table('users').select('*').neq('id', user_id).execute()
-        all_users = response.data
+        config = current_app.config
+        if tolerance is None:
+            tolerance = config.get('MATCH_SCORE_TOLERANCE', 0.01)
+        batch_users = config.get('MATCH_DIFF_BATCH_USERS', 200)
+
+        writer = SupabaseService._match_writer({
+            "inserted": SupabaseService._upsert_match_chunk,
+            "updated": SupabaseService._upsert_match_chunk,
+            "retired": SupabaseService._delete_match_chunk,
+        }, chunk_size, workers)
+        unchanged = 0
+
+        def diff(batch):
+            nonlocal unchanged
+            user_ids = {row['user_id'] for row in batch}
+            existing = {}
+            for page in SupabaseService.iter_match_pages(
+                columns='id,user_id,matched_user_id,compatibility_score,status', user_ids=user_ids
+            ):
+                for match in page:
+                    existing[(match['user_id'], match['matched_user_id'])] = match
 
-        # Get existing matches for the user
-        existing_matches = SupabaseService.get_matches(user_id)
-        matched_ids = [match['matched_user_id'] for match in existing_matches]
+            current = set()
+            for row in batch:
+                key = (row['user_id'], row['matched_user_id'])
+                current.add(key)
+                match = existing.get(key)
+                if match is None:
+                    writer.add("inserted", row)
+                elif abs((match['compatibility_score'] or 0) - row['compatibility_score']) > tolerance:
+                    # Without a status column the upsert leaves the stored status alone
+                    writer.add("updated", {column: value for column, value in row.items() if column != 'status'})
+                else:
+                    unchanged += 1
+            for key, match in existing.items():
+                if key not in current and match['status'] == 'pending':
+                    writer.add("retired", match['id'])
 
-        # Filter out already matched users
-        recommended = [user for user in all_users if user['id'] not in matched_ids]
+        batch = []
+        batch_user_ids = set()
+        for row in rows:
+            # Batches end between users, so each user is diffed whole
+            if row['user_id'] not in batch_user_ids and len(batch_user_ids) >= batch_users:
+                diff(batch)
+                batch = []
+                batch_user_ids = set()
+            batch.append(row)
+            batch_user_ids.add(row['user_id'])
+        if batch:
+            diff(batch)
+        result = writer.close()
+        result["unchanged"] = unchanged
+
+        current_app.logger.info(
+            f"Stored match deltas: {result['inserted']} inserted, {result['updated']} updated, "
+            f"{result['retired']} retired, {unchanged} unchanged in {result['chunks']} requests "
+            f"({len(result['errors'])} failed)"
+        )
+        return result
+    
+    # Precomputed top-K recommendation methods
+    @staticmethod
+    def get_recommendation(user_id):
+        """Get a user's stored top-K entry, or None if there is none."""
+        try:
+            response = SupabaseService.get_client().table('match_recommendations').select('*').eq('user_id', user_id).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            current_app.logger.error(f"Error retrieving stored recommendations for user {user_id}: {str(e)}")
+            raise
+
+    @staticmethod
+    def store_recommendations(entries):
+        """Upsert top-K entries, one row per user."""
+        if not entries:
+            return []
+        try:
+            response = SupabaseService.get_client().table('match_recommendations').upsert(entries, on_conflict='user_id').execute()
+            return response.data
+        except Exception as e:
+            current_app.logger.error(f"Error storing {len(entries)} recommendation entries: {str(e)}")
+            raise
+    
+    @staticmethod
+    def get_excluded_user_ids(user_id):
+        """
+        IDs never to recommend to a user: everyone they already have a match with
+        (in any status) and everyone who rejected them. Both lists are read in
+        pages of EXCLUDED_PAGE_SIZE, so none is cut short by the server's max-rows.
+        """
+        excluded = set()
+        for page in SupabaseService._iter_pages('matches', EXCLUDED_PAGE_SIZE, 'id,matched_user_id', user_id=user_id):
+            excluded.update(m['matched_user_id'] for m in page)
+        for page in SupabaseService._iter_pages(
+            'matches', EXCLUDED_PAGE_SIZE, 'id,user_id', matched_user_id=user_id, status='reject'
+        ):
+            excluded.update(m['user_id'] for m in page)
+        return excluded
+
+    @staticmethod
+    def get_recommended_matches(user_id, limit=10, cursor=None, explain=True):
+        """
+        Get one page of scored recommendations for a user, as {"matches": [...],
+        "next_cursor": ...}, leaving out the users from get_excluded_user_ids.
+        Pass next_cursor back as ``cursor`` for the following page.
+        """
+        from .matching_service import get_matching_service
 
-        # In a real-world scenario, you would implement a more sophisticated matching algorithm here
-        # For now, we'll just return the first 10 users (or less if there are fewer than 10)
-        return recommended[:10]
+        excluded = SupabaseService.get_excluded_user_ids(user_id)
+        return get_matching_service().ranked_matches_page(user_id, limit, excluded, cursor, explain)
 
     @staticmethod
     def update_match_status(match_id, status):
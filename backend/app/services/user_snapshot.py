@@ -0,0 +1,192 @@
+"""
+Process-wide snapshot of every user and their compiled matching features.
+
+Request handlers read users, the scoring engine and the candidate index from
+one immutable UserSnapshot instead of selecting the whole users table per
+request. A background thread builds a fresh snapshot every
+USER_SNAPSHOT_REFRESH_SECONDS, or as soon as a profile write invalidates the
+current one, and swaps it in with a single reference assignment. Readers keep
+whichever snapshot they picked up, so they never wait on the database after
+the first load.
+
+A profile write is persisted to the users table and recorded with
+``record_user_write``: until a reload includes it, the current snapshot
+returns the written record from ``get_user``, so every reader (and the
+recommendation store's version check) sees the same record right away.
+"""
+
+import threading
+import time
+
+from flask import current_app
+
+from .supabase_service import SupabaseService
+from .matching_engine import MatchingEngine
+from .matching_service import FEATURE_COLUMNS
+from .match_filters import FilterBitmaps
+from .candidate_index import CandidateIndex, AnnCandidateIndex, build_profile_index, load_profile_index
+
+user_snapshots = None
+
+
+class UserSnapshot:
+    """
+    Immutable view of all users with a ready-to-score engine and candidate index.
+    Only ``written`` changes: the records of users written since the load,
+    which the engine does not encode yet.
+
+    From MATCHING_ANN_MIN_USERS users on, the candidate index is approximate
+    (IVF over profile embeddings, persisted at MATCHING_ANN_INDEX_PATH when set);
+    below that it is the exact inverted index. ``filters`` holds the bitmap
+    indexes that recommendation filters are evaluated against.
+    """
+
+    def __init__(self, users, engine=None):
+        self.users = tuple(users)
+        self.by_id = {u['id']: u for u in self.users}
+        self.written = {}
+        config = current_app.config
+        self.engine = engine or MatchingEngine(self.users, bio_store_path=config.get('BIO_VECTOR_PATH'))
+
+        ann_min_users = config.get('MATCHING_ANN_MIN_USERS', 0)
+        if ann_min_users and len(self.users) >= ann_min_users:
+            path = config.get('MATCHING_ANN_INDEX_PATH')
+            vectors = load_profile_index(self.engine, path) if path else build_profile_index(self.engine)
+            self.index = AnnCandidateIndex(self.engine, vectors, oversample=config.get('MATCHING_ANN_OVERSAMPLE', 4))
+        else:
+            self.index = CandidateIndex(self.engine)
+        self.filters = FilterBitmaps(self.engine.users)
+        self.loaded_at = time.time()
+        for array in self.engine.feature_arrays().values():
+            array.flags.writeable = False
+
+    @classmethod
+    def load(cls):
+        """
+        Build a snapshot from the users table, encoding each page as it is
+        fetched. Only FEATURE_COLUMNS are read; responses load full records
+        for the users they return.
+        """
+        engine = MatchingEngine.from_pages(
+            SupabaseService.iter_users(columns=FEATURE_COLUMNS), bio_store_path=current_app.config.get('BIO_VECTOR_PATH')
+        )
+        return cls(engine.users, engine)
+
+    def __len__(self):
+        return len(self.users)
+
+    def get_user(self, user_id):
+        """Return the user dict with this ID, as last written, or None if it is not in the snapshot."""
+        user = self.written.get(user_id)
+        return user if user is not None else self.by_id.get(user_id)
+
+    def is_encoded(self, user_id):
+        """True when the engine encodes this user's current record."""
+        return user_id in self.engine.positions and user_id not in self.written
+
+
+class UserSnapshotManager:
+    """Holds the current UserSnapshot and refreshes it in the background."""
+
+    def __init__(self, app, refresh_seconds):
+        self.app = app
+        self.refresh_seconds = refresh_seconds
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        # (written at, record) by user ID, until a snapshot loaded after the write
+        self._written = {}
+        self._written_lock = threading.Lock()
+
+    def current(self):
+        """Return the current snapshot, loading the first one (and starting the refresher) on demand."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    self._load()
+                snapshot = self._snapshot
+            self._start()
+        return snapshot
+
+    def record_write(self, user):
+        """Serve a user's written record from the current snapshot until a reload includes it."""
+        with self._written_lock:
+            self._written[user['id']] = (time.time(), user)
+            snapshot = self._snapshot
+            if snapshot is not None:
+                snapshot.written[user['id']] = user
+        self.invalidate()
+
+    def invalidate(self):
+        """Mark the snapshot out of date after a profile write."""
+        if self._thread is not None:
+            # Keep serving the old snapshot until the refresher swaps in a new one
+            self._wake.set()
+        else:
+            self._snapshot = None
+
+    def refresh(self):
+        """Build a fresh snapshot now and swap it in."""
+        with self._load_lock:
+            self._load()
+
+    def _load(self):
+        load_started = time.time()
+        with self.app.app_context():
+            started = time.perf_counter()
+            snapshot = UserSnapshot.load()
+        with self._written_lock:
+            # A write that landed while the users table was being read may be missing from it
+            self._written = {
+                user_id: (written_at, user) for user_id, (written_at, user) in self._written.items()
+                if written_at >= load_started
+            }
+            snapshot.written.update((user_id, user) for user_id, (_, user) in self._written.items())
+            self._snapshot = snapshot
+        self.app.logger.info(
+            f"Loaded user snapshot of {len(snapshot)} users in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+    def _start(self):
+        if self.refresh_seconds <= 0 or self._thread is not None:
+            return
+        with self._load_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="user-snapshot-refresh", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.refresh_seconds)
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                self.app.logger.error(f"Error refreshing user snapshot: {str(e)}")
+
+
+def init_user_snapshot(app):
+    global user_snapshots
+    user_snapshots = UserSnapshotManager(app, app.config.get('USER_SNAPSHOT_REFRESH_SECONDS', 300))
+
+
+def get_user_snapshot():
+    """Return the current process-wide UserSnapshot."""
+    if user_snapshots is None:
+        # Outside an app built by create_app (scripts, tests): load one directly
+        return UserSnapshot.load()
+    return user_snapshots.current()
+
+
+def invalidate_user_snapshot():
+    """Make the next refresh pick up a profile write."""
+    if user_snapshots is not None:
+        user_snapshots.invalidate()
+
+
+def record_user_write(user):
+    """Serve a written user record at once and make the next refresh pick it up."""
+    if user_snapshots is not None:
+        user_snapshots.record_write(user)
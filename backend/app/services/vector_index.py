@@ -0,0 +1,257 @@
+"""
+Local approximate-nearest-neighbour vector index with a Pinecone-style interface.
+
+Vectors are kept in one dense NumPy array. Once trained, the index is an IVF
+(inverted file) index: k-means centroids partition the vectors into lists and
+a query only scans the ``nprobe`` lists whose centroids score best against it.
+Untrained indexes (and small ones) are scanned exhaustively. Everything runs
+offline, and the whole index persists to a single .npz file.
+
+The methods mirror the Pinecone client (``upsert``, ``query``, ``fetch``,
+``delete``, ``describe_index_stats``) so the same code can target either.
+"""
+
+import json
+import threading
+
+import numpy as np
+
+METRICS = ("dotproduct", "cosine")
+
+# K-means settings for IVF training
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+
+# Rows scored per matrix product when assigning vectors to lists
+ASSIGN_CHUNK = 8192
+
+
+class LocalVectorIndex:
+    """In-process vector index; exact until ``train`` builds its IVF lists."""
+
+    def __init__(self, dimension, metric="dotproduct"):
+        if metric not in METRICS:
+            raise ValueError(f"Unsupported metric: {metric}")
+        self.dimension = dimension
+        self.metric = metric
+        self.ids = []
+        self.metadata = []
+        self._rows = {}
+        self._vectors = np.zeros((0, dimension), dtype=np.float32)
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.intp)
+        self.nprobe = 1
+        self._lists = None
+        self.attributes = {}
+        # Writers may call from several threads, like concurrent requests to Pinecone
+        self._write_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def vectors(self):
+        return self._vectors[:len(self.ids)]
+
+    def _prepare(self, values, dtype=np.float32):
+        """Validate (and for cosine, normalize) vectors; stored vectors are float32 like Pinecone's."""
+        values = np.asarray(values, dtype=dtype)
+        if values.shape[-1] != self.dimension:
+            raise ValueError(f"Vector dimension {values.shape[-1]} does not match index dimension {self.dimension}")
+        if self.metric == "cosine":
+            norms = np.linalg.norm(values, axis=-1, keepdims=True)
+            values = values / np.where(norms == 0, 1, norms)
+        return values
+
+    # Pinecone-style interface
+
+    def upsert(self, vectors, namespace=None):
+        """
+        Insert or overwrite vectors given as (id, values[, metadata]) tuples or
+        {"id", "values", "metadata"} dicts.
+        """
+        records = [
+            (v["id"], v["values"], v.get("metadata")) if isinstance(v, dict) else (v[0], v[1], v[2] if len(v) > 2 else None)
+            for v in vectors
+        ]
+        if not records:
+            return {"upserted_count": 0}
+        values = self._prepare([values for _, values, _ in records])
+        with self._write_lock:
+            self._write(records, values)
+        return {"upserted_count": len(records)}
+
+    def _write(self, records, values):
+        rows = np.empty(len(records), dtype=np.intp)
+        for k, (vector_id, _, metadata) in enumerate(records):
+            row = self._rows.get(vector_id)
+            if row is None:
+                row = len(self.ids)
+                self._rows[vector_id] = row
+                self.ids.append(vector_id)
+                self.metadata.append(metadata)
+            else:
+                self.metadata[row] = metadata
+            rows[k] = row
+
+        # Grow the backing array geometrically so streams of upserts stay linear
+        if len(self.ids) > len(self._vectors):
+            grown = np.zeros((max(len(self.ids), 2 * len(self._vectors)), self.dimension), dtype=np.float32)
+            grown[:len(self._vectors)] = self._vectors
+            self._vectors = grown
+            self.assignments = np.concatenate(
+                [self.assignments, np.zeros(len(grown) - len(self.assignments), dtype=np.intp)]
+            )
+        self._vectors[rows] = values
+
+        if self.centroids is not None:
+            self.assignments[rows] = self._assign(values)
+            self._lists = None
+
+    def query(self, vector, top_k=10, include_values=False, include_metadata=False, namespace=None, nprobe=None):
+        """Return {"matches": [{"id", "score"[, "values"][, "metadata"]}, ...]} best first."""
+        query = self._prepare(vector, np.float64)
+        rows = self._candidate_rows(query, nprobe or self.nprobe)
+        scores = self._vectors[rows] @ query
+
+        if top_k < len(rows):
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            rows, scores = rows[best], scores[best]
+        order = np.lexsort((rows, -scores))
+
+        matches = []
+        for k in order:
+            match = {"id": self.ids[rows[k]], "score": float(scores[k])}
+            if include_values:
+                match["values"] = self._vectors[rows[k]].tolist()
+            if include_metadata:
+                match["metadata"] = self.metadata[rows[k]]
+            matches.append(match)
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def fetch(self, ids, namespace=None):
+        """Return {"vectors": {id: {"id", "values", "metadata"}}} for the IDs that exist."""
+        found = {}
+        for vector_id in ids:
+            row = self._rows.get(vector_id)
+            if row is not None:
+                found[vector_id] = {
+                    "id": vector_id, "values": self._vectors[row].tolist(), "metadata": self.metadata[row]
+                }
+        return {"vectors": found, "namespace": namespace or ""}
+
+    def delete(self, ids, namespace=None):
+        """Remove vectors by ID; the last rows move into the freed slots."""
+        with self._write_lock:
+            self._remove(ids)
+        return {}
+
+    def _remove(self, ids):
+        for vector_id in ids:
+            row = self._rows.pop(vector_id, None)
+            if row is None:
+                continue
+            last = len(self.ids) - 1
+            if row != last:
+                moved = self.ids[last]
+                self.ids[row] = moved
+                self.metadata[row] = self.metadata[last]
+                self._vectors[row] = self._vectors[last]
+                self.assignments[row] = self.assignments[last]
+                self._rows[moved] = row
+            self.ids.pop()
+            self.metadata.pop()
+        self._lists = None
+
+    def describe_index_stats(self):
+        return {
+            "dimension": self.dimension,
+            "metric": self.metric,
+            "total_vector_count": len(self.ids),
+            "nlist": 0 if self.centroids is None else len(self.centroids),
+        }
+
+    # IVF
+
+    def train(self, nlist=None, nprobe=None, seed=0):
+        """
+        Partition the stored vectors into ``nlist`` k-means lists (sqrt(n) by
+        default) and probe ``nprobe`` of them per query (nlist / 4 by default).
+        """
+        n = len(self.ids)
+        if n == 0:
+            return
+        nlist = min(n, nlist or max(1, int(n ** 0.5)))
+        rng = np.random.default_rng(seed)
+
+        vectors = self.vectors
+        sample = vectors[rng.choice(n, min(n, nlist * KMEANS_SAMPLE_PER_LIST), replace=False)].astype(np.float64)
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            labels = _nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+
+        self.centroids = centroids
+        self.nprobe = max(1, min(nlist, nprobe or -(-nlist // 4)))
+        self.assignments[:n] = self._assign(vectors)
+        self._lists = None
+
+    def _assign(self, vectors):
+        return np.concatenate([
+            _nearest(vectors[start:start + ASSIGN_CHUNK], self.centroids)
+            for start in range(0, len(vectors), ASSIGN_CHUNK)
+        ]) if len(vectors) else np.zeros(0, dtype=np.intp)
+
+    def _candidate_rows(self, query, nprobe):
+        n = len(self.ids)
+        if self.centroids is None or nprobe >= len(self.centroids):
+            return np.arange(n)
+        if self._lists is None:
+            order = np.argsort(self.assignments[:n], kind="stable")
+            bounds = np.searchsorted(self.assignments[:n][order], np.arange(len(self.centroids) + 1))
+            self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self.centroids))]
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self._lists[c] for c in probe])
+
+    # Persistence
+
+    def save(self, path, **attributes):
+        """Write the index (plus any extra JSON ``attributes``) to one .npz file."""
+        np.savez(
+            path,
+            vectors=self.vectors,
+            ids=np.array(json.dumps(self.ids)),
+            metadata=np.array(json.dumps(self.metadata)),
+            centroids=np.zeros((0, self.dimension)) if self.centroids is None else self.centroids,
+            assignments=self.assignments[:len(self.ids)],
+            settings=np.array(json.dumps({
+                "dimension": self.dimension, "metric": self.metric, "nprobe": self.nprobe, **attributes,
+            })),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by ``save``; extra attributes land in ``index.attributes``."""
+        with np.load(path) as data:
+            settings = json.loads(str(data["settings"]))
+            index = cls(settings.pop("dimension"), settings.pop("metric"))
+            index.nprobe = settings.pop("nprobe")
+            index.attributes = settings
+            index.ids = json.loads(str(data["ids"]))
+            index.metadata = json.loads(str(data["metadata"]))
+            index._rows = {vector_id: row for row, vector_id in enumerate(index.ids)}
+            index._vectors = data["vectors"].copy()
+            index.assignments = data["assignments"].copy()
+            if len(data["centroids"]):
+                index.centroids = data["centroids"].copy()
+        return index
+
+
+def _nearest(vectors, centroids):
+    """Index of the closest centroid (Euclidean) for every vector."""
+    distances = (centroids ** 2).sum(axis=1)[None, :] - 2 * (vectors @ centroids.T)
+    return np.argmin(distances, axis=1)
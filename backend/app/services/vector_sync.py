@@ -0,0 +1,175 @@
+"""
+Bulk sync of user bio vectors from the users table into a vector index.
+
+Users arrive in pages, are encoded a page at a time with the BioVectorizer and
+upserted in large chunks by a small thread pool, with retries and backoff per
+chunk. The target is anything with the Pinecone index interface: a Pinecone
+``Index`` in production or a LocalVectorIndex for offline runs and tests.
+
+A JSON state file maps each synced user ID to the content hash of what was
+written (bio plus metadata fields). Users whose hash is unchanged are skipped,
+so a re-sync of a stable table encodes and sends nothing. A chunk's hashes are
+only recorded once it has been upserted, so failed chunks are retried by the
+next sync. Users that vanished from the table, or whose bio became empty, are
+deleted from the index.
+"""
+
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .bio_vectors import BioVectorizer, BIO_DIMENSION, bio_hash
+from .matching_service import PROFILE_FIELDS, profile_version
+
+# Vectors per upsert request (Pinecone accepts up to 1000 / 2 MB per request)
+UPSERT_CHUNK = 500
+
+# Concurrent upsert requests
+SYNC_WORKERS = 4
+
+# Attempts per chunk before it is reported as failed
+MAX_ATTEMPTS = 4
+RETRY_BACKOFF_SECONDS = 0.5
+
+# Profile fields copied into vector metadata
+METADATA_FIELDS = tuple(field for field in PROFILE_FIELDS if field != "bio")
+
+
+def vector_metadata(user):
+    """Filterable metadata for a user's vector; Pinecone rejects null values."""
+    return {field: user[field] for field in METADATA_FIELDS if user.get(field) not in (None, "", [])}
+
+
+class VectorSync:
+    """Pages users into a Pinecone-style index, skipping unchanged content."""
+
+    def __init__(self, index, state_path=None, chunk_size=UPSERT_CHUNK, workers=SYNC_WORKERS,
+                 max_attempts=MAX_ATTEMPTS, backoff=RETRY_BACKOFF_SECONDS, namespace=None):
+        self.index = index
+        self.state_path = state_path
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.namespace = namespace
+        self.vectorizer = BioVectorizer()
+        self.state = self._load_state()
+
+        dimension = index.describe_index_stats()["dimension"]
+        if dimension != BIO_DIMENSION:
+            raise ValueError(f"Index dimension {dimension} does not match bio vector dimension {BIO_DIMENSION}")
+
+    def _load_state(self):
+        if self.state_path and os.path.exists(self.state_path):
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        return {}
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        fd, temp_path = tempfile.mkstemp(suffix=".json", dir=os.path.dirname(os.path.abspath(self.state_path)))
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.state_path)
+
+    def _send(self, method, payload):
+        """Call an index method, retrying with exponential backoff; return the last error or None."""
+        for attempt in range(self.max_attempts):
+            try:
+                method(payload, namespace=self.namespace)
+                return None
+            except Exception as e:
+                error = e
+                if attempt + 1 < self.max_attempts:
+                    time.sleep(self.backoff * 2 ** attempt)
+        return error
+
+    def _upsert_chunk(self, chunk):
+        records = [{"id": vector_id, "values": values, "metadata": metadata}
+                   for vector_id, values, metadata, _ in chunk]
+        return self._send(self.index.upsert, records)
+
+    def _encode_page(self, page, stats):
+        """Return (id, values, metadata, hash) records for the changed users of one page."""
+        changed = []
+        for user in page:
+            vector_id = str(user['id'])
+            stats["seen"].add(vector_id)
+            content = profile_version(user)
+            if self.state.get(vector_id) == content:
+                stats["skipped"] += 1
+            elif not (user.get("bio") or "").strip():
+                # Dense indexes reject all-zero vectors; drop any previous one instead
+                stats["empty"] += 1
+                if vector_id in self.state:
+                    stats["cleared"].append(vector_id)
+            else:
+                changed.append((vector_id, user, content))
+
+        texts = [user.get("bio") for _, user, _ in changed]
+        vectors = self.vectorizer.vectors(texts, [bio_hash(text) for text in texts])
+        stats["encoded"] += len(changed)
+        return [
+            (vector_id, vector.tolist(), vector_metadata(user), content)
+            for (vector_id, user, content), vector in zip(changed, vectors)
+        ]
+
+    def sync(self, pages, delete_missing=True):
+        """
+        Sync users from ``pages`` (an iterable of user lists) into the index.
+
+        At most 2 x workers chunks are in flight, so memory stays bounded however
+        many users there are. Returns counts, vectors per second and the errors of
+        chunks that still failed after every retry.
+        """
+        stats = {"seen": set(), "skipped": 0, "empty": 0, "encoded": 0, "upserted": 0, "deleted": 0,
+                 "failed": 0, "errors": [], "cleared": []}
+        started = time.perf_counter()
+
+        def collect(done):
+            for future in done:
+                chunk = pending.pop(future)
+                error = future.result()
+                if error is None:
+                    stats["upserted"] += len(chunk)
+                    for vector_id, _, _, content in chunk:
+                        self.state[vector_id] = content
+                else:
+                    stats["failed"] += len(chunk)
+                    stats["errors"].append({"ids": [record[0] for record in chunk], "error": str(error)})
+
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for page in pages:
+                records = self._encode_page(page, stats)
+                for start in range(0, len(records), self.chunk_size):
+                    while len(pending) >= 2 * self.workers:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    chunk = records[start:start + self.chunk_size]
+                    pending[pool.submit(self._upsert_chunk, chunk)] = chunk
+            collect(wait(pending).done)
+
+        # Users whose bio became empty, and (after a full sweep) users gone from the table
+        stale = stats.pop("cleared")
+        if delete_missing:
+            stale += [vector_id for vector_id in self.state if vector_id not in stats["seen"]]
+        for start in range(0, len(stale), self.chunk_size):
+            chunk = stale[start:start + self.chunk_size]
+            error = self._send(self.index.delete, chunk)
+            if error is None:
+                stats["deleted"] += len(chunk)
+                for vector_id in chunk:
+                    self.state.pop(vector_id, None)
+            else:
+                stats["errors"].append({"ids": chunk, "error": str(error)})
+        self._save_state()
+
+        elapsed = time.perf_counter() - started
+        stats["seen"] = len(stats["seen"])
+        stats["seconds"] = elapsed
+        stats["vectors_per_second"] = stats["upserted"] / elapsed if elapsed > 0 else 0.0
+        return stats
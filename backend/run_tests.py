@@ -120,7 +120,7 @@ def test_matching(token):
     print_response(response, "Get All Matches for Current User")
     
     # If we have matches, test getting a specific match and taking action on it
-    matches = response.json()
+    matches = response.json()["matches"]
     if matches and len(matches) > 0:
         match_id = matches[0]['id']
         
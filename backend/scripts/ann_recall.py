@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+ann_recall.py
+
+Script to measure the recall@N of the approximate (IVF) candidate index against
+exhaustive scoring. It runs entirely offline on a JSON list of users, such as
+infra/synthetic_users.json.
+
+Usage:
+    python scripts/ann_recall.py --input ../infra/synthetic_users.json [--top-n 5]
+        [--sample 200] [--nlist N] [--nprobe N] [--oversample 4] [--save index.npz]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add the parent directory to the path so we can import the app
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+from app.services.matching_engine import MatchingEngine
+from app.services.candidate_index import AnnCandidateIndex, build_profile_index, profile_fingerprint, recall_at_n
+
+def measure_recall(users, top_n=5, sample=200, nlist=None, nprobe=None, oversample=4, save=None):
+    """Build the vector index over users and print its recall@top_n on a sample of them."""
+    engine = MatchingEngine(users)
+
+    started = time.perf_counter()
+    vectors = build_profile_index(engine, nlist, nprobe)
+    stats = vectors.describe_index_stats()
+    print(f"Indexed {stats['total_vector_count']} users ({stats['dimension']} dimensions, "
+          f"{stats['nlist']} lists, probing {vectors.nprobe}) in {time.perf_counter() - started:.2f} s")
+    if save:
+        vectors.save(save, fingerprint=profile_fingerprint(engine))
+        print(f"Saved index to {save}")
+
+    index = AnnCandidateIndex(engine, vectors, oversample=oversample)
+    positions = np.random.default_rng(0).choice(len(engine), min(sample, len(engine)), replace=False)
+
+    started = time.perf_counter()
+    recall = recall_at_n(index, top_n, positions)
+    print(f"recall@{top_n} over {len(positions)} users: {recall:.4f} "
+          f"({(time.perf_counter() - started) / len(positions) * 1000:.1f} ms per user, exact and approximate)")
+    return recall
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure recall@N of the approximate candidate index.")
+    parser.add_argument("--input", required=True,
+                        help="JSON file with a list of users")
+    parser.add_argument("--top-n", type=int, default=5,
+                        help="matches per user (default: 5)")
+    parser.add_argument("--sample", type=int, default=200,
+                        help="users to evaluate (default: 200)")
+    parser.add_argument("--nlist", type=int, default=None,
+                        help="IVF lists (default: sqrt of the user count)")
+    parser.add_argument("--nprobe", type=int, default=None,
+                        help="lists probed per query (default: nlist / 4)")
+    parser.add_argument("--oversample", type=int, default=4,
+                        help="candidates rescored per returned match (default: 4)")
+    parser.add_argument("--save", default=None,
+                        help="write the index to this .npz file")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    with open(args.input, "r") as f:
+        users = json.load(f)
+    if isinstance(users, dict):
+        users = users["users"]
+
+    measure_recall(users, args.top_n, args.sample, args.nlist, args.nprobe, args.oversample, args.save)
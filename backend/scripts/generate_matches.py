@@ -4,8 +4,17 @@ generate_matches.py
 
 Script to generate matches for all users and store them in the database.
 This can be run as a scheduled task or one-time setup.
+
+Usage:
+    python scripts/generate_matches.py [--workers N] [--top-n 5] [--chunk-size 500] [--store-workers 4]
+
+With --workers N the all-pairs scoring is split into upper-triangle row bands
+across N processes that share one read-only feature encoding. Only new and changed
+matches are written, in multi-row upserts of --chunk-size rows,
+--store-workers requests at a time.
 """
 
+import argparse
 import os
 import sys
 from pathlib import Path
@@ -16,40 +25,55 @@ sys.path.append(str(parent_dir))
 
 from app import create_app
 from app.services.matching_service import get_matching_service
-from app.services.supabase_service import get_supabase_service
+from app.services.supabase_service import SupabaseService
 
-def generate_matches(app):
+def generate_matches(app, top_n=5, workers=1, chunk_size=None, store_workers=None):
     """Generate matches for all users and store them in the database."""
     # Create an application context
     with app.app_context():
-        print("Generating matches for all users...")
+        print(f"Generating matches for all users with {workers} worker(s)...")
         matching_service = get_matching_service()
-        supabase = get_supabase_service()
         
-        # Generate matches
-        matches = matching_service.generate_matches_for_all_users(top_n=5)
-        print(f"Generated matches for {len(matches)} users.")
+        # Generate matches, writing only what changed, in multi-row chunks as soon as they are final
+        user_ids = []
+        # The top-K store behind /matches/recommend is refreshed in the same pass
+        store_top_k = app.config.get('RECOMMENDATION_TOP_K', 50)
+        
+        def match_rows():
+            for user_id, user_matches in matching_service.iter_matches_for_all_users(
+                top_n=top_n, workers=workers, store_top_k=store_top_k
+            ):
+                user_ids.append(user_id)
+                for match in user_matches:
+                    yield SupabaseService.match_row(int(user_id), match['match_id'], match['score'], match['explanation'])
         
-        # Store matches in the database
-        stored_count = 0
-        for user_id, user_matches in matches.items():
-            for match in user_matches:
-                # Store the match in the database
-                stored_match = supabase.store_match(
-                    int(user_id),
-                    match['match_id'],
-                    match['score'],
-                    match['explanation']
-                )
-                if stored_match:
-                    stored_count += 1
+        result = SupabaseService.store_match_deltas(match_rows(), chunk_size=chunk_size, workers=store_workers)
         
-        print(f"Stored {stored_count} matches in the database.")
-        return stored_count
+        print(f"Generated matches for {len(user_ids)} users.")
+        print(f"Inserted {result['inserted']}, updated {result['updated']} and retired {result['retired']} matches "
+              f"({result['unchanged']} unchanged) in {result['chunks']} requests.")
+        for error in result['errors']:
+            print(f"Failed to write chunk {error['chunk']} ({error['rows']} {error['kind']} matches): {error['error']}")
+        return result['inserted'] + result['updated']
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate and store matches for all users.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of scoring processes (default: 1)")
+    parser.add_argument("--top-n", type=int, default=5,
+                        help="matches to keep per user (default: 5)")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="matches per upsert request (default: MATCH_STORE_CHUNK_SIZE)")
+    parser.add_argument("--store-workers", type=int, default=None,
+                        help="upsert requests in flight (default: MATCH_STORE_WORKERS)")
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
+    
     # Create the Flask app
     app = create_app()
     
     # Generate matches
-    generate_matches(app) 
\ No newline at end of file
+    generate_matches(app, top_n=args.top_n, workers=args.workers,
+                     chunk_size=args.chunk_size, store_workers=args.store_workers)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+sync_vectors.py
+
+Script to load user bio vectors into the vector index created by
+infra/backend_deployment.py. Users are read page by page (only the scored
+columns, over concurrent id-range requests to Supabase, or from a JSON file
+with --input), encoded in batches and upserted in chunks by several
+concurrent workers with retry. Users whose content is unchanged since
+the last sync (per the --state file) are skipped.
+
+The target is the Pinecone index named by PINECONE_API_KEY and
+PINECONE_INDEX_NAME, or with --local an in-memory LocalVectorIndex (optionally
+saved to --save), which needs no network access.
+
+Usage:
+    python scripts/sync_vectors.py [--input users.json] [--local [--save index.npz]]
+        [--state vector_sync_state.json] [--page-size 1000] [--chunk-size 500]
+        [--workers 4] [--namespace NS] [--keep-missing]
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import the app
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+from app.services.bio_vectors import BIO_DIMENSION
+from app.services.vector_index import LocalVectorIndex
+from app.services.vector_sync import VectorSync, UPSERT_CHUNK, SYNC_WORKERS
+
+def pinecone_index():
+    """The Pinecone index configured through the deployment's environment variables."""
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=os.environ["PINECONE_API_KEY"])
+    return pc.Index(os.environ["PINECONE_INDEX_NAME"])
+
+def json_pages(path, page_size):
+    """Yield the users of a JSON file (a list, or {"users": [...]}) in pages."""
+    with open(path, "r") as f:
+        users = json.load(f)
+    if isinstance(users, dict):
+        users = users["users"]
+    for start in range(0, len(users), page_size):
+        yield users[start:start + page_size]
+
+def sync_vectors(pages, index, state_path, chunk_size, workers, namespace=None, delete_missing=True):
+    """Sync pages of users into index and print the outcome."""
+    syncer = VectorSync(index, state_path=state_path, chunk_size=chunk_size, workers=workers, namespace=namespace)
+    stats = syncer.sync(pages, delete_missing=delete_missing)
+
+    print(f"Read {stats['seen']} users: {stats['skipped']} unchanged, {stats['empty']} without a bio, "
+          f"{stats['encoded']} encoded.")
+    print(f"Upserted {stats['upserted']} vectors in {stats['seconds']:.2f} s "
+          f"({stats['vectors_per_second']:.0f} vectors/s), deleted {stats['deleted']}.")
+    for error in stats["errors"]:
+        print(f"Failed chunk of {len(error['ids'])} vectors: {error['error']}")
+    return stats
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sync user bio vectors into the vector index.")
+    parser.add_argument("--input", default=None,
+                        help="JSON file with a list of users (default: read the users table)")
+    parser.add_argument("--local", action="store_true",
+                        help="sync into an in-memory LocalVectorIndex instead of Pinecone")
+    parser.add_argument("--save", default=None,
+                        help="with --local, load the index from and write it back to this .npz file")
+    parser.add_argument("--state", default="vector_sync_state.json",
+                        help="file with the content hashes of the last sync (default: vector_sync_state.json)")
+    parser.add_argument("--page-size", type=int, default=1000,
+                        help="users read and encoded per page (default: 1000)")
+    parser.add_argument("--chunk-size", type=int, default=UPSERT_CHUNK,
+                        help=f"vectors per upsert request (default: {UPSERT_CHUNK})")
+    parser.add_argument("--workers", type=int, default=SYNC_WORKERS,
+                        help=f"concurrent upsert requests (default: {SYNC_WORKERS})")
+    parser.add_argument("--namespace", default=None,
+                        help="index namespace to write to")
+    parser.add_argument("--keep-missing", action="store_true",
+                        help="do not delete vectors of users that are no longer in the table")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    state_path = args.state
+    if not args.local:
+        index = pinecone_index()
+    elif args.save and os.path.exists(args.save):
+        index = LocalVectorIndex.load(args.save)
+    else:
+        index = LocalVectorIndex(BIO_DIMENSION, metric="cosine")
+        # A fresh in-memory index holds nothing a previous sync wrote
+        if not args.save:
+            state_path = None
+        elif os.path.exists(state_path):
+            os.remove(state_path)
+    sync_args = (index, state_path, args.chunk_size, args.workers, args.namespace, not args.keep_missing)
+
+    if args.input:
+        sync_vectors(json_pages(args.input, args.page_size), *sync_args)
+    else:
+        from app import create_app
+        from app.services.matching_service import FEATURE_COLUMNS
+        from app.services.supabase_service import SupabaseService
+
+        # Create the Flask app
+        app = create_app()
+        with app.app_context():
+            sync_vectors(SupabaseService.iter_users(args.page_size, columns=FEATURE_COLUMNS), *sync_args)
+
+    if args.local and args.save:
+        index.save(args.save)
+        print(f"Saved index to {args.save}")
@@ -0,0 +1,206 @@
+"""
+Shared fixtures: small synthetic user sets, an app context and an in-memory
+stand-in for the Supabase query builder.
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+from flask import Flask
+
+# Make the app package (and the repository's infra scripts) importable when
+# pytest runs from the backend directory
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(1, str(BACKEND_DIR.parent))
+
+from app.core.config import TestConfig
+from app.services import supabase_service
+from app.services.supabase_service import SupabaseService
+from app.services.user_snapshot import UserSnapshot
+from app.services.matching_service import COMPLEMENT_MATRIX, GOAL_MAPPING, STAGE_MAPPING, COLLAB_STYLE_SYNERGY
+
+SKILLS = sorted(set(COMPLEMENT_MATRIX) | {"React", "Sales", "Design", "Finance", "CAD"})
+INTERESTS = ["SaaS", "GreenTech", "HealthTech", "FinTech", "EdTech", "BioTech", "AI"]
+LOCATIONS = ["Berlin", "London", "Tokyo", "Boston", None]
+AVAILABILITY = ["Full-Time", "Part-Time", "Weekends", "Student - flexible", None]
+COLLAB_STYLES = sorted({style for pair in COLLAB_STYLE_SYNERGY for style in pair} | {"Executor"})
+BIO_WORDS = "robotics clinical trials machine learning saas sales pipeline design lab research cad funding".split()
+
+
+def make_users(n, seed=0, start_id=1):
+    """n synthetic users with ids from start_id, drawn from small pools so ties and overlaps are common."""
+    rng = random.Random(seed)
+    users = []
+    for user_id in range(start_id, start_id + n):
+        users.append({
+            "id": user_id,
+            "name": f"User {user_id}",
+            "skills": rng.sample(SKILLS, rng.randint(0, 3)),
+            "interests": rng.sample(INTERESTS, rng.randint(0, 3)),
+            "goals": rng.choice(list(GOAL_MAPPING) + [None]),
+            "startup_stage": rng.choice(list(STAGE_MAPPING) + [None]),
+            "location": rng.choice(LOCATIONS),
+            "availability": rng.choice(AVAILABILITY),
+            "collab_style": rng.choice(COLLAB_STYLES + [None]),
+            "bio": " ".join(rng.choices(BIO_WORDS, k=rng.randint(0, 12))) or None,
+        })
+    return users
+
+
+@pytest.fixture
+def users():
+    return make_users(120, seed=7)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.from_object(TestConfig)
+    with app.app_context():
+        yield app
+
+
+class FakeQuery:
+    """The subset of the PostgREST query builder SupabaseService uses for reads and writes."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = []
+        self.order_column = None
+        self.descending = False
+        self.row_limit = None
+        self.columns = '*'
+        self.count = None
+        self.upserted = None
+        self.updated = None
+        self.deleted = False
+        self.one = False
+
+    def select(self, columns='*', count=None):
+        self.columns = columns
+        self.count = count
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def contains(self, column, values):
+        self.filters.append(lambda row: set(values) <= set(row.get(column) or []))
+        return self
+
+    def order(self, column, desc=False):
+        self.order_column, self.descending = column, desc
+        return self
+
+    def limit(self, n):
+        self.row_limit = n
+        return self
+
+    def upsert(self, rows, on_conflict=None, **kwargs):
+        self.upserted = (rows, on_conflict.split(','))
+        return self
+
+    def update(self, values):
+        self.updated = values
+        return self
+
+    def delete(self, **kwargs):
+        self.deleted = True
+        return self
+
+    def single(self):
+        self.one = True
+        return self
+
+    def execute(self):
+        rows = self.client.tables.setdefault(self.table, [])
+        if self.upserted is not None:
+            new_rows, keys = self.upserted
+            for new in new_rows:
+                for existing in rows:
+                    if all(existing.get(k) == new.get(k) for k in keys):
+                        existing.update(new)
+                        break
+                else:
+                    # New rows get the next id, like a serial primary key
+                    rows.append({"id": max((row.get("id", 0) for row in rows), default=0) + 1, **new})
+            return FakeResponse(new_rows)
+        data = [row for row in rows if all(f(row) for f in self.filters)]
+        if self.deleted:
+            self.client.tables[self.table] = [row for row in rows if row not in data]
+            return FakeResponse(data)
+        if self.updated is not None:
+            for row in data:
+                row.update(self.updated)
+            return FakeResponse([dict(row) for row in data])
+        count = len(data) if self.count else None
+        if self.order_column:
+            data.sort(key=lambda row: row[self.order_column], reverse=self.descending)
+        if self.row_limit is not None:
+            data = data[:self.row_limit]
+        if self.client.max_rows is not None:
+            data = data[:self.client.max_rows]
+        if self.columns != '*':
+            fields = self.columns.split(',')
+            data = [{f: row.get(f) for f in fields} for row in data]
+        if self.one:
+            return FakeResponse(data[0] if len(data) == 1 else None)
+        return FakeResponse(data, count)
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeClient:
+    def __init__(self, tables=None, max_rows=None):
+        self.tables = tables or {}
+        # Like PostgREST's max-rows, caps every response
+        self.max_rows = max_rows
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(supabase_service, "supabase_client", client)
+    return client
+
+
+@pytest.fixture
+def snapshot(app, users, monkeypatch):
+    """A UserSnapshot of ``users`` served as the process-wide snapshot, with SupabaseService reads faked."""
+    monkeypatch.setattr(SupabaseService, "iter_users", staticmethod(lambda **kwargs: iter([users])))
+    by_id = {u["id"]: u for u in users}
+    monkeypatch.setattr(
+        SupabaseService, "get_users_by_ids", staticmethod(lambda ids, **kwargs: [by_id[i] for i in ids if i in by_id])
+    )
+    snapshot = UserSnapshot.load()
+    monkeypatch.setattr("app.services.user_snapshot.get_user_snapshot", lambda: snapshot)
+    return snapshot
@@ -0,0 +1,59 @@
+import numpy as np
+
+from app.services.bio_vectors import BioVectorizer, BioVectorStore, bio_hash, bio_norms, bio_terms
+from app.services.matching_engine import MatchingEngine
+
+
+def test_bio_terms_are_unigrams_and_bigrams_without_stopwords():
+    assert bio_terms("I build the robots, and robots build me") == [
+        "build", "robots", "robots", "build", "build robots", "robots robots", "robots build",
+    ]
+    assert bio_hash(None) == bio_hash("")
+
+
+def test_vectorizer_encodes_each_distinct_bio_once():
+    vectorizer = BioVectorizer()
+    texts = ["saas sales", "lab research", "saas sales", None]
+    first = vectorizer.vectors(texts)
+    again = vectorizer.vectors(list(reversed(texts)))
+    assert vectorizer.encoded == 3
+    assert np.array_equal(first, vectorizer.encode_batch(texts))
+    assert np.array_equal(again, first[::-1])
+
+
+def test_store_rewrite_reencodes_only_changed_bios(tmp_path, users):
+    path = str(tmp_path / "bios.npy")
+    texts = [u["bio"] for u in users]
+    distinct = len(set(map(bio_hash, texts)))
+
+    vectorizer = BioVectorizer()
+    BioVectorStore(path).write(vectorizer, texts)
+    assert vectorizer.encoded == distinct
+
+    texts[3] = "an entirely new bio about clinical robotics"
+    vectorizer = BioVectorizer()
+    counts = BioVectorStore(path).write(vectorizer, texts)
+    assert vectorizer.encoded == 1
+    assert isinstance(counts, np.memmap)
+    assert np.array_equal(counts, BioVectorizer().encode_batch(texts))
+
+
+def test_store_of_another_dimension_is_rebuilt(tmp_path, users):
+    path = str(tmp_path / "bios.npy")
+    texts = [u["bio"] for u in users]
+    BioVectorStore(path, dimension=64).write(BioVectorizer(dimension=64), texts)
+    assert BioVectorStore(path).counts is None
+    counts = BioVectorStore(path).write(BioVectorizer(), texts)
+    assert counts.shape == (len(users), BioVectorizer().dimension)
+
+
+def test_stored_bio_factor_equals_per_pair_cosine(tmp_path, users):
+    engine = MatchingEngine(users, bio_store_path=str(tmp_path / "bios.npy"))
+    assert np.array_equal(engine.score_matrix(), MatchingEngine(users).score_matrix())
+
+    counts = engine.bio_counts.astype(np.float64)
+    norms = bio_norms(engine.bio_counts)
+    for i, j in [(0, 1), (5, 9), (17, 40)]:
+        expected = counts[i] @ counts[j] / (norms[i] * norms[j]) if norms[i] and norms[j] else 0.0
+        pair = engine.scorer._bio_similarity(engine.profiles[i], engine.profiles[j])
+        assert pair == expected
@@ -0,0 +1,39 @@
+import numpy as np
+
+from app.services.candidate_index import CandidateIndex
+from app.services.matching_engine import MatchingEngine
+
+
+def test_pruned_results_equal_exhaustive(users):
+    engine = MatchingEngine(users)
+    index = CandidateIndex(engine)
+    for top_n in (1, 5, 20):
+        for i in range(len(users)):
+            matches, stats = index.top_matches_for(i, top_n)
+            assert matches == engine.top_matches_for(i, top_n), (i, top_n)
+            assert stats["scored"] + stats["pruned"] == len(users) - 1
+
+
+def test_excluded_users_are_never_returned(users):
+    engine = MatchingEngine(users)
+    index = CandidateIndex(engine)
+    excluded = np.zeros(len(users), dtype=bool)
+    excluded[::3] = True
+    for i in (1, 2, 40):
+        matches, _ = index.top_matches_for(i, 10, excluded=excluded)
+        full = [m for m in engine.top_matches_for(i, len(users)) if not excluded[m[1]]]
+        assert matches == full[:10]
+
+
+
+def test_group_bounds_cover_non_overlapping_scores(users):
+    engine = MatchingEngine(users)
+    index = CandidateIndex(engine)
+    scores = engine.score_matrix(symmetric=False)
+    for i in (0, 5, 77):
+        bounds = {(goal, stage): bound for bound, goal, stage in index._group_bounds(i)}
+        outside = set(range(len(users))) - set(index._overlap_candidates(i).tolist()) - {i}
+        assert outside
+        for j in outside:
+            profile = engine.profiles[j]
+            assert scores[i, j] <= bounds[profile.goals, profile.startup_stage], (i, j)
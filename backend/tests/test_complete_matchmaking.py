@@ -0,0 +1,26 @@
+import json
+
+from infra import complete_matchmaking
+
+from conftest import make_users
+
+
+def test_ndjson_stream_equals_batch_output(tmp_path, users):
+    users = users[:40]
+    source = tmp_path / "users.ndjson"
+    source.write_text("".join(json.dumps(dict(u, education="x" * 100)) + "\n\n" for u in users))
+    output = tmp_path / "results.ndjson"
+
+    assert complete_matchmaking.stream_top_matches(source, output, top_n=3) == len(users)
+
+    streamed = [json.loads(line) for line in output.read_text().splitlines()]
+    batch = complete_matchmaking.generate_top_matches(users, top_n=3)
+    assert [row["user_id"] for row in streamed] == [str(u["id"]) for u in users]
+    assert {row["user_id"]: row["matches"] for row in streamed} == batch
+
+
+def test_registry_keeps_only_scored_fields():
+    user = dict(make_users(1)[0], education="PhD", work_experience=["a"])
+    registry = complete_matchmaking.build_user_registry([user])
+    assert set(registry[user["id"]]) <= set(complete_matchmaking.MATCH_FIELDS)
+    assert "bio" not in registry[user["id"]]
@@ -0,0 +1,28 @@
+from app.services.incremental_matching import IncrementalMatcher
+from app.services.matching_engine import MatchingEngine
+
+from conftest import make_users
+
+
+def assert_matches_full_recompute(matcher):
+    users = matcher.engine.users
+    full = MatchingEngine(users).top_matches(matcher.top_n)
+    for i in range(len(users)):
+        assert matcher.top_matches(i) == full[i], i
+
+
+def test_profile_changes_equal_full_recompute(users):
+    matcher = IncrementalMatcher(users, top_n=5)
+    replacements = make_users(len(users), seed=99)
+    for position in (0, 13, 64, len(users) - 1, 13):
+        changed = dict(replacements[position], id=users[position]["id"])
+        matcher.upsert_user(changed)
+        assert_matches_full_recompute(matcher)
+
+
+def test_sign_ups_equal_full_recompute(users):
+    matcher = IncrementalMatcher(users[:100], top_n=5)
+    for user in users[100:105]:
+        matcher.upsert_user(user)
+    assert len(matcher) == 105
+    assert_matches_full_recompute(matcher)
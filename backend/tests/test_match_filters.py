@@ -0,0 +1,53 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from app.services.match_filters import FILTER_COLUMNS, ARRAY_FILTERS, FilterBitmaps, apply_filters, parse_filters
+from app.services.matching_service import MatchingService
+
+FILTERS = [
+    {"location": ("Berlin",)},
+    {"location": ("Berlin", "Tokyo"), "availability": ("Full-Time",)},
+    {"must_have_skill": ("Python",)},
+    {"must_have_skill": ("Python", "AI"), "stage": ("Prototype", "Seed Funded")},
+    {"location": ("Atlantis",)},
+]
+
+
+def passes(user, filters):
+    for name, values in filters.items():
+        column = FILTER_COLUMNS[name]
+        if name in ARRAY_FILTERS:
+            if not set(values) <= set(user.get(column) or []):
+                return False
+        elif user.get(column) not in values:
+            return False
+    return True
+
+
+def test_parse_filters_keeps_known_non_empty_values_once():
+    args = MultiDict([("location", "Berlin"), ("location", "Berlin"), ("location", "Tokyo"), ("stage", ""),
+                      ("must_have_skill", "Python"), ("must_have_skill", "AI"), ("sort", "score")])
+    assert parse_filters(args) == {"location": ("Berlin", "Tokyo"), "must_have_skill": ("Python", "AI")}
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_pushdown_and_bitmaps_agree_with_the_predicate(app, fake_client, users, filters):
+    fake_client.tables["users"] = users
+    expected = [u["id"] for u in users if passes(u, filters)]
+    pushed = apply_filters(fake_client.table("users").select("id").order("id"), filters).execute().data
+    assert [u["id"] for u in pushed] == expected
+    mask = FilterBitmaps(users).mask(filters)
+    assert [u["id"] for u, keep in zip(users, mask) if keep] == expected
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_filtered_recommendations_rank_only_passing_users(snapshot, fake_client, users, filters):
+    engine = snapshot.engine
+    for user_id in (1, 33):
+        i = engine.positions[user_id]
+        expected = [
+            (score_val, engine.ids[j]) for score_val, j in engine.top_matches_for(i, len(users))
+            if passes(users[j], filters)
+        ][:5]
+        matches = MatchingService().recommend_matches(user_id, 5, explain=False, filters=filters)
+        assert [(m["score"], m["match_id"]) for m in matches] == expected
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from app.services import match_jobs, matching_service
+from app.services.match_jobs import JobConflict, MatchJobQueue, generate_all_matches
+from app.services.matching_service import MatchingService
+from app.services.supabase_service import SupabaseService
+
+
+def wait_for(queue, job_id, state):
+    deadline = time.time() + 5
+    while queue.get(job_id)["state"] != state:
+        assert time.time() < deadline, queue.get(job_id)
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+
+def test_one_active_job_per_dataset(app):
+    jobs = MatchJobQueue(app)
+    release = threading.Event()
+    first = jobs.submit("users", "generate-all", lambda progress: release.wait(5) and {"stored": 3})
+    wait_for(jobs, first["id"], "running")
+
+    with pytest.raises(JobConflict) as conflict:
+        jobs.submit("users", "generate-all", lambda progress: None)
+    assert conflict.value.job["id"] == first["id"]
+
+    release.set()
+    assert wait_for(jobs, first["id"], "succeeded")["result"] == {"stored": 3}
+    second = jobs.submit("users", "generate-all", lambda progress: {})
+    assert wait_for(jobs, second["id"], "succeeded")["phase"] == "done"
+
+
+def test_heartbeat_keeps_a_slow_job_active(app, monkeypatch):
+    monkeypatch.setattr(match_jobs, "HEARTBEAT_SECONDS", 0.05)
+    jobs = MatchJobQueue(app, stale_seconds=0.3)
+    release = threading.Event()
+    job = jobs.submit("users", "generate-all", lambda progress: release.wait(5))
+    wait_for(jobs, job["id"], "running")
+    # Several stale periods pass in one phase without any progress writes
+    time.sleep(0.8)
+    with pytest.raises(JobConflict):
+        jobs.submit("users", "generate-all", lambda progress: None)
+    release.set()
+    wait_for(jobs, job["id"], "succeeded")
+
+
+def test_job_of_a_dead_process_is_abandoned(app, tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    dead = MatchJobQueue(app, path, stale_seconds=60)
+    dead._db.execute(
+        "INSERT INTO match_jobs (id, dataset, kind, state, phase, created_at, updated_at) "
+        "VALUES ('old', 'users', 'generate-all', 'running', 'scoring', 0, ?)", (time.time() - 120,)
+    )
+
+    jobs = MatchJobQueue(app, path, stale_seconds=60)
+    job = jobs.submit("users", "generate-all", lambda progress: {})
+    wait_for(jobs, job["id"], "succeeded")
+    assert (jobs.get("old")["state"], jobs.get("old")["error"]) == ("failed", "abandoned")
+    # The presumed-dead run can no longer finish it
+    assert not dead._update("old", "running", state="succeeded")
+
+
+class RecordingProgress:
+    def __init__(self):
+        self.phases = []
+        self.total_users = None
+        self.users_processed = 0
+
+    def phase(self, name, total_users=None):
+        self.phases.append((name, total_users))
+
+    def advance(self, users=1):
+        self.users_processed += users
+
+
+def test_generate_all_counts_users_as_they_stream(app, users, monkeypatch):
+    pages = [users[start:start + 25] for start in range(0, len(users), 25)]
+    monkeypatch.setattr(SupabaseService, "iter_users", staticmethod(lambda **kwargs: iter(pages)))
+    monkeypatch.setattr(SupabaseService, "get_users", staticmethod(lambda **kwargs: pytest.fail("loaded every user")))
+    monkeypatch.setattr(matching_service, "get_matching_service", MatchingService)
+    written = []
+    monkeypatch.setattr(SupabaseService, "store_match_deltas", staticmethod(lambda rows: written.extend(rows) or {}))
+
+    progress = RecordingProgress()
+    generate_all_matches(progress, top_n=2)
+    assert progress.phases == [("loading users", None), ("scoring", len(users)), ("finishing writes", None)]
+    assert progress.users_processed == len(users)
+    assert len(written) == 2 * len(users)
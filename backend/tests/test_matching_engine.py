@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+from app.services.matching_engine import (
+    MIN_BLOCK_SIZE, TILE_TEMPORARIES, MatchingEngine, TopNAccumulator, block_size_for_budget,
+)
+from app.services.matching_service import COMPLEMENT_MATRIX, WEIGHTS
+
+
+def test_vectorized_scores_equal_per_pair_scores(users):
+    engine = MatchingEngine(users)
+    scores = engine.score_matrix(symmetric=False)
+    scorer = engine.scorer
+    for i, profileA in enumerate(engine.profiles):
+        for j, profileB in enumerate(engine.profiles):
+            if i != j:
+                expected = scorer._weighted_score(scorer._compute_subscores(profileA, profileB))
+                assert scores[i, j] == expected, (i, j)
+
+
+
+def test_pair_scoring_equals_both_directions(users):
+    engine = MatchingEngine(users)
+    rows, cols = slice(10, 40), slice(30, 90)
+    forward, backward = engine.score_block_pair(rows, cols)
+    assert np.array_equal(forward, engine.score_block(rows, cols))
+    assert np.array_equal(backward, engine.score_block(cols, rows).T)
+
+
+def test_symmetric_top_n_equals_directed(users):
+    engine = MatchingEngine(users)
+    assert engine.symmetric
+    directed = engine.top_matches(5, symmetric=False)
+    assert engine.top_matches(5, symmetric=True) == directed
+
+
+def exhaustive_top(engine, i, top_n):
+    """User i's top_n by per-pair scoring: higher score first, ties to the earlier user."""
+    scorer = engine.scorer
+    target = engine.profiles[i]
+    ranked = sorted(
+        (-scorer._weighted_score(scorer._compute_subscores(target, other)), j)
+        for j, other in enumerate(engine.profiles) if j != i
+    )
+    return [(-neg, j) for neg, j in ranked[:top_n]]
+
+
+def test_bounded_top_n_equals_sorted_candidates(users):
+    engine = MatchingEngine(users)
+    for top_n in (1, 5, len(users) + 10):
+        top = engine.top_matches(top_n, block_size=16)
+        for i in (0, 1, 57, len(users) - 1):
+            assert top[i] == exhaustive_top(engine, i, top_n)
+            assert engine.top_matches_for(i, top_n) == top[i]
+
+
+def test_accumulator_breaks_ties_towards_the_earlier_user():
+    accumulator = TopNAccumulator(5, 2)
+    accumulator.fold(slice(0, 1), slice(None), np.array([[0.0, 1.5, 1.5, 2.0, 1.5]]))
+    assert accumulator.results(0) == [(2.0, 3), (1.5, 1)]
+
+
+def test_compiled_profiles_intern_the_user_fields(users):
+    engine = MatchingEngine(users)
+    compiler = engine.scorer.compiler
+    for profile, user in zip(engine.profiles, users):
+        assert compiler.skill_list(profile.skills) == sorted(set(user["skills"]), key=compiler.skill_vocab.get)
+        assert set(compiler.interest_list(profile.interests)) == set(user["interests"])
+        assert (profile.location == 0) == (user["location"] is None)
+
+
+def test_skill_features_are_one_compact_count_matrix(users):
+    users = [dict(users[0], skills=["Python", "Python", "AI"]), *users[1:]]
+    engine = MatchingEngine(users)
+    assert engine.skill_counts.dtype == np.float32
+    assert not hasattr(engine, "skill_hot")
+    # A repeated skill counts twice towards complements but once towards overlap
+    python = engine.scorer.compiler.skill_vocab["Python"]
+    assert engine.complement_counts[0, python] == 2
+    assert engine._skill_hot(slice(0, 1))[0, python] == 1
+
+    engine.upsert(dict(users[1], skills=["Quantum Optics"]))
+    assert engine.skill_counts.shape[1] == len(engine.scorer.compiler.skill_names)
+    assert np.array_equal(engine.score_matrix(), MatchingEngine(engine.users).score_matrix())
+
+
+def test_complement_product_equals_pair_sums(users):
+    engine = MatchingEngine(users)
+    scorer = engine.scorer
+    compiler = scorer.compiler
+    matrix = compiler.complement_matrix()
+    for skillA, row in COMPLEMENT_MATRIX.items():
+        for skillB, val in row.items():
+            assert matrix[compiler.skill_vocab[skillA], compiler.skill_vocab[skillB]] == val
+
+    products = engine._complement_term(slice(None), slice(None), engine.complement) / WEIGHTS["complementary_skills"]
+    for i, profileA in enumerate(engine.profiles):
+        for j, profileB in enumerate(engine.profiles):
+            assert products[i, j] == pytest.approx(scorer._complementary_skill_synergy(profileA, profileB, details=False)[0])
+
+
+def test_tile_size_fits_memory_budget():
+    side = block_size_for_budget(64 * 1024 * 1024)
+    assert side * side * TILE_TEMPORARIES * 8 <= 64 * 1024 * 1024
+    assert block_size_for_budget(1) == MIN_BLOCK_SIZE
+
+
+def test_tiled_top_n_streams_each_row_block_when_final(users, monkeypatch):
+    engine = MatchingEngine(users)
+    whole = engine.top_matches(5, block_size=len(users))
+    tiles = []
+    score_block_pair = engine.score_block_pair
+    monkeypatch.setattr(engine, "score_block_pair", lambda rows, cols: tiles.append(rows) or score_block_pair(rows, cols))
+
+    streamed = engine.iter_top_matches(5, block_size=32)
+    i, matches = next(streamed)
+    # Only the first row block's tiles were scored before its users came out
+    assert (i, matches) == (0, whole[0])
+    assert tiles == [slice(0, 32)] * 4
+    assert [m for _, m in streamed] == whole[1:]
+
+
+@pytest.mark.parametrize("bio_store", [False, True])
+def test_engine_from_pages_equals_engine_from_list(users, tmp_path, bio_store):
+    path = str(tmp_path / "bios.npy") if bio_store else None
+    paged = MatchingEngine.from_pages((users[start:start + 17] for start in range(0, len(users), 17)), bio_store_path=path)
+    whole = MatchingEngine(users)
+    assert paged.ids == whole.ids
+    for name, array in whole.feature_arrays().items():
+        assert np.array_equal(paged.feature_arrays()[name], array), name
+    assert np.array_equal(paged.score_matrix(), whole.score_matrix())
@@ -0,0 +1,128 @@
+import json
+
+import pytest
+
+from app.api.v1.matching import _expanded_user_columns
+from app.services import matching_service
+from app.services.matching_service import BIO_MENTION_THRESHOLD, FACTOR_SUBSCORES, FEATURE_COLUMNS, MatchingService
+from app.services.supabase_service import SupabaseService
+from app.services.user_snapshot import UserSnapshot
+
+
+def test_explanations_rendered_only_for_returned_matches(snapshot, monkeypatch):
+    scorer = snapshot.engine.scorer
+    rendered = []
+    render = scorer._generate_explanation
+    monkeypatch.setattr(scorer, "_generate_explanation", lambda *args: rendered.append(args) or render(*args))
+
+    matches = MatchingService().generate_matches_for_user(1, top_n=5)
+    assert len(matches) == len(rendered) == 5
+    assert all(m["explanation"] for m in matches)
+
+    rendered.clear()
+    matches = MatchingService().generate_matches_for_user(1, top_n=5, explain=False)
+    assert [m["explanation"] for m in matches] == [None] * 5
+    assert rendered == []
+
+
+def collect_pages(service, user_id, limit, **kwargs):
+    matches, cursor, pages = [], None, 0
+    while True:
+        page = service.ranked_matches_page(user_id, limit, cursor=cursor, explain=False, **kwargs)
+        matches += [(m["score"], m["match_id"]) for m in page["matches"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return matches, pages
+
+
+@pytest.mark.parametrize("limit", [1, 7, 25])
+def test_ranked_pages_concatenate_to_unpaged_ranking(snapshot, users, limit):
+    engine = snapshot.engine
+    service = MatchingService()
+    for user_id in (1, 60, users[-1]["id"]):
+        i = engine.positions[user_id]
+        unpaged = [(score, engine.ids[j]) for score, j in engine.top_matches_for(i, len(users))]
+        matches, pages = collect_pages(service, user_id, limit)
+        assert matches == unpaged
+        assert pages == -(-len(unpaged) // limit)
+
+
+def test_ranked_pages_skip_excluded_users(snapshot, users):
+    engine = snapshot.engine
+    excluded = {u["id"] for u in users[::4]}
+    i = engine.positions[2]
+    unpaged = [
+        (score, engine.ids[j]) for score, j in engine.top_matches_for(i, len(users))
+        if engine.ids[j] not in excluded
+    ]
+    matches, _ = collect_pages(MatchingService(), 2, 9, exclude_ids=excluded)
+    assert matches == unpaged
+
+
+def test_cursor_round_trip():
+    cursor = matching_service.encode_cursor(12.345, 42)
+    assert matching_service.decode_cursor(cursor) == (12345, 42)
+    with pytest.raises(ValueError):
+        matching_service.decode_cursor("not a cursor")
+
+
+def test_scoring_reads_features_and_full_records_only_for_returned_users(app, fake_client, users, monkeypatch):
+    fake_client.tables["users"] = [dict(u, education="A long education history " * 20) for u in users]
+    snapshot = UserSnapshot.load()
+    monkeypatch.setattr("app.services.user_snapshot.get_user_snapshot", lambda: snapshot)
+    assert all(set(u) == set(FEATURE_COLUMNS.split(",")) for u in snapshot.users)
+
+    requested = []
+    get_users_by_ids = SupabaseService.get_users_by_ids
+    monkeypatch.setattr(SupabaseService, "get_users_by_ids", staticmethod(
+        lambda ids, **kwargs: requested.append((list(ids), kwargs.get("columns", "*"))) or get_users_by_ids(ids, **kwargs)
+    ))
+    matches = MatchingService().recommend_matches(3, 5, explain=False)
+    assert requested == [([m["match_id"] for m in matches], "*")]
+    assert all("education" in m["user_data"] for m in matches)
+
+
+def test_compact_view_ranks_like_the_full_view(snapshot, fake_client):
+    service = MatchingService()
+    full = service.recommend_matches(5, 8, explain=True)
+    compact = service.recommend_matches_compact(5, 8)
+    assert [(m["match_id"], m["score"]) for m in compact["matches"]] == [(m["match_id"], m["score"]) for m in full]
+    assert "users" not in compact
+    assert len(json.dumps(compact)) * 4 < len(json.dumps(full))
+
+    engine = snapshot.engine
+    target = engine.profiles[engine.positions[5]]
+    for match in compact["matches"]:
+        subs = engine.scorer._compute_subscores(target, engine.profiles[engine.positions[match["match_id"]]])
+        contributing = [code for code, key in FACTOR_SUBSCORES.items()
+                        if subs[key] > 0 and not (key == "bio_val" and subs[key] < BIO_MENTION_THRESHOLD)]
+        assert match["factors"] == contributing
+
+
+def test_compact_view_side_loads_each_user_once(snapshot, fake_client, users, monkeypatch):
+    requested = []
+    by_id = {u["id"]: u for u in users}
+    monkeypatch.setattr(SupabaseService, "get_users_by_ids", staticmethod(
+        lambda ids, columns="*", **kwargs: requested.append((list(ids), columns))
+        or [{c: by_id[i][c] for c in columns.split(",")} for i in ids]
+    ))
+    compact = MatchingService().recommend_matches_compact(5, 8, user_columns="id,name")
+    ids = [m["match_id"] for m in compact["matches"]]
+    assert requested == [(ids, "id,name")]
+    assert compact["users"] == [{"id": i, "name": by_id[i]["name"]} for i in ids]
+
+
+@pytest.mark.parametrize("expand, columns", [
+    (None, None),
+    ("user", "*"),
+    ("user(name, avatar_url)", "id,name,avatar_url"),
+])
+def test_expand_names_the_side_loaded_columns(expand, columns):
+    assert _expanded_user_columns(expand) == columns
+
+
+@pytest.mark.parametrize("expand", ["users", "user(name", "user(bio;drop)"])
+def test_malformed_expand_is_rejected(expand):
+    with pytest.raises(ValueError):
+        _expanded_user_columns(expand)
@@ -0,0 +1,21 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from app.api.v1.pagination import page_args
+
+
+def test_page_args_defaults_and_projection(app):
+    assert page_args(MultiDict()) == (app.config.get("LIST_PAGE_SIZE", 100), None, "*")
+    assert page_args(MultiDict({"limit": "5", "after": "42", "fields": "name, id,skills"})) == (5, 42, "id,name,skills")
+
+
+@pytest.mark.parametrize("args", [
+    {"limit": "0"},
+    {"limit": "100000"},
+    {"after": "abc"},
+    {"fields": "name,bio;drop"},
+    {"fields": "skills->0"},
+])
+def test_page_args_reject_invalid_values(app, args):
+    with pytest.raises(ValueError):
+        page_args(MultiDict(args))
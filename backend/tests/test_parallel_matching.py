@@ -0,0 +1,26 @@
+import pytest
+
+from app.services.matching_engine import MatchingEngine
+from app.services.parallel_matching import _band_bounds, top_matches_parallel
+
+
+@pytest.mark.parametrize("n,bands", [(1, 8), (7, 8), (120, 8), (1000, 16)])
+def test_bands_cover_rows_with_equal_triangle_areas(n, bands):
+    bounds = _band_bounds(n, bands)
+    assert [start for start, _ in bounds][0] == 0 and bounds[-1][1] == n
+    assert all(stop == start for (_, stop), (start, _) in zip(bounds, bounds[1:]))
+    if n >= 1000:
+        areas = [sum(n - i for i in range(start, stop)) for start, stop in bounds]
+        assert max(areas) <= 1.2 * min(areas)
+
+
+def test_parallel_top_n_equals_serial(users):
+    engine = MatchingEngine(users)
+    assert engine.symmetric
+    assert top_matches_parallel(engine, 5, workers=2, block_size=16) == engine.top_matches(5, block_size=16)
+
+
+def test_parallel_directed_top_n_equals_serial(users, monkeypatch):
+    engine = MatchingEngine(users)
+    monkeypatch.setattr(engine, "symmetric", False)
+    assert top_matches_parallel(engine, 5, workers=2, block_size=16) == engine.top_matches(5, block_size=16)
@@ -0,0 +1,117 @@
+import threading
+
+import jwt
+import pytest
+
+from app.api.v1 import bp
+from app.services import incremental_matching, matching_service, user_snapshot
+from app.services.incremental_matching import IncrementalMatcherManager
+from app.services.matching_engine import MatchingEngine
+from app.services.supabase_service import SupabaseService
+from app.services.user_snapshot import UserSnapshotManager
+
+PROFILE_ID = 500
+USER_ID = 5
+MEDICINE = {"skills": ["Medicine", "Biology"], "interests": ["BioTech", "HealthTech"], "bio": "clinical trials lab research"}
+SALES = {"skills": ["Sales", "Finance"], "interests": ["FinTech"], "bio": "sales pipeline funding"}
+
+
+@pytest.fixture
+def client(app, users, fake_client, monkeypatch):
+    fake_client.tables["users"] = [dict(u, email=f"user{u['id']}@example.com") for u in users]
+    fake_client.tables["profiles"] = [{"id": PROFILE_ID, "user_id": USER_ID, "skills": [], "interests": [], "bio": ""}]
+    monkeypatch.setattr(
+        SupabaseService, "iter_users", staticmethod(lambda **kwargs: iter([[dict(u) for u in fake_client.tables["users"]]]))
+    )
+    # The snapshot stays the one loaded here, before any write, so written
+    # records are served from it
+    monkeypatch.setattr(UserSnapshotManager, "refresh", lambda self: None)
+    monkeypatch.setattr(user_snapshot, "user_snapshots", UserSnapshotManager(app, 3600))
+    user_snapshot.user_snapshots.current()
+    monkeypatch.setattr(incremental_matching, "incremental_matchers", IncrementalMatcherManager(app, 300))
+    monkeypatch.setitem(matching_service.recommendation_stats, "hit", 0)
+    monkeypatch.setitem(app.config, "JWT_SECRET_KEY", "test-secret-" * 4)
+    app.register_blueprint(bp)
+    return app.test_client()
+
+
+def wait_for_seed():
+    for thread in threading.enumerate():
+        if thread.name == "incremental-seed":
+            thread.join()
+
+
+def stored_entry(fake_client, user_id):
+    return next(row for row in fake_client.tables["match_recommendations"] if row["user_id"] == user_id)
+
+
+def put_profile(client, fields):
+    response = client.put(f"/v1/profiles/{PROFILE_ID}", json=dict(fields, avatar_url=None))
+    assert response.status_code == 200
+
+
+def recommend(app, client, count=5):
+    token = jwt.encode({"user_id": USER_ID, "email": "user5@example.com"}, app.config["JWT_SECRET_KEY"], algorithm="HS256")
+    response = client.get(f"/v1/matches/recommend?count={count}&explain=false", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    return [(m["score"], m["match_id"]) for m in response.get_json()]
+
+
+def current_ranking(fake_client, count):
+    """The user's top count over the users table as it is now, by a full rescore."""
+    engine = MatchingEngine(fake_client.tables["users"])
+    return [(score, engine.ids[j]) for score, j in engine.top_matches_for(engine.positions[USER_ID], count)]
+
+
+def test_profile_edit_reaches_the_users_table(client, fake_client):
+    put_profile(client, MEDICINE)
+    user = SupabaseService.get_user(USER_ID)
+    assert {field: user[field] for field in MEDICINE} == MEDICINE
+
+
+def test_profile_edit_changes_stored_recommendations(app, client, fake_client):
+    # The first write only starts the seed, which applies the written record
+    put_profile(client, SALES)
+    wait_for_seed()
+    before = dict(stored_entry(fake_client, USER_ID))
+    assert before["matches"][:5] == [{"match_id": m, "score": s} for s, m in current_ranking(fake_client, 5)]
+
+    put_profile(client, MEDICINE)
+    after = stored_entry(fake_client, USER_ID)
+    assert after["matches"] != before["matches"]
+
+    # /matches/recommend serves the incremental entry as a fresh hit
+    assert recommend(app, client) == current_ranking(fake_client, 5)
+    assert matching_service.recommendation_stats["hit"] == 1
+
+
+def test_recommend_before_the_seed_ranks_the_written_record(app, client, fake_client, monkeypatch):
+    monkeypatch.setattr(IncrementalMatcherManager, "_seed_in_background", lambda self, top_n, scorer: None)
+    put_profile(client, MEDICINE)
+    expected = current_ranking(fake_client, 5)
+    assert not user_snapshot.get_user_snapshot().is_encoded(USER_ID)
+
+    assert recommend(app, client) == expected
+    assert stored_entry(fake_client, USER_ID)["profile_version"] == matching_service.profile_version(
+        SupabaseService.get_user(USER_ID)
+    )
+    assert recommend(app, client) == expected
+    assert matching_service.recommendation_stats["hit"] == 1
+
+
+def test_reloaded_snapshot_reseeds_the_matcher(app, client, fake_client):
+    put_profile(client, SALES)
+    wait_for_seed()
+    manager = incremental_matching.incremental_matchers
+    seeded = manager._matcher
+    manager.reseed_seconds = 0
+    user_snapshot.user_snapshots._load()
+
+    put_profile(client, MEDICINE)
+    wait_for_seed()
+    assert manager._matcher is not seeded
+    engine = manager._matcher.engine
+    assert engine.users[engine.positions[USER_ID]]["skills"] == MEDICINE["skills"]
+    assert stored_entry(fake_client, USER_ID)["matches"][:5] == [
+        {"match_id": m, "score": s} for s, m in current_ranking(fake_client, 5)
+    ]
@@ -0,0 +1,66 @@
+import pytest
+
+from app.services import matching_service
+from app.services.matching_service import MatchingService, SCORING_CONFIG_VERSION, profile_version
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    stats = {"hit": 0, "miss": 0, "stale": 0}
+    monkeypatch.setattr(matching_service, "recommendation_stats", stats)
+    return stats
+
+
+def ids_and_scores(matches):
+    return [(m["score"], m["match_id"]) for m in matches]
+
+
+def stored(fake_client, user_id):
+    return next(row for row in fake_client.tables["match_recommendations"] if row["user_id"] == user_id)
+
+
+def test_miss_scores_live_and_fills_the_store(app, snapshot, fake_client, stats):
+    service = MatchingService()
+    live = ids_and_scores(service.generate_matches_for_user(3, top_n=5, explain=False))
+    assert ids_and_scores(service.recommend_matches(3, 5, explain=False)) == live
+    entry = stored(fake_client, 3)
+    assert entry["top_k"] == app.config.get("RECOMMENDATION_TOP_K", 50)
+    assert entry["profile_version"] == profile_version(snapshot.get_user(3))
+    assert entry["config_version"] == SCORING_CONFIG_VERSION
+
+    assert ids_and_scores(service.recommend_matches(3, 5, explain=False)) == live
+    assert stats == {"hit": 1, "miss": 1, "stale": 0}
+
+
+def test_hit_is_served_from_the_stored_entry(snapshot, fake_client, stats):
+    service = MatchingService()
+    entry = service.recommendation_entry(snapshot.get_user(3), [(9.5, 40), (9.0, 41)], 10)
+    fake_client.tables["match_recommendations"] = [entry]
+    assert ids_and_scores(service.recommend_matches(3, 2, explain=False)) == [(9.5, 40), (9.0, 41)]
+    assert stats["hit"] == 1
+
+
+@pytest.mark.parametrize("change", [
+    {"profile_version": "other-profile"},
+    {"config_version": "other-config"},
+    {"top_k": 3},
+])
+def test_outdated_entries_are_rescored_and_rewritten(snapshot, fake_client, stats, change):
+    service = MatchingService()
+    entry = service.recommendation_entry(snapshot.get_user(3), [(9.5, 40), (9.0, 41), (8.0, 42)], 10)
+    fake_client.tables["match_recommendations"] = [dict(entry, **change)]
+    live = ids_and_scores(service.generate_matches_for_user(3, top_n=5, explain=False))
+    assert ids_and_scores(service.recommend_matches(3, 5, explain=False)) == live
+    assert stats["stale"] == 1
+    assert stored(fake_client, 3)["profile_version"] == entry["profile_version"]
+    assert stored(fake_client, 3)["config_version"] == SCORING_CONFIG_VERSION
+
+
+def test_batch_run_fills_every_entry(app, snapshot, users, fake_client):
+    list(MatchingService().iter_matches_for_all_users(top_n=3, explain=False, store_top_k=8, users=users))
+    rows = fake_client.tables["match_recommendations"]
+    assert sorted(row["user_id"] for row in rows) == [u["id"] for u in users]
+    engine = snapshot.engine
+    assert stored(fake_client, 7)["matches"] == [
+        {"match_id": engine.ids[j], "score": score} for score, j in engine.top_matches_for(engine.positions[7], 8)
+    ]
@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+from app.services import supabase_service
+from app.services.supabase_service import SupabaseService, _ChunkWriter
+
+
+def test_chunk_writer_sends_bounded_multi_row_requests(app):
+    sent, in_flight, peak = [], [0], [0]
+    lock = threading.Lock()
+
+    def request(chunk):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+            sent.append(list(chunk))
+        if 13 in chunk:
+            raise ConnectionError("chunk rejected")
+
+    writer = _ChunkWriter({"stored": request}, chunk_size=4, workers=2)
+    for row in range(18):
+        writer.add("stored", row)
+    result = writer.close()
+
+    assert sorted(sent) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11], [12, 13, 14, 15], [16, 17]]
+    assert peak[0] <= 2
+    # The failed chunk is reported and the others are still written
+    assert result == {"stored": 14, "chunks": 5, "errors": [
+        {"chunk": 3, "kind": "stored", "rows": 4, "error": "chunk rejected"},
+    ]}
+
+
+def generated(scores):
+    return [SupabaseService.match_row(user_id, match_id, score, f"{user_id}-{match_id}")
+            for (user_id, match_id), score in scores.items()]
+
+
+def stored(fake_client):
+    return {(m["user_id"], m["matched_user_id"]): (m["compatibility_score"], m["status"])
+            for m in fake_client.tables["matches"]}
+
+
+@pytest.mark.parametrize("batch_users", [1, 200])
+def test_match_deltas_write_only_what_changed(app, fake_client, monkeypatch, batch_users):
+    monkeypatch.setitem(app.config, "MATCH_DIFF_BATCH_USERS", batch_users)
+    scores = {(1, 2): 0.9, (1, 3): 0.8, (1, 4): 0.7, (2, 1): 0.9, (2, 5): 0.6}
+    result = SupabaseService.store_match_deltas(generated(scores), chunk_size=2)
+    assert (result["inserted"], result["updated"], result["retired"], result["unchanged"]) == (5, 0, 0, 0)
+    assert set(stored(fake_client).values()) <= {(score, "pending") for score in scores.values()}
+
+    # A stable regeneration writes nothing
+    result = SupabaseService.store_match_deltas(generated(scores))
+    assert (result["chunks"], result["unchanged"]) == (0, 5)
+
+    for match in fake_client.tables["matches"]:
+        if (match["user_id"], match["matched_user_id"]) in {(1, 2), (1, 4)}:
+            match["status"] = "accept"
+    regenerated = {(1, 2): 0.5, (1, 3): 0.805, (2, 1): 0.9, (2, 6): 0.4}
+    result = SupabaseService.store_match_deltas(generated(regenerated))
+    assert (result["inserted"], result["updated"], result["retired"], result["unchanged"]) == (1, 1, 1, 2)
+    assert stored(fake_client) == {
+        (1, 2): (0.5, "accept"),   # rescored, status kept
+        (1, 3): (0.8, "pending"),  # within tolerance, not written
+        (1, 4): (0.7, "accept"),   # dropped but acted on, kept
+        (2, 1): (0.9, "pending"),
+        (2, 6): (0.4, "pending"),  # new pair; the dropped pending (2, 5) is deleted
+    }
+
+
+def test_excluded_ids_are_read_past_max_rows(app, fake_client, monkeypatch):
+    monkeypatch.setattr(supabase_service, "EXCLUDED_PAGE_SIZE", 4)
+    fake_client.max_rows = 4
+    fake_client.tables["matches"] = (
+        [{"id": k, "user_id": 1, "matched_user_id": 100 + k, "status": "pending"} for k in range(1, 11)]
+        + [{"id": 10 + k, "user_id": 200 + k, "matched_user_id": 1, "status": status}
+           for k, status in enumerate(["reject", "accept", "reject"] * 3)]
+    )
+    assert SupabaseService.get_excluded_user_ids(1) == (
+        set(range(101, 111)) | {200 + k for k in range(9) if k % 3 != 1}
+    )
+
+
+def clustered_users(n):
+    """Users with sparse ids and one dense cluster, so id ranges hold very different counts."""
+    ids = list(range(1, 40)) + list(range(5000, 5000 + n - 60)) + [10 ** 6 + 7 * k for k in range(21)]
+    return [{"id": user_id, "name": f"User {user_id}", "bio": None} for user_id in ids]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_parallel_user_ranges_yield_every_user_in_order(app, fake_client, workers):
+    fake_client.tables["users"] = clustered_users(500)
+    fake_client.max_rows = 16
+    pages = list(SupabaseService.iter_users(page_size=16, workers=workers, columns="id,name"))
+    assert all(len(page) <= 16 for page in pages)
+    assert [user for page in pages for user in page] == [
+        {"id": u["id"], "name": u["name"]} for u in fake_client.tables["users"]
+    ]
+
+
+def test_user_pages_of_non_integer_ids_are_sequential(app, fake_client):
+    fake_client.tables["users"] = [{"id": f"u{k:03d}"} for k in range(50)]
+    pages = list(SupabaseService.iter_users(page_size=8, workers=4, columns="id"))
+    assert [len(page) for page in pages] == [8] * 6 + [2]
+    assert [u["id"] for page in pages for u in page] == [f"u{k:03d}" for k in range(50)]
+
+
+def test_stopping_early_releases_the_range_fetches(app, fake_client):
+    fake_client.tables["users"] = clustered_users(500)
+    before = threading.active_count()
+    pages = SupabaseService.iter_users(page_size=4, workers=3, columns="id")
+    assert len(next(pages)) == 4
+    pages.close()
+    assert threading.active_count() == before
+
+
+@pytest.mark.parametrize("limit", [1, 10, 33])
+def test_list_pages_concatenate_to_whole_table(app, fake_client, limit):
+    fake_client.tables["users"] = [{"id": i * 3, "name": f"u{i}", "bio": "x"} for i in range(1, 100)]
+    rows, after = [], None
+    while True:
+        page = SupabaseService.get_users_page(limit, after, columns="id,name")
+        rows += page["data"]
+        after = page["next_cursor"]
+        if after is None:
+            break
+    assert rows == [{"id": i * 3, "name": f"u{i}"} for i in range(1, 100)]
+
+
+def test_match_pages_hold_only_the_users_matches(app, fake_client):
+    fake_client.tables["matches"] = [{"id": k, "user_id": k % 3, "matched_user_id": k} for k in range(1, 30)]
+    first = SupabaseService.get_matches_page(1, 4)
+    second = SupabaseService.get_matches_page(1, 4, first["next_cursor"])
+    assert [m["id"] for m in first["data"] + second["data"]] == [1, 4, 7, 10, 13, 16, 19, 22]
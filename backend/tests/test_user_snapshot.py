@@ -0,0 +1,67 @@
+from app.services.supabase_service import SupabaseService
+from app.services.user_snapshot import UserSnapshotManager
+
+
+def counting_loads(monkeypatch, users):
+    loads = []
+
+    def iter_users(**kwargs):
+        loads.append(kwargs)
+        return iter([users])
+
+    monkeypatch.setattr(SupabaseService, "iter_users", staticmethod(iter_users))
+    return loads
+
+
+def test_snapshot_is_loaded_once_and_shared(app, users, monkeypatch):
+    loads = counting_loads(monkeypatch, users)
+    manager = UserSnapshotManager(app, 0)
+    snapshot = manager.current()
+    assert manager.current() is snapshot
+    assert len(loads) == 1
+    assert snapshot.get_user(9) == users[8]
+    assert not snapshot.engine.skill_counts.flags.writeable
+
+
+def test_write_invalidates_without_a_refresher(app, users, monkeypatch):
+    loads = counting_loads(monkeypatch, users)
+    manager = UserSnapshotManager(app, 0)
+    snapshot = manager.current()
+    manager.invalidate()
+    assert manager.current() is not snapshot
+    assert len(loads) == 2
+
+
+
+def test_written_records_are_served_until_a_reload_includes_them(app, users, monkeypatch):
+    counting_loads(monkeypatch, users)
+    manager = UserSnapshotManager(app, 0)
+    # Keep the refresher from running so the write is served by the old snapshot
+    monkeypatch.setattr(manager, "invalidate", lambda: None)
+    snapshot = manager.current()
+    written = dict(users[8], skills=["Medicine"])
+    manager.record_write(written)
+    assert snapshot.get_user(9) is written
+    assert not snapshot.is_encoded(9) and snapshot.is_encoded(10)
+
+    # The reload starts after the write reached the users table
+    users[8] = written
+    manager.refresh()
+    reloaded = manager.current()
+    assert not reloaded.written
+    assert reloaded.get_user(9) == written and reloaded.is_encoded(9)
+
+
+def test_writes_during_a_reload_carry_over(app, users, monkeypatch):
+    manager = UserSnapshotManager(app, 0)
+    monkeypatch.setattr(manager, "invalidate", lambda: None)
+    written = dict(users[8], skills=["Medicine"])
+
+    def iter_users(**kwargs):
+        # Lands after the users table was read
+        manager.record_write(written)
+        return iter([users])
+
+    monkeypatch.setattr(SupabaseService, "iter_users", staticmethod(iter_users))
+    manager.refresh()
+    assert manager.current().get_user(9) is written
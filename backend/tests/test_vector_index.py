@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from app.services.candidate_index import (
+    AnnCandidateIndex, build_profile_index, load_profile_index, profile_fingerprint, recall_at_n,
+)
+from app.services.matching_engine import MatchingEngine
+from app.services.vector_index import LocalVectorIndex
+
+from conftest import make_users
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(3).normal(size=(400, 12)).astype(np.float32)
+
+
+def filled_index(vectors, metric="dotproduct"):
+    index = LocalVectorIndex(vectors.shape[1], metric=metric)
+    index.upsert([(f"v{k}", v, {"k": k}) for k, v in enumerate(vectors)])
+    return index
+
+
+def exact_ids(vectors, query, top_k):
+    scores = vectors @ query
+    return [f"v{k}" for k in sorted(range(len(vectors)), key=lambda k: (-scores[k], k))[:top_k]]
+
+
+def test_untrained_query_is_exhaustive(vectors):
+    index = filled_index(vectors)
+    query = vectors[7]
+    assert [m["id"] for m in index.query(vector=query, top_k=10)["matches"]] == exact_ids(vectors, query, 10)
+
+
+def test_upsert_fetch_and_delete(vectors):
+    index = filled_index(vectors[:3])
+    index.upsert([{"id": "v1", "values": vectors[5], "metadata": {"k": 5}}])
+    assert len(index) == 3
+    assert index.fetch(["v1", "missing"])["vectors"]["v1"]["metadata"] == {"k": 5}
+    index.delete(["v0"])
+    assert sorted(index.ids) == ["v1", "v2"]
+    assert np.array_equal(index.fetch(["v2"])["vectors"]["v2"]["values"], vectors[2])
+    with pytest.raises(ValueError):
+        index.upsert([("bad", np.zeros(3))])
+
+
+def test_cosine_vectors_are_normalized(vectors):
+    index = filled_index(vectors * 10, metric="cosine")
+    assert np.allclose(np.linalg.norm(index.vectors, axis=1), 1, atol=1e-5)
+
+
+def test_trained_index_probes_only_nearest_lists(vectors):
+    index = filled_index(vectors)
+    index.train(nlist=16, nprobe=2)
+    assert index.describe_index_stats()["nlist"] == 16
+    query = vectors[11].astype(np.float64)
+    probed = np.argsort(-(index.centroids @ query))[:2]
+    for match in index.query(vector=query, top_k=20)["matches"]:
+        assert index.assignments[index.ids.index(match["id"])] in probed
+    # Probing every list is exhaustive again
+    assert [m["id"] for m in index.query(vector=query, top_k=10, nprobe=16)["matches"]] == exact_ids(vectors, query, 10)
+
+
+def test_saved_index_answers_like_the_original(tmp_path, vectors):
+    index = filled_index(vectors)
+    index.train(nlist=8, nprobe=3)
+    path = tmp_path / "index.npz"
+    index.save(path, fingerprint="abc")
+    loaded = LocalVectorIndex.load(path)
+    assert loaded.attributes == {"fingerprint": "abc"}
+    assert loaded.metadata == index.metadata
+    for k in (0, 50, 399):
+        assert loaded.query(vector=vectors[k], top_k=5) == index.query(vector=vectors[k], top_k=5)
+
+
+def test_embeddings_factor_the_score(users):
+    engine = MatchingEngine(users)
+    products = engine.query_vectors() @ engine.embeddings().T
+    assert np.array_equal(np.round(products, 3)[~np.eye(len(users), dtype=bool)],
+                          engine.score_matrix()[~np.eye(len(users), dtype=bool)])
+
+
+def test_ann_recall_grows_with_probed_lists():
+    engine = MatchingEngine(make_users(1500, seed=11))
+    positions = range(0, 1500, 15)
+    recalls = [recall_at_n(AnnCandidateIndex(engine, build_profile_index(engine, nlist=32, nprobe=nprobe)), 5, positions)
+               for nprobe in (2, 8, 32)]
+    assert recalls[0] < recalls[1] < recalls[2] == 1.0
+    exhaustive = AnnCandidateIndex(engine, build_profile_index(engine, nlist=4, nprobe=4), oversample=len(engine))
+    for i in positions:
+        assert exhaustive.top_matches_for(i, 5)[0] == engine.top_matches_for(i, 5)
+
+
+def test_saved_profile_index_is_rebuilt_for_other_features(tmp_path, users):
+    path = str(tmp_path / "profiles.npz")
+    engine = MatchingEngine(users)
+    built = load_profile_index(engine, path)
+    reused = load_profile_index(engine, path)
+    assert reused.attributes["fingerprint"] == profile_fingerprint(engine)
+    assert reused.ids == built.ids
+
+    changed = MatchingEngine(users[:-1])
+    assert len(load_profile_index(changed, path)) == len(users) - 1
+    assert LocalVectorIndex.load(path).attributes["fingerprint"] == profile_fingerprint(changed)
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from app.services.bio_vectors import BIO_DIMENSION, BioVectorizer
+from app.services.vector_index import LocalVectorIndex
+from app.services.vector_sync import VectorSync, vector_metadata
+
+
+def pages(users, size=25):
+    return [users[start:start + size] for start in range(0, len(users), size)]
+
+
+@pytest.fixture
+def index():
+    return LocalVectorIndex(BIO_DIMENSION, metric="cosine")
+
+
+@pytest.fixture
+def with_bios(users):
+    return [u for u in users if u["bio"]]
+
+
+def test_sync_upserts_every_bio_then_skips_unchanged(tmp_path, index, users, with_bios):
+    state = str(tmp_path / "state.json")
+    stats = VectorSync(index, state_path=state, chunk_size=16).sync(pages(users))
+    assert stats["upserted"] == len(with_bios) == len(index)
+    assert stats["empty"] == len(users) - len(with_bios)
+    assert stats["vectors_per_second"] > 0
+
+    user = with_bios[4]
+    stored = index.fetch([str(user["id"])])["vectors"][str(user["id"])]
+    assert stored["metadata"] == vector_metadata(user)
+    expected = BioVectorizer().vector(user["bio"])
+    assert np.allclose(stored["values"], expected / np.linalg.norm(expected))
+
+    # A new syncer reads the state file, so nothing is encoded or sent again
+    stats = VectorSync(index, state_path=state).sync(pages(users))
+    assert (stats["encoded"], stats["upserted"], stats["deleted"]) == (0, 0, 0)
+    assert stats["skipped"] == len(with_bios)
+
+
+def test_sync_updates_changed_and_deletes_stale_vectors(index, users, with_bios):
+    syncer = VectorSync(index, chunk_size=16)
+    syncer.sync(pages(users))
+
+    changed, emptied, removed = (dict(u) for u in with_bios[:3])
+    changed["location"] = "Lisbon"
+    emptied["bio"] = "   "
+    current = [changed if u["id"] == changed["id"] else emptied if u["id"] == emptied["id"] else u
+               for u in users if u["id"] != removed["id"]]
+
+    stats = syncer.sync(pages(current))
+    assert (stats["encoded"], stats["upserted"], stats["deleted"]) == (1, 1, 2)
+    assert index.fetch([str(changed["id"])])["vectors"][str(changed["id"])]["metadata"]["location"] == "Lisbon"
+    assert str(emptied["id"]) not in index.ids and str(removed["id"]) not in index.ids
+    assert len(index) == len(with_bios) - 2
+
+    # Without a full sweep, users missing from the pages are kept
+    stats = syncer.sync(pages(current[:10]), delete_missing=False)
+    assert stats["deleted"] == 0 and len(index) == len(with_bios) - 2
+
+
+class FlakyIndex(LocalVectorIndex):
+    """Fails the first ``failures`` upserts."""
+
+    def __init__(self, failures):
+        super().__init__(BIO_DIMENSION, metric="cosine")
+        self.failures = failures
+
+    def upsert(self, vectors, namespace=None):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("upsert timed out")
+        return super().upsert(vectors, namespace=namespace)
+
+
+def test_failed_chunks_are_retried_and_reported(users, with_bios):
+    index = FlakyIndex(failures=2)
+    stats = VectorSync(index, chunk_size=len(users), workers=1, backoff=0).sync(pages(users))
+    assert stats["upserted"] == len(with_bios) and not stats["errors"]
+
+    index = FlakyIndex(failures=100)
+    syncer = VectorSync(index, chunk_size=len(users), workers=1, max_attempts=2, backoff=0)
+    stats = syncer.sync(pages(users))
+    assert stats["failed"] == len(with_bios)
+    assert stats["errors"][0]["error"] == "upsert timed out"
+    # Nothing is recorded, so the next sync sends the chunk again
+    assert syncer.state == {}
@@ -20,11 +20,15 @@ Each user will have a list of top 5 matches, each with:
   - match_id
   - score (rounded)
   - a verbose explanation referencing all relevant factors
+
+With --ndjson the script runs in streaming mode: users are read from an
+NDJSON file (one JSON object per line) and results are written as one
+compact JSON line per user as soon as that user's matches are final.
 """
 
+import argparse
 import json
-import itertools
-from collections import defaultdict
+import heapq
 
 # ------------------------------------------------------------------
 # 1) WEIGHTS & MAPPINGS
@@ -101,6 +105,33 @@ def load_users_from_json(path="synthetic_users.json"):
         data = json.load(f)
     return data["users"]
 
+# Only these fields take part in scoring; everything else (bio, education,
+# work experience, ...) is dropped when building the streaming registry
+MATCH_FIELDS = (
+    "id", "skills", "interests", "goals", "startup_stage",
+    "location", "availability", "collab_style",
+)
+
+def iter_users_from_ndjson(path):
+    """
+    Yield users one at a time from an NDJSON file (one JSON object per line).
+    Blank lines are skipped.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def build_user_registry(users):
+    """
+    Return an id-indexed registry { id: user } in input order, keeping only
+    MATCH_FIELDS so resident memory does not grow with bio text.
+    """
+    registry = {}
+    for user in users:
+        registry[user["id"]] = {k: user[k] for k in MATCH_FIELDS if k in user}
+    return registry
+
 # ------------------------------------------------------------------
 # 3) SCORING SUB-FUNCTIONS
 # ------------------------------------------------------------------
@@ -400,74 +431,115 @@ def generate_explanation(userA, userB, subscores, final_score):
 # 6) TOP MATCH GENERATION
 # ------------------------------------------------------------------
 
-def generate_top_matches(users, top_n=5):
+def push_top_n(heap, top_n, score, position):
     """
-    For each user, compute match scores with all others, pick top N,
-    and produce a { user_id: [ {match_id, score, explanation}, ... ] } dict.
+    Keep the best top_n (score, -position) entries in a fixed-size min-heap.
+    On equal scores the earlier user wins, matching a stable descending sort.
     """
-    # Precompute sub-scores
-    # We'll store them in recs_dict[uidA] = list of match infos
-    recs_dict = defaultdict(list)
+    entry = (score, -position)
+    if len(heap) < top_n:
+        heapq.heappush(heap, entry)
+    elif heap and entry > heap[0]:
+        heapq.heapreplace(heap, entry)
 
-    for userA, userB in itertools.permutations(users, 2):
-        uidA = userA["id"]
-        uidB = userB["id"]
-
-        subs = compute_subscores(userA, userB)
-        score_val = weighted_score(subs)
-
-        recs_dict[uidA].append({
-            "match_id": uidB,
-            "score": score_val,
-            "subscores": subs
-        })
+def iter_top_matches(users, top_n=5):
+    """
+    Yield (user_id, [ {match_id, score, explanation}, ... ]) per user, in input
+    order, as soon as that user's top N is final.
 
-    # Now pick top N for each user
-    output = {}
-    for uid in recs_dict:
-        # Sort descending
-        sorted_list = sorted(recs_dict[uid], key=lambda x: x["score"], reverse=True)
-        top_matches = sorted_list[:top_n]
+    Only (score, position) is kept per candidate while scanning, in a bounded
+    heap, so memory is O(top_n) per user. Sub-scores and explanations are
+    recomputed for the surviving matches only.
+    """
+    for posA, userA in enumerate(users):
+        heap = []
+        for posB, userB in enumerate(users):
+            if posB != posA:
+                score_val = weighted_score(compute_subscores(userA, userB))
+                push_top_n(heap, top_n, score_val, posB)
 
         # Build final objects with explanation
-        userA = next(u for u in users if u["id"] == uid)
         match_objs = []
-        for match_info in top_matches:
-            mid = match_info["match_id"]
-            sc = match_info["score"]
-            subs = match_info["subscores"]
-
-            userB = next(u for u in users if u["id"] == mid)
+        for sc, neg_pos in sorted(heap, reverse=True):
+            userB = users[-neg_pos]
+            subs = compute_subscores(userA, userB)
             expl = generate_explanation(userA, userB, subs, sc)
 
             match_objs.append({
-                "match_id": mid,
+                "match_id": userB["id"],
                 "score": sc,
                 "explanation": expl
             })
 
-        output[str(uid)] = match_objs
+        yield str(userA["id"]), match_objs
 
-    return output
+def generate_top_matches(users, top_n=5):
+    """
+    For each user, compute match scores with all others, pick top N,
+    and produce a { user_id: [ {match_id, score, explanation}, ... ] } dict.
+    """
+    if len(users) < 2:
+        return {}
+    return dict(iter_top_matches(users, top_n))
+
+def stream_top_matches(input_path, output_path, top_n=5):
+    """
+    Streaming mode: read users from NDJSON into an id-indexed registry and
+    write one compact JSON line { "user_id": ..., "matches": [...] } per user
+    as soon as its top N is final. Returns the number of users written.
+    """
+    registry = build_user_registry(iter_users_from_ndjson(input_path))
+    users = list(registry.values())
+
+    written = 0
+    with open(output_path, "w", encoding="utf-8") as f:
+        for uid, match_objs in iter_top_matches(users, top_n):
+            f.write(json.dumps({"user_id": uid, "matches": match_objs}, separators=(",", ":")))
+            f.write("\n")
+            written += 1
+    return written
 
 # ------------------------------------------------------------------
 # 7) MAIN
 # ------------------------------------------------------------------
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate top matches for every user.")
+    parser.add_argument("--input", default=None,
+                        help="users file (default: synthetic_users.json, or synthetic_users.ndjson with --ndjson)")
+    parser.add_argument("--output", default=None,
+                        help="results file (default: advanced_match_results.json, or .ndjson with --ndjson)")
+    parser.add_argument("--top-n", type=int, default=5, help="matches to keep per user (default: 5)")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="streaming mode: read NDJSON users and write one JSON line per user")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+
+    if args.ndjson:
+        input_path = args.input or "synthetic_users.ndjson"
+        output_path = args.output or "advanced_match_results.ndjson"
+        written = stream_top_matches(input_path, output_path, top_n=args.top_n)
+        print(f"Wrote '{output_path}' with top {args.top_n} matches for {written} users from '{input_path}'.")
+        return
+
+    input_path = args.input or "synthetic_users.json"
+    output_path = args.output or "advanced_match_results.json"
+
     # 1) Load data
-    users = load_users_from_json("synthetic_users.json")
-    print(f"Loaded {len(users)} users from 'synthetic_users.json'.")
+    users = load_users_from_json(input_path)
+    print(f"Loaded {len(users)} users from '{input_path}'.")
 
     # 2) Generate top matches
-    best_matches = generate_top_matches(users, top_n=5)
+    best_matches = generate_top_matches(users, top_n=args.top_n)
 
     # 3) Save to JSON
     out_data = {"best_matches": best_matches}
-    with open("advanced_match_results.json", "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8") as f:
         json.dump(out_data, f, indent=4)
 
-    print("Wrote 'advanced_match_results.json' with top 5 matches per user (score + detailed explanation).")
+    print(f"Wrote '{output_path}' with top {args.top_n} matches per user (score + detailed explanation).")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()